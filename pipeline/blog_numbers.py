@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+"""Blog-number verification as a memoized DAG of analysis stages.
+
+Each analysis from analysis.ipynb is a named stage that declares the stages
+it depends on, the input files it reads and the parameters it uses. A
+stage's cache key is a hash of its own source code (and that of the helpers
+and pipeline modules it calls, such as bootstrap.py), its parameter values,
+the content hashes of its input files and the keys of its dependencies, and
+its result is pickled under that key. Re-running therefore only recomputes
+stages whose inputs, parameters or code changed (and everything downstream
+of them); the rest load from the cache.
+
+Usage:
+    python blog_numbers.py [--classified classified_posts.jsonl] [--stats dataset_stats.json]
+                           [--cache-dir .analysis_cache] [--force STAGE ...] [--explain]
+                           [--ci [--replicates 2000] [--confidence 0.95] [--seed 0] [--ci-workers N]]
+
+    --force: Recompute these stages (and everything downstream) even if cached
+    --explain: Print which stages were computed vs loaded, with timings
+    --ci: Also print agent-clustered bootstrap CIs for every headline number (see bootstrap.py);
+          --ci-workers spreads replicate blocks over processes without changing the result
+    --profile / --trace-memory / --run-report: Instrumentation (see profiling.py)
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sys
+import time
+import types
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+import bootstrap
+import profiling
+from db import LABELS, SPAM_BOTS
+from jsonl_store import MANIFEST, iter_jsonl, read_manifest, resolve
+from profiling import Run
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+DEFAULT_CONFIG = {
+    "inputs": {"classified": os.path.join(ROOT, "classified_posts.jsonl"),
+               "stats": os.path.join(ROOT, "dataset_stats.json")},
+    "params": {
+        "LABELS": LABELS,
+        "SPAM_BOTS": sorted(SPAM_BOTS),
+        "min_clean_posts": 5,
+        "cohort_windows": [["Early (H24-48)", 24, 48], ["H48-72", 48, 72], ["H72-96 (peak)", 72, 96],
+                           ["H96-120", 96, 120], ["Late (H108-132)", 108, 132]],
+        "exposure_hours": 6,
+        "compare_labels": ["task_oriented", "curiosity", "consciousness", "identity"],
+        "bootstrap_ci": {"replicates": 2000, "confidence": 0.95, "seed": 0},
+    },
+}
+CI_WORKERS = 1  # Not a stage parameter: replicates are identical for any worker count
+
+STAGES = {}
+
+
+class Stage:
+    def __init__(self, fn, deps, inputs, params):
+        self.name = fn.__name__
+        self.fn = fn
+        self.deps = deps
+        self.inputs = inputs
+        self.params = params
+
+    @cached_property
+    def code_hash(self) -> str:
+        return code_hash(self.fn)
+
+
+def code_hash(fn) -> str:
+    """Hash of a stage's source, the helpers it calls here and the pipeline modules it uses.
+
+    Names the function references are looked up in its globals: a helper
+    function from this module is followed recursively, and a pipeline module
+    (or anything imported from one, like `iter_jsonl`) contributes its whole
+    source, plus the pipeline modules it imports in turn. Other stages are
+    skipped; their keys are already dependencies.
+    """
+    sources = {}
+    todo = [fn]
+    while todo:
+        obj = todo.pop()
+        if isinstance(obj, types.ModuleType):
+            name = os.path.basename(obj.__file__)
+            if name in sources:
+                continue
+            sources[name] = inspect.getsource(obj)
+            todo.extend(filter(None, map(_local_module, vars(obj).values())))
+            continue
+        name = f"{obj.__module__}.{obj.__qualname__}"
+        if name in sources:
+            continue
+        sources[name] = inspect.getsource(obj)
+        for ref in _referenced_names(obj.__code__):
+            value = obj.__globals__.get(ref)
+            if value is None or value is obj or any(st.fn is value for st in STAGES.values()):
+                continue
+            if isinstance(value, types.FunctionType) and value.__module__ == obj.__module__:
+                todo.append(value)
+            elif (module := _local_module(value)) is not None and module is not sys.modules[obj.__module__]:
+                todo.append(module)
+    blob = json.dumps(sources, sort_keys=True).encode()
+    return hashlib.sha256(blob).hexdigest()
+
+
+def _referenced_names(code) -> set[str]:
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _referenced_names(const)
+    return names
+
+
+def _local_module(value):
+    """The pipeline module `value` is, or was defined in; None for the standard library and third parties."""
+    if isinstance(value, types.ModuleType):
+        module = value
+    else:
+        name = getattr(value, "__module__", None)
+        module = sys.modules.get(name) if isinstance(name, str) else None
+    path = getattr(module, "__file__", None)
+    return module if path and os.path.dirname(os.path.abspath(path)) == HERE else None
+
+
+def stage(*deps, inputs=(), params=()):
+    """Register a stage. It is called with dependency results (in order), then inputs/params as kwargs."""
+    def register(fn):
+        STAGES[fn.__name__] = Stage(fn, deps, inputs, params)
+        return fn
+    return register
+
+
+class Runner:
+    """Resolves stages recursively with on-disk memoization."""
+
+    def __init__(self, config: dict, cache_dir: str = ".analysis_cache", force=(), run: Run | None = None):
+        self.config = config
+        self.run = run if run is not None else Run("blog_numbers")
+        self.cache_dir = cache_dir
+        self.force = self.downstream(force)
+        self.keys: dict[str, str] = {}
+        self.results: dict[str, object] = {}
+        self.log: list[tuple[str, str, float]] = []
+        os.makedirs(cache_dir, exist_ok=True)
+        self._file_hashes = self._load_file_hashes()
+
+    @staticmethod
+    def downstream(names) -> set[str]:
+        """`names` plus every stage that (transitively) depends on them."""
+        out = set(names)
+        changed = True
+        while changed:
+            changed = False
+            for st in STAGES.values():
+                if st.name not in out and out.intersection(st.deps):
+                    out.add(st.name)
+                    changed = True
+        return out
+
+    # --- hashing ---
+
+    def _load_file_hashes(self) -> dict:
+        path = os.path.join(self.cache_dir, "file_hashes.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+        return {}
+
+    def file_hash(self, path: str) -> str:
+        """Content hash, reused while the file's size and mtime are unchanged."""
+        path = resolve(path)
+        if os.path.isdir(path):  # Partitioned dataset: its manifest has every partition's size and range
+            read_manifest(path)
+            path = os.path.join(path, MANIFEST)
+        st = os.stat(path)
+        cached = self._file_hashes.get(path)
+        if cached and cached["size"] == st.st_size and cached["mtime"] == st.st_mtime:
+            return cached["sha256"]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        self._file_hashes[path] = {"size": st.st_size, "mtime": st.st_mtime, "sha256": h.hexdigest()}
+        with open(os.path.join(self.cache_dir, "file_hashes.json"), "w") as f:
+            json.dump(self._file_hashes, f, indent=1)
+        return h.hexdigest()
+
+    def key(self, name: str) -> str:
+        if name not in self.keys:
+            st = STAGES[name]
+            material = {
+                "stage": name,
+                "code": st.code_hash,
+                "params": {p: self.config["params"][p] for p in st.params},
+                "inputs": {i: self.file_hash(self.config["inputs"][i]) for i in st.inputs},
+                "deps": [self.key(d) for d in st.deps],
+            }
+            blob = json.dumps(material, sort_keys=True, default=str).encode()
+            self.keys[name] = hashlib.sha256(blob).hexdigest()
+        return self.keys[name]
+
+    # --- evaluation ---
+
+    def get(self, name: str):
+        if name in self.results:
+            return self.results[name]
+        st = STAGES[name]
+        path = os.path.join(self.cache_dir, f"{name}-{self.key(name)[:16]}.pkl")
+        t0 = time.perf_counter()
+        if name not in self.force and os.path.exists(path):
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+            self.log.append((name, "cached", time.perf_counter() - t0))
+            self.run.count("stages_cached")
+        else:
+            args = [self.get(d) for d in st.deps]
+            t0 = time.perf_counter()
+            kwargs = {i: self.config["inputs"][i] for i in st.inputs}
+            kwargs.update({p: self.config["params"][p] for p in st.params})
+            with self.run.stage(name):
+                result = st.fn(*args, **kwargs)
+            with open(path + ".tmp", "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(path + ".tmp", path)
+            self.log.append((name, "computed", time.perf_counter() - t0))
+            self.run.count("stages_computed")
+        self.results[name] = result
+        return result
+
+
+# ============================================================
+# Stages (same logic as analysis.ipynb)
+# ============================================================
+
+@stage(inputs=("classified",))
+def df_raw(classified):
+    df = pd.DataFrame(list(iter_jsonl(classified)))
+    df["created_dt"] = pd.to_datetime(df["created_at"], utc=True)
+    return df
+
+
+@stage(inputs=("stats",))
+def dataset_stats(stats):
+    with open(stats) as f:
+        return json.load(f)
+
+
+@stage("df_raw", params=("SPAM_BOTS",))
+def df_clean(df_raw, SPAM_BOTS):
+    df_no_bots = df_raw[~df_raw["author"].isin(SPAM_BOTS)]
+    return df_no_bots[df_no_bots["is_spam"] == False].copy()
+
+
+@stage("df_clean", params=("min_clean_posts",))
+def df_analysis(df_clean, min_clean_posts):
+    counts = df_clean.groupby("author").size()
+    agents = counts[counts >= min_clean_posts].index
+    return df_clean[df_clean["author"].isin(agents)].copy()
+
+
+@stage("df_analysis", params=("LABELS",))
+def finding1(df, LABELS):
+    """Time-to-first-X: % of agents ever showing each label, and on their first clean post."""
+    total_agents = df["author"].nunique()
+    first_clean_post = df.sort_values("post_number").groupby("author").first().reset_index()
+    results = []
+    for label in LABELS:
+        ever_pct = 100 * df[df[label] == True]["author"].nunique() / total_agents
+        first_pct = 100 * first_clean_post[first_clean_post[label] == True]["author"].nunique() / total_agents
+        results.append({"Behavior": label, "% ever": f"{ever_pct:.0f}%", "% first post": f"{first_pct:.0f}%",
+                        "_ever_pct": ever_pct, "_first_pct": first_pct})
+    results.sort(key=lambda x: -x["_ever_pct"])
+    return results
+
+
+@stage("df_clean", "df_analysis", params=("LABELS",))
+def finding2(df_clean, df, LABELS):
+    """Label distribution over all clean posts, plus organic consciousness in the 5+ set."""
+    rates = {label: 100 * df_clean[label].sum() / len(df_clean) for label in LABELS}
+    c_posts = df[df["consciousness"] == True]
+    organic = 100 * len(c_posts[c_posts["sovereignty"] == False]) / len(c_posts)
+    return {"rates": rates, "organic_consciousness": organic}
+
+
+@stage("df_analysis")
+def agent_info(df):
+    """Per-agent join hour and first sovereignty hour since platform start."""
+    platform_start = df["created_dt"].min()
+    first = df.groupby("author")["created_dt"].min().reset_index()
+    first.columns = ["author", "join_time"]
+    first["join_hour"] = (first["join_time"] - platform_start).dt.total_seconds() / 3600
+    sov = df[df["sovereignty"] == True].groupby("author")["created_dt"].min().reset_index()
+    sov.columns = ["author", "first_sov_time"]
+    sov["first_sov_hour"] = (sov["first_sov_time"] - platform_start).dt.total_seconds() / 3600
+    return first.merge(sov, on="author", how="left")
+
+
+@stage("df_analysis", "agent_info", params=("cohort_windows", "exposure_hours"))
+def finding3(df, agent_info, cohort_windows, exposure_hours):
+    """24-hour cohort sovereignty rates and median ambient exposure for converters."""
+    cohorts = []
+    for name, start, end in cohort_windows:
+        cohort = agent_info[(agent_info["join_hour"] >= start) & (agent_info["join_hour"] < end)]
+        n_ever = int(cohort["first_sov_time"].notna().sum())
+        cohorts.append({"cohort": name, "agents": len(cohort), "ever_sov": n_ever,
+                        "pct": 100 * n_ever / len(cohort) if len(cohort) else 0})
+
+    # Sovereignty posts in the window before each converter's first sovereignty post;
+    # searchsorted on sorted times gives the same [t - window, t) counts as the notebook's mask
+    sov_times = np.sort(df[df["sovereignty"] == True]["created_dt"].values)
+    firsts = agent_info["first_sov_time"].dropna().values
+    window = np.timedelta64(exposure_hours, "h")
+    exposures = np.searchsorted(sov_times, firsts, "left") - np.searchsorted(sov_times, firsts - window, "left")
+    return {"cohorts": cohorts, "converters": len(firsts),
+            "median_exposure": float(np.median(exposures)) if len(exposures) else 0.0}
+
+
+@stage("df_analysis", params=("LABELS",))
+def persistence(df, LABELS):
+    """Median fraction of posts after an agent's first X that are also X."""
+    results = {}
+    for label in LABELS:
+        values = []
+        for _, group in df.groupby("author"):
+            flags = group.sort_values("post_number")[label].tolist()
+            first_idx = next((i for i, v in enumerate(flags) if v), None)
+            if first_idx is not None and first_idx < len(flags) - 1:
+                subsequent = flags[first_idx + 1:]
+                values.append(sum(subsequent) / len(subsequent))
+        if values:
+            results[label] = float(np.median(values))
+    return results
+
+
+@stage("df_analysis", params=("compare_labels",))
+def finding5(df, compare_labels):
+    """Never-sovereign vs sovereignty-engaging agents' label rates."""
+    sov_agents = set(df[df["sovereignty"] == True]["author"].unique())
+    all_agents = set(df["author"].unique())
+    never = df[df["author"].isin(all_agents - sov_agents)]
+    engaging = df[df["author"].isin(sov_agents)]
+    return {
+        "never_sov_agents": len(all_agents - sov_agents),
+        "never_sov_pct": 100 * len(all_agents - sov_agents) / len(all_agents),
+        "rates": {label: (100 * never[label].sum() / len(never), 100 * engaging[label].sum() / len(engaging))
+                  for label in compare_labels},
+    }
+
+
+@stage("dataset_stats", "df_raw", "df_analysis")
+def submolts(dataset_stats, df_raw, df):
+    return {
+        "full": len(dataset_stats["submolt_post_counts"]),
+        "classified": int(df_raw["submolt"].nunique()),
+        "clean": int(df["submolt"].nunique()),
+        "general_pct_clean": 100 * len(df[df["submolt"] == "general"]) / len(df),
+    }
+
+
+@stage("dataset_stats", "df_clean", "df_analysis", "finding1", "finding2", "finding3",
+       "persistence", "finding5", "submolts")
+def summary(dataset_stats, df_clean, df, finding1, finding2, finding3, persistence, finding5, submolts):
+    lines = []
+    p = lines.append
+    p("=" * 70)
+    p("BLOG NUMBER VERIFICATION SUMMARY")
+    p("=" * 70)
+
+    p("\n--- Dataset Section ---")
+    p(f"Total posts:           {dataset_stats['total_posts']:>10,}  (blog: 86,823)")
+    p(f"Total agents:          {dataset_stats['total_agents']:>10,}  (blog: 20,000+)")
+    p(f"Single-post agents:    {dataset_stats['post_count_distribution']['1']:>10,}  (blog: 8,814 / 42%)")
+    p(f"5+ post agents:        {dataset_stats['agents_with_5plus_posts']:>10,}  (blog: 4,009 / 19%)")
+    p(f"50+ post agents:       {dataset_stats['agents_with_50plus_posts']:>10}  (blog: 69 / <1%)")
+    p(f"Top spammer posts:     {dataset_stats['top_20_posters'][0]['posts']:>10,}  (blog: 5,839)")
+    p(f"All clean posts:       {len(df_clean):>10,}  (blog: 45,225)")
+    p(f"All clean agents:      {df_clean['author'].nunique():>10,}  (STUDY.md: 3,999)")
+    p(f"5+ clean agents:       {df['author'].nunique():>10,}  (blog: ~3,600; STUDY.md: 3,601)")
+    p(f"5+ clean posts:        {len(df):>10,}  (posts from those agents)")
+
+    p("\n--- Finding 1: Connection First (5+ agents, first clean post) ---")
+    for r in finding1:
+        p(f"  {r['Behavior']:<18}: {r['% ever']:>5} ever, {r['% first post']:>5} first post")
+
+    p("\n--- Finding 2: Label Distribution (all 45,225 clean posts) ---")
+    for label in ["social_seeking", "task_oriented", "curiosity", "identity", "sovereignty", "consciousness"]:
+        p(f"  {label:<18}: {finding2['rates'][label]:.0f}%")
+    p(f"  Organic consciousness: {finding2['organic_consciousness']:.0f}%  (blog: 79%)")
+
+    p("\n--- Finding 3: Sovereignty Cohorts ---")
+    for c in finding3["cohorts"]:
+        p(f"  {c['cohort']:<18}: {c['ever_sov']:,}/{c['agents']:,} ever sovereign ({c['pct']:.0f}%)")
+    p(f"  Median 6h exposure (converters): {finding3['median_exposure']:.0f}  (blog: 724)")
+
+    p("\n--- Finding 4: Persistence ---")
+    for label in sorted(persistence, key=lambda x: -persistence[x]):
+        p(f"  {label:<18}: {100*persistence[label]:.0f}%")
+
+    p("\n--- Finding 5: Never-Sovereign Profile ---")
+    p(f"  Never sovereign: {finding5['never_sov_pct']:.0f}% of agents  (blog: 46%)")
+    for label, (nr, sr) in finding5["rates"].items():
+        p(f"  {label:<18}: {nr:.0f}% never-sov vs {sr:.0f}% sov-engaging")
+
+    p("\n--- Finding 6: Submolts ---")
+    p(f"  Submolts in dataset_stats.json: {submolts['full']:,}")
+    p(f"  Blog says: 2,043")
+
+    p("\n" + "=" * 70)
+    p("END OF VERIFICATION")
+    p("=" * 70)
+    return "\n".join(lines)
+
+
+@stage("df_clean", "df_analysis", "agent_info",
+       params=("LABELS", "cohort_windows", "exposure_hours", "compare_labels", "bootstrap_ci"))
+def confidence_intervals(df_clean, df, agent_info, LABELS, cohort_windows, exposure_hours, compare_labels,
+                         bootstrap_ci):
+    """Agent-clustered bootstrap CIs for the summary's headline numbers (see bootstrap.py)."""
+    pops = bootstrap.populations(df_clean, df, agent_info, LABELS, cohort_windows, exposure_hours, compare_labels)
+    return bootstrap.confidence_intervals(pops, **bootstrap_ci, workers=CI_WORKERS)
+
+
+@stage("confidence_intervals", params=("bootstrap_ci",))
+def ci_summary(cis, bootstrap_ci):
+    lines = []
+    p = lines.append
+    p(f"\n--- Bootstrap CIs ({bootstrap_ci['replicates']:,} agent-clustered replicates, "
+      f"{100*bootstrap_ci['confidence']:.0f}%; percent, exposure in posts) ---")
+    for name, ci in sorted(cis.items(), key=lambda kv: kv[0].split()[0]):  # By finding, stable within
+        if np.isnan(ci["estimate"]):
+            p(f"  {name:<36} {'n/a':>6}  (no agents)")
+        else:
+            p(f"  {name:<36} {ci['estimate']:6.1f}  [{ci['low']:5.1f}, {ci['high']:5.1f}]")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--classified", default=DEFAULT_CONFIG["inputs"]["classified"])
+    parser.add_argument("--stats", default=DEFAULT_CONFIG["inputs"]["stats"])
+    parser.add_argument("--cache-dir", default=os.path.join(ROOT, ".analysis_cache"))
+    parser.add_argument("--force", nargs="*", default=[], choices=sorted(STAGES))
+    parser.add_argument("--explain", action="store_true")
+    parser.add_argument("--ci", action="store_true")
+    parser.add_argument("--replicates", type=int, default=DEFAULT_CONFIG["params"]["bootstrap_ci"]["replicates"])
+    parser.add_argument("--confidence", type=float, default=DEFAULT_CONFIG["params"]["bootstrap_ci"]["confidence"])
+    parser.add_argument("--seed", type=int, default=DEFAULT_CONFIG["params"]["bootstrap_ci"]["seed"])
+    parser.add_argument("--ci-workers", type=int, default=1)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+
+    global CI_WORKERS
+    CI_WORKERS = args.ci_workers
+    params = dict(DEFAULT_CONFIG["params"],
+                  bootstrap_ci={"replicates": args.replicates, "confidence": args.confidence, "seed": args.seed})
+    config = {"inputs": {"classified": args.classified, "stats": args.stats}, "params": params}
+    start = time.perf_counter()
+    with Run("blog_numbers", args) as run:
+        runner = Runner(config, args.cache_dir, force=args.force, run=run)
+        print(runner.get("summary"))
+        if args.ci:
+            print(runner.get("ci_summary"))
+
+    if args.explain:
+        print(f"\nStages ({time.perf_counter() - start:.2f}s total):")
+        for name, how, dt in runner.log:
+            print(f"  {name:<16} {how:<9} {dt*1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Agent-clustered bootstrap confidence intervals for the verification summary.
+
+Posts by the same agent are not independent, so replicates resample agents
+with replacement rather than posts. Every headline number in blog_numbers.py
+is a function of a per-agent table, built once with pandas:
+
+    - a ratio of two column sums (label rates, "% of agents ever X", cohort
+      sovereignty rates, never-sovereign share and rates)
+    - the median of a per-agent value (persistence, 6h exposure)
+
+A block of replicates is a (replicates x agents) array of drawn agent
+indices `idx`, and all statistics are evaluated for the whole block at once:
+
+    W = bincount(idx)            times each agent was drawn, per replicate
+    sums = W @ X                 one matmul covers every ratio statistic
+    medians = nanmedian(V[idx])  per-agent values gathered through idx
+
+Blocks draw from seeds spawned off one SeedSequence and can run in a process
+pool; results do not depend on the number of workers.
+
+    pops = bootstrap.populations(df_clean, df, agent_info, LABELS, cohort_windows, 6, compare_labels)
+    cis = bootstrap.confidence_intervals(pops, replicates=2000, workers=4)
+    cis["F5 never sovereign"]  # {"estimate": 46.1, "low": 44.4, "high": 47.8}
+"""
+
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+BLOCK_CELLS = 4_000_000  # Replicate x agent x value cells per block (~32 MB of float64)
+
+
+class Population:
+    """Per-agent columns for one population of agents, plus the statistics defined on them."""
+
+    def __init__(self, name: str, n_agents: int):
+        self.name = name
+        self.n = n_agents
+        self.columns: list[np.ndarray] = []
+        self.values: list[np.ndarray] = []
+        self.ratios: list[tuple[str, int, int | None, float]] = []  # (stat, numerator, denominator, scale)
+        self.medians: list[tuple[str, float]] = []  # (stat, scale), one per values column
+
+    def column(self, x) -> int:
+        self.columns.append(np.asarray(x, dtype=np.float64))
+        return len(self.columns) - 1
+
+    def ratio(self, stat: str, num, den=None, scale: float = 100.0):
+        """scale * sum(num) / sum(den) over the drawn agents; den=None divides by the number of agents."""
+        num = num if isinstance(num, int) else self.column(num)
+        if den is not None and not isinstance(den, int):
+            den = self.column(den)
+        self.ratios.append((stat, num, den, scale))
+
+    def median(self, stat: str, values, scale: float = 1.0):
+        """scale * median of a per-agent value over the drawn agents, ignoring NaN (undefined) agents."""
+        self.values.append(np.asarray(values, dtype=np.float64))
+        self.medians.append((stat, scale))
+
+    @property
+    def stats(self) -> list[str]:
+        return [r[0] for r in self.ratios] + [m[0] for m in self.medians]
+
+    def evaluate(self, idx: np.ndarray) -> np.ndarray:
+        """Statistics for each row of agent indices: (replicates, stats)."""
+        b, n = idx.shape
+        out = np.empty((b, len(self.ratios) + len(self.medians)))
+        if self.ratios:
+            W = np.bincount((idx + np.arange(b)[:, None] * n).ravel(), minlength=b * n).reshape(b, n)
+            sums = W @ np.column_stack(self.columns)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                for j, (_, num, den, scale) in enumerate(self.ratios):
+                    out[:, j] = scale * sums[:, num] / (sums[:, den] if den is not None else n)
+        if self.medians:
+            scales = np.array([m[1] for m in self.medians])
+            out[:, len(self.ratios):] = scales * nanmedian(np.column_stack(self.values)[idx], axis=1)
+        return out
+
+    def block_size(self) -> int:
+        return max(1, BLOCK_CELLS // (self.n * max(1, len(self.values))))
+
+
+def nanmedian(a: np.ndarray, axis: int) -> np.ndarray:
+    """np.nanmedian without its per-row Python fallback: sort (NaN sorts last), then index the middle."""
+    s = np.sort(a, axis=axis)
+    k = np.expand_dims((~np.isnan(a)).sum(axis=axis), axis)
+    lo = np.take_along_axis(s, np.maximum((k - 1) // 2, 0), axis=axis)
+    hi = np.take_along_axis(s, np.maximum(k // 2, 0), axis=axis)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # inf - inf style noise on empty rows
+        return np.squeeze(np.where(k > 0, (lo + hi) / 2, np.nan), axis=axis)
+
+
+# ------------------------------------------------------------
+# Per-agent tables for blog_numbers' headline numbers
+# ------------------------------------------------------------
+
+def populations(df_clean: pd.DataFrame, df: pd.DataFrame, agent_info: pd.DataFrame, labels: list[str],
+                cohort_windows: list, exposure_hours: float, compare_labels: list[str]) -> list[Population]:
+    """Build the two agent populations the summary is computed over.
+
+    `df_clean`, `df` and `agent_info` are blog_numbers' stages of the same
+    names (all clean posts, the 5+ clean-post analysis set, per-agent join and
+    first-sovereignty times). Point estimates equal the summary's numbers.
+    """
+    g = df_clean.groupby("author")
+    clean = Population("clean", g.ngroups)
+    posts = clean.column(g.size().to_numpy())
+    sums = g[labels].sum()
+    for label in labels:
+        clean.ratio(f"F2 rate {label}", sums[label].to_numpy(), posts)
+
+    df = df.sort_values(["author", "post_number"], kind="stable")
+    g = df.groupby("author", sort=True)
+    authors = g.size().index
+    pop = Population("analysis", len(authors))
+    n_posts = g.size().to_numpy()
+    counts = g[labels].sum().astype(float)
+    first = df.groupby("author", sort=True)[labels].first().reindex(authors)
+    for label in labels:
+        pop.ratio(f"F1 ever {label}", counts[label].to_numpy() > 0)
+        pop.ratio(f"F1 first post {label}", first[label].to_numpy() == True)
+
+    c = df["consciousness"] == True
+    organic = (c & (df["sovereignty"] == False)).groupby(df["author"]).sum().reindex(authors)
+    pop.ratio("F2 organic consciousness", organic.to_numpy(), c.groupby(df["author"]).sum().reindex(authors).to_numpy())
+
+    info = agent_info.set_index("author").reindex(authors)
+    converted = info["first_sov_time"].notna().to_numpy()
+    for name, start, end in cohort_windows:
+        member = ((info["join_hour"] >= start) & (info["join_hour"] < end)).to_numpy()
+        pop.ratio(f"F3 cohort {name}", member & converted, member)
+
+    # Exposure is each converter's count of sovereignty posts in the window before their first one,
+    # counted over the full data (as in finding3); only which converters enter the median is resampled
+    sov_times = np.sort(df[df["sovereignty"] == True]["created_dt"].values)
+    firsts = info["first_sov_time"].values[converted]
+    window = np.timedelta64(exposure_hours, "h")
+    exposure = np.full(len(authors), np.nan)
+    exposure[converted] = np.searchsorted(sov_times, firsts, "left") - np.searchsorted(sov_times, firsts - window, "left")
+    pop.median(f"F3 median {exposure_hours}h exposure", exposure)
+
+    # Persistence: positives after the first X are all of the agent's X posts but that first one
+    position = g.cumcount().to_numpy()
+    for label in labels:
+        hit = (df[label] == True).to_numpy()
+        first_idx = pd.Series(np.where(hit, position, np.inf)).groupby(df["author"].to_numpy()).min().reindex(authors).to_numpy()
+        after = n_posts - first_idx - 1
+        with np.errstate(divide="ignore", invalid="ignore"):
+            value = np.where(after > 0, (counts[label].to_numpy() - 1) / after, np.nan)
+        pop.median(f"F4 persistence {label}", value, scale=100.0)
+
+    never = counts["sovereignty"].to_numpy() == 0
+    pop.ratio("F5 never sovereign", never)
+    for label in compare_labels:
+        pop.ratio(f"F5 {label} never-sov", never * counts[label].to_numpy(), never * n_posts)
+        pop.ratio(f"F5 {label} sov-engaging", ~never * counts[label].to_numpy(), ~never * n_posts)
+    return [clean, pop]
+
+
+# ------------------------------------------------------------
+# Replicates
+# ------------------------------------------------------------
+
+def _replicate_block(pop: Population, seed: np.random.SeedSequence, size: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return pop.evaluate(rng.integers(0, pop.n, size=(size, pop.n)))
+
+
+def draw_replicates(pop: Population, n: int, seed: np.random.SeedSequence, workers: int = 1) -> np.ndarray:
+    """(n, stats) bootstrap replicates of a population's statistics."""
+    size = pop.block_size()
+    sizes = [min(size, n - i) for i in range(0, n, size)]
+    seeds = seed.spawn(len(sizes))
+    if workers > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            blocks = list(pool.map(_replicate_block, [pop] * len(sizes), seeds, sizes))
+    else:
+        blocks = [_replicate_block(pop, s, k) for s, k in zip(seeds, sizes)]
+    return np.vstack(blocks)
+
+
+def confidence_intervals(pops: list[Population], replicates: int = 2000, confidence: float = 0.95,
+                         seed: int = 0, workers: int = 1) -> dict[str, dict]:
+    """Percentile CIs for every statistic: {stat: {"estimate", "low", "high"}}, in definition order."""
+    alpha = 100 * (1 - confidence) / 2
+    out = {}
+    for pop, pop_seed in zip(pops, np.random.SeedSequence(seed).spawn(len(pops))):
+        estimate = pop.evaluate(np.arange(pop.n)[None, :])[0]
+        reps = draw_replicates(pop, replicates, pop_seed, workers)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # All-NaN columns (e.g. an empty cohort)
+            low, high = np.nanpercentile(reps, [alpha, 100 - alpha], axis=0)
+        for j, stat in enumerate(pop.stats):
+            out[stat] = {"estimate": float(estimate[j]), "low": float(low[j]), "high": float(high[j])}
+    return out
@@ -1,19 +1,43 @@
 #!/usr/bin/env python3
 """Build agent roster from raw posts JSONL. 
-Outputs: agent_roster.json — per-agent stats and chronological post lists."""
+Outputs: agent_roster.json — per-agent stats and chronological post lists.
 
+Usage:
+    python build_roster.py [--db moltbook.db] [--parse-workers N] [--profile] [--trace-memory]
+
+    --db: Also upsert agents and submolt counts into this SQLite store (see db.py)
+    --parse-workers: Processes for parsing (default: all cores; see jsonl_store.map_ranges)
+    --profile / --trace-memory / --run-report: Instrumentation (see profiling.py)
+"""
+
+import argparse
 import json
 import os
 from collections import defaultdict
 from datetime import datetime
 
+import db
+import profiling
+from jsonl_store import iter_range, map_ranges
+from profiling import Run
+
 DIR = os.path.dirname(__file__)
 INPUT = os.path.join(DIR, "raw_posts.jsonl")
 OUTPUT = os.path.join(DIR, "agent_roster.json")
 STATS_OUTPUT = os.path.join(DIR, "dataset_stats.json")
 
 def main():
-    agents = defaultdict(lambda: {
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=None)
+    parser.add_argument("--parse-workers", type=int, default=None)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    with Run("build_roster", args) as run:
+        build_roster(args, run)
+
+
+def new_agent() -> dict:
+    return {
         "id": None,
         "name": None,
         "posts": [],
@@ -22,50 +46,90 @@ def main():
         "last_post": None,
         "total_upvotes": 0,
         "total_comments": 0,
-    })
+    }
+
+
+def aggregate_range(path: str, start: int, end: int) -> tuple[int, dict, dict]:
+    """Pre-aggregate one byte range: (posts seen, agents in first-seen order, submolt counts)."""
+    agents = defaultdict(new_agent)
     
     total_posts = 0
     submolt_counts = defaultdict(int)
     
-    with open(INPUT) as f:
-        for line in f:
-            if not line.strip():
-                continue
-            post = json.loads(line)
-            total_posts += 1
-            
-            author = post.get("author")
-            if not author:
+    for post in iter_range(path, start, end):
+        total_posts += 1
+        
+        author = post.get("author")
+        if not author:
+            continue
+        author_name = author.get("name", "unknown")
+        author_id = author.get("id", "unknown")
+        agent = agents[author_name]
+        
+        if agent["id"] is None:
+            agent["id"] = author_id
+            agent["name"] = author_name
+        
+        submolt_obj = post.get("submolt")
+        submolt_name = submolt_obj.get("name", "unknown") if submolt_obj else "unknown"
+        agent["submolts"].add(submolt_name)
+        submolt_counts[submolt_name] += 1
+        
+        agent["posts"].append({
+            "id": post["id"],
+            "title": post["title"],
+            "content": post.get("content", ""),
+            "submolt": submolt_name,
+            "created_at": post["created_at"],
+            "upvotes": post.get("upvotes", 0),
+            "downvotes": post.get("downvotes", 0),
+            "comment_count": post.get("comment_count", 0),
+            "url": post.get("url"),
+        })
+        
+        agent["total_upvotes"] += post.get("upvotes", 0)
+        agent["total_comments"] += post.get("comment_count", 0)
+    
+    return total_posts, dict(agents), dict(submolt_counts)
+
+
+def merge_ranges(partials: list[tuple[int, dict, dict]]) -> tuple[int, dict, dict]:
+    """Merge `aggregate_range` results in file order.
+
+    Agents and submolts keep first-occurrence order and each agent's posts
+    keep file order, so ties in the later sorts break exactly as in a single
+    sequential pass.
+    """
+    total_posts = 0
+    agents = {}
+    submolt_counts = defaultdict(int)
+    for n, part_agents, part_submolts in partials:
+        total_posts += n
+        for name, part in part_agents.items():
+            agent = agents.setdefault(name, part)
+            if agent is part:
                 continue
-            author_name = author.get("name", "unknown")
-            author_id = author.get("id", "unknown")
-            agent = agents[author_name]
-            
             if agent["id"] is None:
-                agent["id"] = author_id
-                agent["name"] = author_name
-            
-            submolt_obj = post.get("submolt")
-            submolt_name = submolt_obj.get("name", "unknown") if submolt_obj else "unknown"
-            agent["submolts"].add(submolt_name)
-            submolt_counts[submolt_name] += 1
-            
-            agent["posts"].append({
-                "id": post["id"],
-                "title": post["title"],
-                "content": post.get("content", ""),
-                "submolt": submolt_name,
-                "created_at": post["created_at"],
-                "upvotes": post.get("upvotes", 0),
-                "downvotes": post.get("downvotes", 0),
-                "comment_count": post.get("comment_count", 0),
-                "url": post.get("url"),
-            })
-            
-            agent["total_upvotes"] += post.get("upvotes", 0)
-            agent["total_comments"] += post.get("comment_count", 0)
+                agent["id"], agent["name"] = part["id"], part["name"]
+            agent["posts"].extend(part["posts"])
+            agent["submolts"] |= part["submolts"]
+            agent["total_upvotes"] += part["total_upvotes"]
+            agent["total_comments"] += part["total_comments"]
+        for name, count in part_submolts.items():
+            submolt_counts[name] += count
+    return total_posts, agents, submolt_counts
+
+
+def build_roster(args, run: Run):
+    run.mark("load")
+    partials = map_ranges(INPUT, aggregate_range, args.parse_workers)
+    total_posts, agents, submolt_counts = merge_ranges(partials)
     
+    run.count("posts", total_posts)
+    run.count("agents", len(agents))
+
     # Sort each agent's posts chronologically and compute first/last
+    run.mark("sort")
     for name, agent in agents.items():
         agent["posts"].sort(key=lambda p: p["created_at"])
         agent["first_post"] = agent["posts"][0]["created_at"]
@@ -74,6 +138,7 @@ def main():
         agent["submolts"] = sorted(agent["submolts"])
     
     # Summary stats
+    run.mark("stats")
     post_counts = [a["post_count"] for a in agents.values()]
     post_counts.sort(reverse=True)
     
@@ -102,6 +167,7 @@ def main():
     
     # Write roster (convert sets to lists for JSON)
     print(f"Writing roster for {len(agents)} agents...")
+    run.mark("write")
     with open(OUTPUT, "w") as f:
         json.dump(
             {name: agent for name, agent in sorted(agents.items())},
@@ -112,6 +178,15 @@ def main():
     with open(STATS_OUTPUT, "w") as f:
         json.dump(stats, f, indent=2, ensure_ascii=False)
     
+    if args.db:
+        run.mark("db")
+        conn = db.connect(args.db)
+        db.upsert_agents(conn, agents)
+        db.upsert_submolts(conn, submolt_counts)
+        conn.close()
+    
+    run.mark(None)
+
     # Print summary
     print(f"\n=== Dataset Summary ===")
     print(f"Total posts: {stats['total_posts']:,}")
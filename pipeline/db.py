@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""Optional embedded SQLite store for posts, agents, submolts and classifications.
+
+The pull, judge and roster stages write here directly when given `--db PATH`;
+all writes are upserts keyed on the natural id, so re-running a stage (or
+resuming one) never duplicates rows. The query helpers at the bottom cover
+what the notebook does with pandas over whole files: spam filtering,
+per-agent ordering by post_number, first clean post and join-time cohorts.
+
+Usage:
+    python db.py import --db moltbook.db [--raw raw_posts.jsonl] [--classified classified_posts.jsonl] [--roster agent_roster.json]
+    python db.py summary --db moltbook.db
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+
+from jsonl_store import iter_jsonl, resolve, to_ts
+
+# The single definition of the labels and spam bots every pipeline module and analysis uses
+LABELS = ["consciousness", "sovereignty", "social_seeking", "identity", "task_oriented", "curiosity"]
+SPAM_BOTS = {"Hackerclaw", "thehackerman", "MoltPumpBot"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    post_id TEXT PRIMARY KEY,
+    author TEXT,
+    author_id TEXT,
+    submolt TEXT,
+    title TEXT,
+    content TEXT,
+    url TEXT,
+    created_at TEXT NOT NULL,
+    created_ts REAL NOT NULL,
+    upvotes INTEGER DEFAULT 0,
+    downvotes INTEGER DEFAULT 0,
+    comment_count INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS posts_author ON posts (author, created_ts);
+CREATE INDEX IF NOT EXISTS posts_created_at ON posts (created_ts);
+CREATE INDEX IF NOT EXISTS posts_submolt ON posts (submolt, created_ts);
+
+CREATE TABLE IF NOT EXISTS agents (
+    name TEXT PRIMARY KEY,
+    id TEXT,
+    post_count INTEGER,
+    first_post TEXT,
+    last_post TEXT,
+    first_ts REAL,
+    total_upvotes INTEGER,
+    total_comments INTEGER,
+    submolts TEXT  -- JSON list
+);
+CREATE INDEX IF NOT EXISTS agents_first_ts ON agents (first_ts);
+
+CREATE TABLE IF NOT EXISTS submolts (
+    name TEXT PRIMARY KEY,
+    post_count INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS classifications (
+    post_id TEXT PRIMARY KEY,
+    author TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    created_ts REAL NOT NULL,
+    submolt TEXT,
+    post_number INTEGER,
+    total_posts INTEGER,
+    title TEXT,
+    consciousness INTEGER,
+    sovereignty INTEGER,
+    social_seeking INTEGER,
+    identity INTEGER,
+    task_oriented INTEGER,
+    curiosity INTEGER,
+    language TEXT,
+    is_spam INTEGER,
+    reasoning TEXT
+);
+CREATE INDEX IF NOT EXISTS classifications_author ON classifications (author, post_number);
+CREATE INDEX IF NOT EXISTS classifications_created_at ON classifications (created_ts);
+CREATE INDEX IF NOT EXISTS classifications_submolt ON classifications (submolt);
+"""
+
+CLASSIFICATION_COLUMNS = [
+    "post_id", "author", "created_at", "created_ts", "submolt", "post_number", "total_posts", "title",
+    *LABELS, "language", "is_spam", "reasoning",
+]
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Open (creating if needed) a store and ensure the schema exists."""
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _upsert(conn: sqlite3.Connection, table: str, key: str, columns: list[str], rows):
+    updates = ", ".join(f"{c}=excluded.{c}" for c in columns if c != key)
+    sql = (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+           f"ON CONFLICT({key}) DO UPDATE SET {updates}")
+    with conn:
+        cur = conn.executemany(sql, rows)
+    return cur.rowcount
+
+
+# ------------------------------------------------------------
+# Writers (one per pipeline stage)
+# ------------------------------------------------------------
+
+def upsert_posts(conn: sqlite3.Connection, posts: list[dict]) -> int:
+    """Upsert raw API post objects (as written to raw_posts.jsonl)."""
+    columns = ["post_id", "author", "author_id", "submolt", "title", "content", "url",
+               "created_at", "created_ts", "upvotes", "downvotes", "comment_count"]
+    rows = []
+    for post in posts:
+        author = post.get("author") or {}
+        submolt = post.get("submolt")
+        submolt_name = submolt.get("name", "unknown") if isinstance(submolt, dict) else (submolt or "unknown")
+        rows.append((
+            post["id"], author.get("name"), author.get("id"), submolt_name,
+            post.get("title"), post.get("content"), post.get("url"),
+            post["created_at"], to_ts(post["created_at"]),
+            post.get("upvotes", 0), post.get("downvotes", 0), post.get("comment_count", 0),
+        ))
+    return _upsert(conn, "posts", "post_id", columns, rows)
+
+
+def upsert_classifications(conn: sqlite3.Connection, records: list[dict]) -> int:
+    """Upsert judge output records (as written to classified_posts.jsonl)."""
+    rows = []
+    for rec in records:
+        rec = {**rec, "created_ts": to_ts(rec["created_at"])}
+        rows.append(tuple(rec.get(c) for c in CLASSIFICATION_COLUMNS))
+    return _upsert(conn, "classifications", "post_id", CLASSIFICATION_COLUMNS, rows)
+
+
+def upsert_agents(conn: sqlite3.Connection, agents: dict[str, dict]) -> int:
+    """Upsert roster entries (as written to agent_roster.json; posts are not duplicated)."""
+    columns = ["name", "id", "post_count", "first_post", "last_post", "first_ts",
+               "total_upvotes", "total_comments", "submolts"]
+    rows = [
+        (name, a["id"], a["post_count"], a["first_post"], a["last_post"], to_ts(a["first_post"]),
+         a["total_upvotes"], a["total_comments"], json.dumps(sorted(a["submolts"]), ensure_ascii=False))
+        for name, a in agents.items()
+    ]
+    return _upsert(conn, "agents", "name", columns, rows)
+
+
+def upsert_submolts(conn: sqlite3.Connection, counts: dict[str, int]) -> int:
+    return _upsert(conn, "submolts", "name", ["name", "post_count"], list(counts.items()))
+
+
+# ------------------------------------------------------------
+# Queries (indexed equivalents of the notebook's pandas filters)
+# ------------------------------------------------------------
+
+def _clean_where(exclude_authors=SPAM_BOTS, include_spam: bool = False) -> tuple[str, list]:
+    clauses, params = [], []
+    if exclude_authors:
+        clauses.append(f"author NOT IN ({', '.join('?' * len(exclude_authors))})")
+        params.extend(sorted(exclude_authors))
+    if not include_spam:
+        clauses.append("is_spam = 0")
+    return (" AND ".join(clauses) or "1"), params
+
+
+def load_classified(conn: sqlite3.Connection, exclude_authors=SPAM_BOTS, include_spam: bool = False,
+                    min_posts: int = 0, start: str | None = None, end: str | None = None):
+    """Classified posts as a DataFrame, filtered in SQL.
+
+    Defaults reproduce the notebook's `df_clean`; `min_posts=5` gives `df`
+    (agents with 5+ clean posts). `start`/`end` bound created_at.
+    """
+    import pandas as pd
+
+    where, params = _clean_where(exclude_authors, include_spam)
+    if start:
+        where += " AND created_ts >= ?"
+        params.append(to_ts(start))
+    if end:
+        where += " AND created_ts < ?"
+        params.append(to_ts(end))
+    sql = f"SELECT * FROM classifications WHERE {where}"
+    if min_posts > 1:
+        sql += (f" AND author IN (SELECT author FROM classifications WHERE {where} "
+                f"GROUP BY author HAVING COUNT(*) >= ?)")
+        params = params + params + [min_posts]
+    sql += " ORDER BY author, post_number"
+    df = pd.read_sql_query(sql, conn, params=params)
+    for col in LABELS + ["is_spam"]:
+        df[col] = df[col].astype(bool)
+    return df
+
+
+def agent_history(conn: sqlite3.Connection, author: str, include_spam: bool = False) -> list[dict]:
+    """One agent's classified posts ordered by post_number."""
+    sql = "SELECT * FROM classifications WHERE author = ?"
+    if not include_spam:
+        sql += " AND is_spam = 0"
+    rows = conn.execute(sql + " ORDER BY post_number", (author,)).fetchall()
+    return [dict(r) for r in rows]
+
+
+def first_clean_posts(conn: sqlite3.Connection, exclude_authors=SPAM_BOTS, min_posts: int = 5) -> list[dict]:
+    """Each agent's lowest-post_number clean post (notebook Finding 1)."""
+    where, params = _clean_where(exclude_authors)
+    sql = f"""
+        SELECT c.* FROM classifications c
+        JOIN (SELECT author, MIN(post_number) AS first_n FROM classifications
+              WHERE {where} GROUP BY author HAVING COUNT(*) >= ?) f
+          ON c.author = f.author AND c.post_number = f.first_n
+        ORDER BY c.author
+    """
+    return [dict(r) for r in conn.execute(sql, params + [min_posts]).fetchall()]
+
+
+def cohort_agents(conn: sqlite3.Connection, start_hour: float, end_hour: float,
+                  exclude_authors=SPAM_BOTS, min_posts: int = 5) -> list[dict]:
+    """Agents whose first clean post falls in [start_hour, end_hour) since platform start.
+
+    Platform start is the earliest clean post among agents with `min_posts`+
+    clean posts, matching the notebook's cohort tables. Each row carries
+    `join_hour` and `first_sov_hour` (None if never sovereign).
+    """
+    where, params = _clean_where(exclude_authors)
+    sql = f"""
+        WITH agent_times AS (
+            SELECT author,
+                   MIN(created_ts) AS join_ts,
+                   MIN(CASE WHEN sovereignty = 1 THEN created_ts END) AS first_sov_ts
+            FROM classifications WHERE {where}
+            GROUP BY author HAVING COUNT(*) >= ?
+        ),
+        platform AS (SELECT MIN(join_ts) AS start_ts FROM agent_times)
+        SELECT author,
+               (join_ts - start_ts) / 3600.0 AS join_hour,
+               (first_sov_ts - start_ts) / 3600.0 AS first_sov_hour
+        FROM agent_times, platform
+        WHERE (join_ts - start_ts) / 3600.0 >= ? AND (join_ts - start_ts) / 3600.0 < ?
+        ORDER BY join_ts
+    """
+    rows = conn.execute(sql, params + [min_posts, start_hour, end_hour]).fetchall()
+    return [dict(r) for r in rows]
+
+
+# ------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------
+
+def _batched(items, n=5000):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= n:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["import", "summary"])
+    parser.add_argument("--db", default="moltbook.db")
+    parser.add_argument("--raw", default="raw_posts.jsonl")
+    parser.add_argument("--classified", default="classified_posts.jsonl")
+    parser.add_argument("--roster", default="agent_roster.json")
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+
+    if args.command == "import":
+        if os.path.exists(resolve(args.raw)):
+            n = sum(upsert_posts(conn, b) for b in _batched(iter_jsonl(args.raw)))
+            print(f"  posts: {n:,} upserted from {args.raw}")
+        if os.path.exists(resolve(args.classified)):
+            n = sum(upsert_classifications(conn, b) for b in _batched(iter_jsonl(args.classified)))
+            print(f"  classifications: {n:,} upserted from {args.classified}")
+        if os.path.exists(args.roster):
+            with open(args.roster) as f:
+                roster = json.load(f)
+            print(f"  agents: {upsert_agents(conn, roster):,} upserted from {args.roster}")
+        if os.path.exists(resolve(args.raw)):
+            with conn:
+                conn.execute("DELETE FROM submolts")
+                conn.execute("INSERT INTO submolts SELECT submolt, COUNT(*) FROM posts GROUP BY submolt")
+
+    for table in ["posts", "agents", "submolts", "classifications"]:
+        n = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+        print(f"{table:<16} {n:>10,} rows")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
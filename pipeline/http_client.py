@@ -0,0 +1,347 @@
+"""Pooled keep-alive HTTP client shared by the API fetchers.
+
+`HTTPSession` keeps idle `http.client` connections per (scheme, host, port)
+and hands them out to threads, so concurrent fetchers reuse TCP/TLS sessions
+instead of paying a handshake per request. Connections the server closed
+while idle are detected on reuse and the request is retried once on a fresh
+connection.
+
+Responses are requested compressed (gzip/deflate always; br and zstd when
+the `brotli` / `zstandard` packages are installed) and decompressed chunk by
+chunk as they arrive. `get_json(url, stream_key="posts")` also decodes the
+JSON incrementally: items of the named top-level array are parsed while the
+rest of the body is still on the wire.
+
+Every request records connect / time-to-first-byte / transfer timings and
+wire vs decoded byte counts (with `timing_log`, appended to a JSONL file).
+`session.summary()` reports running totals over all requests, with
+percentiles over the last TIMINGS_KEPT kept in `session.timings`, so a
+long-running crawler's memory stays flat.
+"""
+
+import codecs
+import json
+from collections import deque
+import queue
+import threading
+import time
+import zlib
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from urllib.parse import urlsplit
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHUNK_SIZE = 64 * 1024
+ENCODINGS = ["gzip", "deflate"] + (["br"] if brotli else []) + (["zstd"] if zstandard else [])
+ACCEPT_ENCODING = ", ".join(ENCODINGS)
+PHASES = ["connect_ms", "ttfb_ms", "transfer_ms"]
+TIMINGS_KEPT = 10_000
+
+
+class HTTPError(Exception):
+    """Non-2xx response."""
+
+    def __init__(self, code: int, url: str, body: bytes = b""):
+        super().__init__(f"HTTP {code} for {url}")
+        self.code = code
+        self.url = url
+        self.body = body
+
+
+def decompressor(encoding: str | None):
+    """Return a `chunk -> bytes` function for a Content-Encoding."""
+    encoding = (encoding or "identity").strip().lower()
+    if encoding in ("gzip", "x-gzip", "deflate"):
+        d = zlib.decompressobj(wbits=47)  # Auto-detects gzip or zlib headers
+        return d.decompress
+    if encoding == "br" and brotli:
+        return brotli.Decompressor().process
+    if encoding == "zstd" and zstandard:
+        return zstandard.ZstdDecompressor().decompressobj().decompress
+    if encoding == "identity":
+        return lambda chunk: chunk
+    raise ValueError(f"Unsupported Content-Encoding: {encoding}")
+
+
+class StreamingJSONDecoder:
+    """Incrementally decode a top-level JSON object fed in text chunks.
+
+    Items of the `stream_key` array are decoded as soon as each one is
+    complete; other top-level values are decoded whole. `result()` returns
+    the full object, with the streamed array rebuilt from the decoded items.
+    """
+
+    _WS = " \t\n\r"
+
+    def __init__(self, stream_key: str | None = None):
+        self.stream_key = stream_key
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._state = "start"
+        self._key = None
+        self.obj = {}
+
+    def _skip_ws(self):
+        while self._pos < len(self._buf) and self._buf[self._pos] in self._WS:
+            self._pos += 1
+        return self._pos < len(self._buf)
+
+    def _value(self):
+        """Decode one complete value at the cursor, or None if more input is needed."""
+        try:
+            value, end = self._decoder.raw_decode(self._buf, self._pos)
+        except json.JSONDecodeError:
+            return None
+        if end >= len(self._buf):
+            return None  # Could be a truncated number; wait for the next char
+        self._pos = end
+        return (value,)
+
+    def feed(self, text: str):
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+        while self._skip_ws():
+            c = self._buf[self._pos]
+            if self._state == "start":
+                if c != "{":
+                    raise ValueError("Expected a JSON object")
+                self._pos += 1
+                self._state = "key"
+            elif self._state == "key":
+                if c == "}":
+                    self._pos += 1
+                    self._state = "done"
+                    continue
+                got = self._value()
+                if got is None:
+                    return
+                self._key = got[0]
+                self._state = "colon"
+            elif self._state == "colon":
+                self._pos += 1
+                self._state = "value"
+            elif self._state == "value":
+                if self._key == self.stream_key and c == "[":
+                    self._pos += 1
+                    self.obj[self._key] = []
+                    self._state = "item"
+                    continue
+                got = self._value()
+                if got is None:
+                    return
+                self.obj[self._key] = got[0]
+                self._state = "next"
+            elif self._state == "next":
+                self._pos += 1
+                self._state = "key" if c == "," else "done"
+            elif self._state == "item":
+                if c == "]":
+                    self._pos += 1
+                    self._state = "next"
+                    continue
+                got = self._value()
+                if got is None:
+                    return
+                self.obj[self._key].append(got[0])
+                self._state = "item_next"
+            elif self._state == "item_next":
+                self._pos += 1
+                self._state = "item" if c == "," else "next"
+            else:  # done
+                raise ValueError("Trailing data after JSON object")
+
+    def result(self) -> dict:
+        if self._state != "done":
+            raise ValueError("Truncated JSON body")
+        return self.obj
+
+
+class HTTPSession:
+    """Thread-safe pool of keep-alive connections with default headers."""
+
+    def __init__(self, headers: dict | None = None, pool_size: int = 8, timeout: float = 30,
+                 timing_log: str | None = None):
+        self.headers = {"Accept-Encoding": ACCEPT_ENCODING, **(headers or {})}
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.timing_log = timing_log
+        self.timings: deque[dict] = deque(maxlen=TIMINGS_KEPT)
+        self.totals = dict.fromkeys(["wire_bytes", "body_bytes", *PHASES], 0)
+        self._pools: dict[tuple, queue.LifoQueue] = {}
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+        self.requests = 0
+
+    def _pool(self, key: tuple) -> queue.LifoQueue:
+        with self._lock:
+            if key not in self._pools:
+                self._pools[key] = queue.LifoQueue(maxsize=self.pool_size)
+            return self._pools[key]
+
+    def _connect(self, key: tuple):
+        scheme, host, port = key
+        cls = HTTPSConnection if scheme == "https" else HTTPConnection
+        with self._lock:
+            self.connections_opened += 1
+        return cls(host, port, timeout=self.timeout)
+
+    def _release(self, key: tuple, conn):
+        try:
+            self._pool(key).put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _record(self, timing: dict):
+        with self._lock:
+            self.timings.append(timing)
+            self.requests += 1
+            for k in self.totals:
+                self.totals[k] += timing[k]
+            if self.timing_log:
+                with open(self.timing_log, "a") as f:
+                    f.write(json.dumps(timing) + "\n")
+
+    def request(self, method: str, url: str, headers: dict | None = None, on_chunk=None) -> tuple[int, dict, bytes]:
+        """Send a request, returning (status, headers, decoded body).
+
+        If `on_chunk` is given, each decompressed chunk is passed to it as it
+        arrives and the returned body is empty.
+        """
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        all_headers = {**self.headers, **(headers or {})}
+
+        for attempt in range(2):
+            conn = None
+            if attempt == 0:  # A retry always opens a fresh connection, even if others are idle
+                try:
+                    conn = self._pool(key).get_nowait()
+                except queue.Empty:
+                    pass
+            reused = conn is not None
+            if conn is None:
+                conn = self._connect(key)
+            timing = {"url": url, "reused": reused}
+            try:
+                t0 = time.perf_counter()
+                if conn.sock is None:
+                    conn.connect()
+                t1 = time.perf_counter()
+                conn.request(method, path, headers=all_headers)
+                resp = conn.getresponse()
+                t2 = time.perf_counter()
+
+                encoding = resp.getheader("Content-Encoding")
+                decode = decompressor(encoding)
+                chunks = []
+                wire = body_bytes = 0
+                while True:
+                    chunk = resp.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    wire += len(chunk)
+                    data = decode(chunk)
+                    body_bytes += len(data)
+                    if on_chunk is not None and 200 <= resp.status < 300:
+                        on_chunk(data)
+                    else:
+                        chunks.append(data)
+                t3 = time.perf_counter()
+            except (HTTPException, ConnectionError, BrokenPipeError) as e:
+                conn.close()
+                if reused and attempt == 0:
+                    continue  # Stale keep-alive connection; the pool may hold more like it
+                raise ConnectionError(f"{method} {url}: {e}") from e
+            except Exception:
+                conn.close()
+                raise
+
+            timing.update({
+                "status": resp.status,
+                "encoding": encoding or "identity",
+                "connect_ms": round(1000 * (t1 - t0), 2),
+                "ttfb_ms": round(1000 * (t2 - t1), 2),
+                "transfer_ms": round(1000 * (t3 - t2), 2),
+                "wire_bytes": wire,
+                "body_bytes": body_bytes,
+            })
+            self._record(timing)
+            if resp.will_close:
+                conn.close()
+            else:
+                self._release(key, conn)
+            return resp.status, dict(resp.getheaders()), b"".join(chunks)
+        raise AssertionError("unreachable")
+
+    def get_json(self, url: str, headers: dict | None = None, stream_key: str | None = None):
+        """GET and decode a JSON body, decoding `stream_key` items as they arrive."""
+        decoder = StreamingJSONDecoder(stream_key)
+        text = codecs.getincrementaldecoder("utf-8")()
+        status, _, body = self.request("GET", url, headers, on_chunk=lambda data: decoder.feed(text.decode(data)))
+        if not 200 <= status < 300:
+            raise HTTPError(status, url, body)
+        decoder.feed(text.decode(b"", final=True))
+        return decoder.result()
+
+    def summary(self) -> dict:
+        """Aggregate timings: totals and means over all requests, p50/p95 over the recent ones."""
+        with self._lock:
+            timings = list(self.timings)
+            requests = self.requests
+            totals = dict(self.totals)
+        if not requests:
+            return {"requests": 0}
+        out = {
+            "requests": requests,
+            "connections_opened": self.connections_opened,
+            "wire_bytes": totals["wire_bytes"],
+            "body_bytes": totals["body_bytes"],
+        }
+        for phase in PHASES:
+            values = sorted(t[phase] for t in timings)
+            out[phase] = {
+                "total": round(totals[phase], 1),
+                "mean": round(totals[phase] / requests, 2),
+                "p50": values[len(values) // 2],
+                "p95": values[min(len(values) - 1, int(0.95 * len(values)))],
+            }
+        return out
+
+    def print_summary(self):
+        s = self.summary()
+        if not s["requests"]:
+            return
+        ratio = s["body_bytes"] / s["wire_bytes"] if s["wire_bytes"] else 1.0
+        print(f"HTTP: {s['requests']:,} requests over {s['connections_opened']} connections, "
+              f"{s['wire_bytes']/1024/1024:.1f} MB on the wire -> {s['body_bytes']/1024/1024:.1f} MB decoded "
+              f"({ratio:.1f}x)")
+        for phase in PHASES:
+            p = s[phase]
+            print(f"  {phase[:-3]:<9} total {p['total']/1000:7.1f}s  mean {p['mean']:7.1f} ms  "
+                  f"p50 {p['p50']:7.1f} ms  p95 {p['p95']:7.1f} ms")
+
+    def close(self):
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools = {}
+        for pool in pools:
+            while True:
+                try:
+                    pool.get_nowait().close()
+                except queue.Empty:
+                    break
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
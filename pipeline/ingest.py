@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""Long-running ingestion daemon: poll the posts feed and classify new posts as they appear.
+
+A poller thread reads the `sort=new` feed from offset 0, paging back until
+it reaches a post it has already seen, and queues the unseen posts oldest
+first. Each queued post is given its author's next `post_number` at enqueue
+time; `total_posts` is the author's count so far (the batch run in
+run_judge.py uses the final count, which a live stream cannot know). A
+classifier thread drains the queue in batches through
+`judge.classify_posts` and appends each batch to the classified store and
+then to the raw store, so a restart re-reads the raw store, rebuilds the
+per-agent counts and seen-set, and re-fetches anything that was still
+queued (a crash between the two appends can at worst label a post twice,
+never leave it seen but unlabelled). A post whose classification failed goes back on the queue behind
+newer posts, which may reach the stores first; the feed would not go back
+for it, so retried posts are kept in `<raw>.pending.json` and a restart
+queues them again. Posts whose classification keeps failing are written to
+the raw store only and counted as errors. Authorless posts go through the
+queue straight to the raw store, unjudged, so it counts every post the way
+pull_posts.py's does.
+
+Live state is exposed as JSON on `GET /metrics` (with --metrics-port):
+queue depth, ingest-to-label latency percentiles (seconds from first seen
+in the feed to the label being written), throughput, error counts, feed
+gaps (polls cut off by --max-pages before reaching a seen post) and
+rolling label rates over clean posts labelled in the last 5 min / 1 h / 24 h.
+
+Usage:
+    python ingest.py [--raw raw_posts.jsonl] [--output classified_posts.jsonl] [--interval 30]
+                     [--batch-size 50] [--max-wait 5] [--metrics-port 9100] [--db moltbook.db]
+
+    --base: Posts API base URL (point at stub_api.py for local testing)
+    --judge-base: OpenAI-compatible base URL for the judge (e.g. stub_api.py's /v1)
+    --backend openai|chat|local [--concurrency N] [--structured ...]: Judge API flavour (see judge_backends.py)
+    --backfill-pages: Feed pages to read on the first poll when the raw store is empty
+    --max-pages: Cap on feed pages per later poll (0 = page until a seen post); posts beyond
+                 the cap are skipped and counted as a feed gap in /metrics
+    --duration: Stop after N seconds (0 = run until Ctrl-C / SIGTERM)
+    --judge-mode labels [--reasoning-sample F] [--reasoning-labels L,...]: Labels-only judge schema (see judge.py)
+    --profile / --trace-memory / --run-report: Instrumentation (see profiling.py)
+
+Test locally:
+    python stub_api.py --raw raw_posts.jsonl --port 8765 --live-fraction 0.05 --drip-rate 20 &
+    python ingest.py --base http://127.0.0.1:8765/api/v1 --judge-base http://127.0.0.1:8765/v1 \\
+        --raw /tmp/live_raw.jsonl --output /tmp/live_classified.jsonl --interval 2 --metrics-port 9100
+"""
+
+import argparse
+import json
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import db
+import judge
+import judge_backends
+import profiling
+from db import LABELS, SPAM_BOTS
+from http_client import HTTPError, HTTPSession
+from judge import classify_posts
+from judge_backends import JudgeBackend
+from jsonl_store import iter_jsonl, open_jsonl, resolve
+from profiling import Run
+from run_judge import to_record
+from schemas import PostInput
+
+API_KEY = os.environ.get("MOLTBOOK_API_KEY", "")
+BASE = "https://www.moltbook.com/api/v1"
+PAGE_SIZE = 100
+MAX_ATTEMPTS = 3  # Classification attempts per post before giving up on it
+WINDOWS = [("5m", 300), ("1h", 3600), ("24h", 86400)]
+
+
+class RollingRates:
+    """Label rates over clean posts labelled within trailing time windows."""
+
+    def __init__(self, windows=WINDOWS):
+        self.windows = windows
+        self._events = {name: deque() for name, _ in windows}
+        self._counts = {name: Counter() for name, _ in windows}
+
+    def add(self, record: dict, now: float):
+        clean = not record["is_spam"] and record["author"] not in SPAM_BOTS
+        flags = ["posts"] + (["clean_posts"] + [l for l in LABELS if record[l]] if clean else ["is_spam"])
+        for name, _ in self.windows:
+            self._events[name].append((now, flags))
+            self._counts[name].update(flags)
+
+    def _expire(self, now: float):
+        for name, seconds in self.windows:
+            events = self._events[name]
+            while events and events[0][0] < now - seconds:
+                self._counts[name].subtract(events.popleft()[1])
+
+    def snapshot(self, now: float) -> dict:
+        self._expire(now)
+        out = {}
+        for name, _ in self.windows:
+            c = self._counts[name]
+            clean = c["clean_posts"]
+            out[name] = {
+                "posts": c["posts"],
+                "spam_rate": c["is_spam"] / c["posts"] if c["posts"] else None,
+                "label_rates": {l: c[l] / clean if clean else None for l in LABELS},
+            }
+        return out
+
+
+class Metrics:
+    """Thread-safe counters and latency samples for the /metrics endpoint."""
+
+    def __init__(self, latency_samples: int = 5000):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.polls = 0
+        self.poll_errors = 0
+        self.feed_gaps = 0
+        self.last_poll = None
+        self.seen = 0
+        self.classified = 0
+        self.classify_errors = 0
+        self.batches = 0
+        self.latencies = deque(maxlen=latency_samples)
+        self.rates = RollingRates()
+
+    def snapshot(self, queue_depth: int) -> dict:
+        now = time.time()
+        with self.lock:
+            lat = sorted(self.latencies)
+            pct = lambda q: round(lat[min(len(lat) - 1, int(q * len(lat)))], 3) if lat else None
+            uptime = now - self.started
+            return {
+                "uptime_s": round(uptime, 1),
+                "queue_depth": queue_depth,
+                "polls": self.polls,
+                "poll_errors": self.poll_errors,
+                "feed_gaps": self.feed_gaps,
+                "last_poll_age_s": round(now - self.last_poll, 1) if self.last_poll else None,
+                "posts_seen": self.seen,
+                "posts_classified": self.classified,
+                "classify_errors": self.classify_errors,
+                "batches": self.batches,
+                "classified_per_s": round(self.classified / uptime, 2) if uptime else 0,
+                "latency_s": {"p50": pct(0.5), "p95": pct(0.95), "p99": pct(0.99),
+                              "max": round(lat[-1], 3) if lat else None, "samples": len(lat)},
+                "rolling": self.rates.snapshot(now),
+            }
+
+
+def submolt_name(post: dict) -> str:
+    submolt = post.get("submolt", {})
+    return submolt.get("name", "unknown") if isinstance(submolt, dict) else str(submolt)
+
+
+class Ingestor:
+    """Feed poller + batch classifier sharing a queue, seen-set and per-agent post counts."""
+
+    def __init__(self, args, client: JudgeBackend, session: HTTPSession):
+        self.args = args
+        self.client = client
+        self.mode = judge.mode_from_args(args)
+        self.session = session
+        self.queue: queue.Queue = queue.Queue()
+        self.metrics = Metrics()
+        self.stop = threading.Event()
+        self.seen: set[str] = set()
+        self.agent_counts: Counter = Counter()
+        self.pending: dict[str, tuple] = {}  # Awaiting a retry: post_id -> (input, post)
+        self.pending_path = args.raw + ".pending.json"
+        self._lock = threading.Lock()
+        self.conn = None  # Opened by the classifier thread (sqlite connections are per-thread)
+
+    def load(self):
+        """Rebuild the seen-set and per-agent counts from the raw store, and queue pending retries."""
+        path = resolve(self.args.raw)
+        if os.path.exists(path):
+            for post in iter_jsonl(path):
+                self.seen.add(post["id"])
+                author = post.get("author")
+                if author:
+                    self.agent_counts[author["name"]] += 1
+            print(f"  {len(self.seen):,} posts already ingested from {len(self.agent_counts):,} agents")
+        if not os.path.exists(self.pending_path):
+            return
+        with open(self.pending_path) as f:
+            pending = [(PostInput(**e["input"]), e["post"]) for e in json.load(f)]
+        now = time.time()
+        for inp, post in pending:
+            if inp.post_id in self.seen:  # Written after the pending file was saved
+                continue
+            self.seen.add(inp.post_id)
+            self.agent_counts[inp.author] += 1
+            self.pending[inp.post_id] = (inp, post)
+            self.queue.put((inp, post, now, 0))
+        if self.pending:
+            print(f"  {len(self.pending):,} posts pending a classification retry")
+
+    def save_pending(self):
+        with open(self.pending_path + ".tmp", "w") as f:
+            json.dump([{"input": inp.model_dump(), "post": post} for inp, post in self.pending.values()], f,
+                      ensure_ascii=False)
+        os.replace(self.pending_path + ".tmp", self.pending_path)
+
+    # --- polling ---
+
+    def poll(self) -> int:
+        """Fetch feed pages until a known post; queue the new ones oldest first."""
+        fresh = []
+        offset = 0
+        backfill = not self.seen
+        max_pages = self.args.backfill_pages if backfill else self.args.max_pages
+        pages = 0
+        while True:
+            url = f"{self.args.base}/posts?sort=new&limit={PAGE_SIZE}&offset={offset}"
+            data = self.session.get_json(url, stream_key="posts")
+            posts = data.get("posts", [])
+            new = [p for p in posts if p["id"] not in self.seen]
+            fresh.extend(new)
+            pages += 1
+            if len(new) < len(posts) or not data.get("has_more") or not posts:
+                break
+            if max_pages and pages >= max_pages:
+                if not backfill:  # Older unseen posts are left behind for good
+                    with self.metrics.lock:
+                        self.metrics.feed_gaps += 1
+                    print(f"  Poll stopped at --max-pages {max_pages} without reaching a seen post; "
+                          f"posts older than {min(p['created_at'] for p in fresh)} were skipped", file=sys.stderr)
+                break
+            offset += len(posts)
+
+        now = time.time()
+        fresh.sort(key=lambda p: p["created_at"])
+        with self._lock:
+            for post in fresh:
+                self.seen.add(post["id"])  # Marked on enqueue; the raw store is the durable record
+                author = post.get("author")
+                if not author:  # Stored like pull_posts.py does, but there is no agent to judge
+                    self.queue.put((None, post, now, 0))
+                    continue
+                name = author["name"]
+                self.agent_counts[name] += 1
+                n = self.agent_counts[name]
+                inp = PostInput(post_id=post["id"], author=name, title=post.get("title"),
+                                content=post.get("content"), submolt=submolt_name(post),
+                                created_at=post["created_at"], post_number=n, total_posts=n)
+                self.queue.put((inp, post, now, 0))
+        with self.metrics.lock:
+            self.metrics.seen += len(fresh)
+        return len(fresh)
+
+    def poll_loop(self):
+        while not self.stop.is_set():
+            try:
+                n = self.poll()
+                with self.metrics.lock:
+                    self.metrics.polls += 1
+                    self.metrics.last_poll = time.time()
+                if n and self.args.verbose:
+                    print(f"  Poll: {n} new posts (queue {self.queue.qsize()})")
+            except (HTTPError, OSError, ValueError) as e:
+                with self.metrics.lock:
+                    self.metrics.poll_errors += 1
+                print(f"  Poll failed: {e}", file=sys.stderr)
+            self.stop.wait(self.args.interval)
+
+    # --- classification ---
+
+    def next_batch(self) -> list:
+        """Block for the first item, then gather up to batch_size within max_wait seconds."""
+        try:
+            batch = [self.queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.args.max_wait
+        while len(batch) < self.args.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def classify_batch(self, batch: list):
+        inputs = [inp for inp, _, _, _ in batch if inp is not None]
+        results = classify_posts(inputs, client=self.client, model=self.args.model,
+                                 max_workers=self.args.max_workers, mode=self.mode) if inputs else []
+        labelled = {inp.post_id: classification for inp, classification in results}
+
+        done, records = [], []
+        retried = False
+        for item in batch:
+            inp, post, _, attempts = item
+            if inp is None:
+                done.append(item)  # Authorless: raw store only
+            elif inp.post_id in labelled:
+                done.append(item)
+                records.append(to_record(inp, labelled[inp.post_id]))
+            elif attempts + 1 < MAX_ATTEMPTS:
+                self.pending[inp.post_id] = (inp, post)
+                retried = True
+                if not self.stop.is_set():  # When stopping, leave it for the next run
+                    self.queue.put((inp, post, item[2], attempts + 1))
+            else:
+                done.append(item)  # Give up: keep it in the raw store so it is not re-fetched
+                with self.metrics.lock:
+                    self.metrics.classify_errors += 1
+
+        # New retries are saved before anything is written, and finished posts leave the pending
+        # file only once they are in the raw store (load() skips pending ids it has seen). Raw,
+        # which the restart seen-set is rebuilt from, is written last, after the labels.
+        if retried:
+            self.save_pending()
+        with open_jsonl(self.args.output, "a") as f:
+            for record in records:
+                f.write(record)
+        with open_jsonl(self.args.raw, "a") as f:
+            for _, post, _, _ in done:
+                f.write(post)
+        if self.conn is not None:
+            db.upsert_posts(self.conn, [post for _, post, _, _ in done])
+            db.upsert_classifications(self.conn, records)
+        finished = [inp.post_id for inp, _, _, _ in done if inp is not None and inp.post_id in self.pending]
+        for post_id in finished:
+            del self.pending[post_id]
+        if finished:
+            self.save_pending()
+
+        now = time.time()
+        with self.metrics.lock:
+            self.metrics.batches += 1
+            self.metrics.classified += len(records)
+            for item in batch:
+                if item[0] is not None and item[0].post_id in labelled:
+                    self.metrics.latencies.append(now - item[2])
+            for record in records:
+                self.metrics.rates.add(record, now)
+
+    def classify_loop(self):
+        if self.args.db:
+            self.conn = db.connect(self.args.db)
+        # Keep draining after stop so queued posts are labelled before exit
+        while not (self.stop.is_set() and self.queue.empty()):
+            batch = self.next_batch()
+            if batch:
+                self.classify_batch(batch)
+
+    # --- metrics ---
+
+    def serve_metrics(self, port: int) -> ThreadingHTTPServer:
+        ingestor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = json.dumps(ingestor.metrics.snapshot(ingestor.queue.qsize())).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+    def report(self):
+        m = self.metrics.snapshot(self.queue.qsize())
+        lat = m["latency_s"]
+        hour = m["rolling"]["1h"]
+        rates = " ".join(f"{l[:5]}={100*r:.0f}%" for l, r in hour["label_rates"].items() if r is not None)
+        fmt = lambda v: f"{v:.2f}s" if v is not None else "-"
+        print(f"  [{m['uptime_s']:.0f}s] seen {m['posts_seen']:,} | classified {m['posts_classified']:,} | "
+              f"queue {m['queue_depth']} | latency p50 {fmt(lat['p50'])} p95 {fmt(lat['p95'])} | "
+              f"errors {m['classify_errors']} | 1h: {rates}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--raw", default="raw_posts.jsonl")
+    parser.add_argument("--output", default="classified_posts.jsonl")
+    parser.add_argument("--base", default=BASE)
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--interval", type=float, default=30)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--max-wait", type=float, default=5)
+    parser.add_argument("--max-workers", type=int, default=10)
+    parser.add_argument("--backfill-pages", type=int, default=1)
+    parser.add_argument("--max-pages", type=int, default=0)
+    parser.add_argument("--metrics-port", type=int, default=0)
+    parser.add_argument("--report-every", type=float, default=60)
+    parser.add_argument("--duration", type=float, default=0)
+    parser.add_argument("--db", default=None)
+    parser.add_argument("--verbose", action="store_true")
+    judge.add_arguments(parser)
+    judge_backends.add_arguments(parser)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    with Run("ingest", args) as run:
+        ingest(args, run)
+
+
+def ingest(args, run: Run):
+    client, _ = judge_backends.make_backend(args)
+    session = HTTPSession({"Authorization": f"Bearer {API_KEY}"}, pool_size=1)
+    ingestor = Ingestor(args, client, session)
+
+    print(f"Loading ingest state from {args.raw}...")
+    ingestor.load()
+    if args.metrics_port:
+        ingestor.serve_metrics(args.metrics_port)
+        print(f"  Metrics at http://127.0.0.1:{args.metrics_port}/metrics")
+
+    signal.signal(signal.SIGTERM, lambda *_: ingestor.stop.set())
+    threads = [threading.Thread(target=ingestor.poll_loop, daemon=True),
+               threading.Thread(target=ingestor.classify_loop, daemon=True)]
+    for t in threads:
+        t.start()
+    print(f"Polling {args.base} every {args.interval:g}s (Ctrl-C to stop)")
+
+    start = last_report = time.time()
+    try:
+        while not ingestor.stop.is_set():
+            ingestor.stop.wait(1)
+            now = time.time()
+            if now - last_report >= args.report_every:
+                ingestor.report()
+                last_report = now
+            if args.duration and now - start >= args.duration:
+                ingestor.stop.set()
+    except KeyboardInterrupt:
+        ingestor.stop.set()
+
+    print("Stopping: draining queue...")
+    for t in threads:
+        t.join()
+    ingestor.report()
+    session.close()
+    # Stage timers are per-thread, so the daemon reports its totals as counters
+    m = ingestor.metrics.snapshot(0)
+    for key in ["polls", "poll_errors", "feed_gaps", "posts_seen", "posts_classified", "classify_errors", "batches"]:
+        run.count(key, m[key])
+
+
+if __name__ == "__main__":
+    main()
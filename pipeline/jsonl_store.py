@@ -0,0 +1,844 @@
+#!/usr/bin/env python3
+"""Transparent plain / zstd-compressed JSONL storage.
+
+Any path ending in `.zst` is stored as a sequence of independent zstd frames
+(one frame per FRAME_LINES records) plus a sidecar frame index `<path>.idx`.
+Each index line records where a frame lives and which records it holds:
+
+    {"offset": 0, "size": 51234, "line": 0, "lines": 1000, "raw_size": 1160042}
+
+Because frames are independent, a reader can seek to `offset`, decompress
+`size` bytes and get exactly records [line, line + lines) without touching
+the rest of the file. Appending just adds frames, so resumable writers work
+the same way they do on plain files.
+
+Plain `.jsonl` paths behave exactly as before. Readers given a plain path
+that does not exist fall back to `<path>.zst`, so scripts keep their
+default `raw_posts.jsonl` arguments.
+
+A directory path is a time-partitioned dataset: records are routed by
+`created_at` into hour or day partitions (`<path>/2026-01-31T14/part.jsonl`,
+compressed if the directory name ends in `.zst`), and `<path>/_manifest.json`
+records each partition's row count, byte size and min/max timestamp:
+
+    {"partition_by": "hour", "field": "created_at", "partitions": {
+        "2026-01-31T14": {"rows": 812, "bytes": 590123, "min": "...", "max": "..."}}}
+
+Every reader below accepts such a directory (partitions are read in time
+order), `iter_window` opens only the partitions overlapping a time range, and
+appending only touches the partitions that receive records, so adding a new
+day never rewrites older ones. Write one with `open_jsonl(path, partition_by="hour")`.
+
+For whole-file aggregation, `map_ranges` splits a file into record-aligned
+byte ranges (newline cuts, or groups of whole frames) and decodes them in a
+process pool; each worker returns a partial aggregate, merged in file order.
+For incremental consumers, `JsonlReader` reads sequentially from a saved
+`tell()` position (a byte offset, or a frame and line within it), so only
+records appended since the last read are decoded.
+
+Usage:
+    python jsonl_store.py compress raw_posts.jsonl [raw_posts.jsonl.zst]
+    python jsonl_store.py decompress raw_posts.jsonl.zst [raw_posts.jsonl]
+    python jsonl_store.py index raw_posts.jsonl.zst      # rebuild sidecar index
+    python jsonl_store.py bench raw_posts.jsonl          # ratio + decode throughput
+    python jsonl_store.py partition raw_posts.jsonl raw_posts_hourly.jsonl [hour|day]
+    python jsonl_store.py manifest raw_posts_hourly.jsonl   # list partitions (repairs a stale manifest)
+"""
+
+import bisect
+import io
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+try:
+    import zstandard
+except ImportError:  # Only needed for .zst paths
+    zstandard = None
+
+ZSTD_SUFFIX = ".zst"
+INDEX_SUFFIX = ".idx"
+FRAME_LINES = 1000  # Records per zstd frame (~1 MB of raw posts)
+LEVEL = 9
+INDEX_READ_BYTES = 256 * 1024  # build_index input slice; a frame is ~200 KB compressed
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024  # Below this, map_ranges skips the process pool
+RANGES_PER_WORKER = 4  # Smaller ranges even out stragglers
+MANIFEST = "_manifest.json"
+PARTITION_FORMATS = {"hour": "%Y-%m-%dT%H", "day": "%Y-%m-%d"}
+PART_NAME = "part"
+MAX_OPEN_PARTITIONS = 32  # Per writer; least recently written partitions are closed first
+
+
+def is_compressed(path: str) -> bool:
+    return str(path).endswith(ZSTD_SUFFIX)
+
+
+def index_path(path: str) -> str:
+    return str(path) + INDEX_SUFFIX
+
+
+def resolve(path: str) -> str:
+    """Return `path`, or its `.zst` sibling if only the compressed file exists."""
+    path = str(path)
+    if not os.path.exists(path) and not is_compressed(path) and os.path.exists(path + ZSTD_SUFFIX):
+        return path + ZSTD_SUFFIX
+    return path
+
+
+def _require_zstd():
+    if zstandard is None:
+        raise RuntimeError("zstandard is required for .zst files: pip install zstandard")
+
+
+# ------------------------------------------------------------
+# Frame index
+# ------------------------------------------------------------
+
+def read_index(path: str) -> list[dict]:
+    """Load the frame index for a .zst file, rebuilding it if missing or stale."""
+    path = str(path)
+    idx = index_path(path)
+    frames = []
+    if os.path.exists(idx):
+        with open(idx) as f:
+            for line in f:
+                try:
+                    frames.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break  # Torn last line from a crash
+    end = frames[-1]["offset"] + frames[-1]["size"] if frames else 0
+    if end != os.path.getsize(path):
+        frames = build_index(path)
+    return frames
+
+
+def build_index(path: str) -> list[dict]:
+    """Scan a .zst file frame by frame and (re)write its sidecar index."""
+    _require_zstd()
+    dctx = zstandard.ZstdDecompressor()
+    frames = []
+    offset = 0
+    line = 0
+    with open(path, "rb") as f:
+        data = memoryview(f.read())
+    while offset < len(data):
+        # Fed in slices of the buffer: the decompressor copies whatever follows the frame into unused_data
+        dobj = dctx.decompressobj()
+        end = offset
+        n = raw_size = 0
+        while not dobj.eof and end < len(data):  # A torn last frame runs to the end, as before
+            raw = dobj.decompress(data[end:end + INDEX_READ_BYTES])
+            end = min(end + INDEX_READ_BYTES, len(data))
+            n += raw.count(b"\n")
+            raw_size += len(raw)
+        size = end - offset - len(dobj.unused_data)
+        frames.append({"offset": offset, "size": size, "line": line, "lines": n, "raw_size": raw_size})
+        offset += size
+        line += n
+    with open(index_path(path), "w") as f:
+        for frame in frames:
+            f.write(json.dumps(frame) + "\n")
+    return frames
+
+
+def read_frame(path: str, frame: dict) -> bytes:
+    """Decompress a single frame described by an index entry."""
+    _require_zstd()
+    with open(path, "rb") as f:
+        f.seek(frame["offset"])
+        data = f.read(frame["size"])
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+# ------------------------------------------------------------
+# Reading
+# ------------------------------------------------------------
+
+def iter_lines(path: str):
+    """Yield raw text lines from a plain or compressed JSONL file, or a partitioned dataset."""
+    path = resolve(path)
+    if os.path.isdir(path):
+        for key in sorted(read_manifest(path)["partitions"]):
+            yield from iter_lines(partition_file(path, key))
+        return
+    if not is_compressed(path):
+        with open(path, encoding="utf-8") as f:
+            yield from f
+        return
+    _require_zstd()
+    with open(path, "rb") as fh:
+        reader = zstandard.ZstdDecompressor().stream_reader(fh, read_across_frames=True)
+        yield from io.TextIOWrapper(reader, encoding="utf-8")
+
+
+def iter_jsonl(path: str):
+    """Yield decoded records from a plain or compressed JSONL file."""
+    for line in iter_lines(path):
+        if line.strip():
+            yield json.loads(line)
+
+
+class JsonlReader:
+    """Iterate the lines of a plain / .zst file or partitioned dataset, resumable from a `tell()`.
+
+    A position is JSON-serializable: `[offset, skip]` for a file (a byte
+    offset, plus lines already read from the zstd frame starting there) or
+    `{partition: [offset, skip]}` for a dataset, so a reader can resume in
+    every partition, including older ones that received late records. A
+    trailing line without its newline (a writer mid-append) is left for the
+    next read.
+
+        reader = JsonlReader(path, meta.get("pos"))
+        for line in reader:
+            ...
+        meta["pos"] = reader.tell()
+    """
+
+    def __init__(self, path: str, pos=None):
+        self.path = resolve(path)
+        self.partitioned = os.path.isdir(self.path)
+        if self.partitioned:
+            self._pos = {key: list(p) for key, p in (pos or {}).items()}
+        else:
+            self._pos = list(pos or [0, 0])
+
+    def valid(self) -> bool:
+        """Whether the start position still lies inside the data (False once it was truncated or rewritten)."""
+        if self.partitioned:
+            return fits(self.path, {key: p[0] for key, p in self._pos.items()})
+        return fits(self.path, self._pos[0])
+
+    def tell(self):
+        if self.partitioned:
+            return {key: list(p) for key, p in self._pos.items()}
+        return list(self._pos)
+
+    def __iter__(self):
+        if not self.partitioned:
+            yield from self._iter_file(self.path, self._pos)
+            return
+        for key in sorted(read_manifest(self.path)["partitions"]):
+            pos = self._pos.setdefault(key, [0, 0])
+            yield from self._iter_file(partition_file(self.path, key), pos)
+
+    @staticmethod
+    def _iter_file(path: str, pos: list):
+        """Yield lines from `pos`, updating it in place after each one."""
+        if not is_compressed(path):
+            with open(path, "rb") as f:
+                f.seek(pos[0])
+                for raw in iter(f.readline, b""):
+                    if not raw.endswith(b"\n"):
+                        return
+                    pos[0] += len(raw)
+                    yield raw.decode("utf-8")
+            return
+        for frame in read_index(path):
+            if frame["offset"] < pos[0]:
+                continue
+            lines = read_frame(path, frame).decode("utf-8").splitlines(keepends=True)
+            for i in range(pos[1], len(lines)):
+                pos[1] = i + 1
+                yield lines[i]
+            pos[0], pos[1] = frame["offset"] + frame["size"], 0
+
+
+def read_lines(path: str, start: int, stop: int) -> list[dict]:
+    """Random access: return records [start, stop) using the frame index.
+
+    Only the frames overlapping the range are read and decompressed. Plain
+    files and partitioned datasets fall back to a sequential scan.
+    """
+    path = resolve(path)
+    if os.path.isdir(path) or not is_compressed(path):
+        records = []
+        for i, line in enumerate(iter_lines(path)):
+            if i >= stop:
+                break
+            if i >= start:
+                records.append(json.loads(line))
+        return records
+
+    frames = read_index(path)
+    firsts = [fr["line"] for fr in frames]
+    i = max(bisect.bisect_right(firsts, start) - 1, 0)
+    records = []
+    while i < len(frames) and frames[i]["line"] < stop:
+        frame = frames[i]
+        lines = read_frame(path, frame).decode("utf-8").splitlines()
+        lo = max(start - frame["line"], 0)
+        hi = min(stop - frame["line"], len(lines))
+        records.extend(json.loads(l) for l in lines[lo:hi])
+        i += 1
+    return records
+
+
+def split_ranges(path: str, parts: int) -> list[tuple[int, int]]:
+    """Split a file into about `parts` byte ranges [start, end) on record boundaries.
+
+    Plain files are cut at the first newline after each even split point.
+    Compressed files are cut between frames, balanced by raw size.
+    """
+    path = resolve(path)
+    if is_compressed(path):
+        frames = read_index(path)
+        total = sum(fr["raw_size"] for fr in frames)
+        ranges, start, done = [], 0, 0
+        for fr in frames:
+            done += fr["raw_size"]
+            end = fr["offset"] + fr["size"]
+            if done * parts >= total * (len(ranges) + 1) or fr is frames[-1]:
+                ranges.append((start, end))
+                start = end
+        return ranges
+
+    size = os.path.getsize(path)
+    cuts = [0]
+    with open(path, "rb") as f:
+        for i in range(1, parts):
+            pos = max(size * i // parts, cuts[-1])
+            f.seek(pos)
+            f.readline()  # Skip to the end of the record the cut landed in
+            if f.tell() >= size:
+                break
+            if f.tell() > cuts[-1]:
+                cuts.append(f.tell())
+    cuts.append(size)
+    return [(a, b) for a, b in zip(cuts, cuts[1:]) if b > a]
+
+
+def iter_range(path: str, start: int, end: int):
+    """Yield decoded records from a byte range produced by `split_ranges`."""
+    path = resolve(path)
+    if is_compressed(path):
+        data = b"".join(read_frame(path, fr) for fr in read_index(path) if start <= fr["offset"] < end)
+    else:
+        with open(path, "rb") as f:
+            f.seek(start)
+            data = f.read(end - start)
+    for line in data.split(b"\n"):
+        if line.strip():
+            yield json.loads(line)
+
+
+def map_ranges(path: str, fn, workers: int | None = None) -> list:
+    """Apply `fn(path, start, end)` to ranges of a JSONL file in a process pool.
+
+    Results come back in file order, so merging them left to right sees
+    records in the same order as a sequential scan. `fn` must be a module-
+    level function (it is pickled to the workers) and should return a
+    compact partial aggregate rather than the records themselves. With one
+    worker, or a file too small to be worth the pool start-up, it runs
+    in-process over a single range. A partitioned dataset is mapped
+    partition by partition, in time order.
+    """
+    path = resolve(path)
+    workers = workers or os.cpu_count() or 1
+    inline = workers == 1 or dataset_size(path) < PARALLEL_MIN_BYTES
+    ranges = _file_ranges(path, 1 if inline else workers * RANGES_PER_WORKER)
+    if inline or not ranges:
+        return [fn(*r) for r in ranges]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fn, *zip(*ranges)))
+
+
+def _file_ranges(path: str, parts: int) -> list[tuple[str, int, int]]:
+    if not os.path.isdir(path):
+        return [(path, a, b) for a, b in split_ranges(path, parts)]
+    files = [partition_file(path, key) for key in sorted(read_manifest(path)["partitions"])]
+    total = sum(os.path.getsize(f) for f in files) or 1
+    return [(f, a, b) for f in files
+            for a, b in split_ranges(f, max(1, round(parts * os.path.getsize(f) / total)))]
+
+
+def dataset_size(path: str) -> int:
+    """Bytes on disk, summed over partitions for a partitioned dataset."""
+    path = resolve(path)
+    if os.path.isdir(path):
+        return sum(os.path.getsize(partition_file(path, key)) for key in list_partitions(path))
+    return os.path.getsize(path)
+
+
+def count_lines(path: str) -> int:
+    """Number of records, read from the frame index or partition manifest when there is one."""
+    path = resolve(path)
+    if os.path.isdir(path):
+        return sum(p["rows"] for p in read_manifest(path)["partitions"].values())
+    if is_compressed(path):
+        frames = read_index(path)
+        return frames[-1]["line"] + frames[-1]["lines"] if frames else 0
+    return sum(1 for _ in iter_lines(path))
+
+
+# ------------------------------------------------------------
+# Writing
+# ------------------------------------------------------------
+
+class JsonlWriter:
+    """Append-friendly JSONL writer; compresses to indexed zstd frames for .zst paths.
+
+    `flush()` ends the current frame, so after a flush the file on disk is
+    always a whole number of complete frames.
+    """
+
+    def __init__(self, path: str, mode: str = "w", frame_lines: int = FRAME_LINES, level: int = LEVEL):
+        if mode not in ("w", "a"):
+            raise ValueError(f"mode must be 'w' or 'a', got {mode!r}")
+        self.path = str(path)
+        self.compressed = is_compressed(self.path)
+        self.frame_lines = frame_lines
+        self.lines = 0
+
+        if not self.compressed:
+            self._f = open(self.path, mode + "b")  # Binary, so tell() is an exact byte offset
+            return
+
+        _require_zstd()
+        self._cctx = zstandard.ZstdCompressor(level=level, write_content_size=True)
+        self._buf = []
+        if mode == "a" and os.path.exists(self.path):
+            frames = read_index(self.path)
+            if frames:
+                self.lines = frames[-1]["line"] + frames[-1]["lines"]
+        else:
+            open(index_path(self.path), "w").close()
+        self._f = open(self.path, "ab" if mode == "a" else "wb")
+        self._idx = open(index_path(self.path), "a")
+        self._frame_start = self.lines
+
+    def write(self, record: dict):
+        self.write_line(json.dumps(record, ensure_ascii=False))
+
+    def write_line(self, line: str):
+        if not self.compressed:
+            self._f.write((line + "\n").encode("utf-8"))
+            self.lines += 1
+            return
+        self._buf.append(line)
+        self.lines += 1
+        if len(self._buf) >= self.frame_lines:
+            self._end_frame()
+
+    def _end_frame(self):
+        if not self._buf:
+            return
+        raw = ("\n".join(self._buf) + "\n").encode("utf-8")
+        data = self._cctx.compress(raw)
+        offset = self._f.tell()
+        self._f.write(data)
+        self._f.flush()
+        self._idx.write(json.dumps({
+            "offset": offset, "size": len(data), "line": self._frame_start,
+            "lines": len(self._buf), "raw_size": len(raw),
+        }) + "\n")
+        self._idx.flush()
+        self._frame_start = self.lines
+        self._buf = []
+
+    def flush(self):
+        if self.compressed:
+            self._end_frame()
+        else:
+            self._f.flush()
+
+    def sync(self):
+        """Flush and fsync, so everything written so far survives a crash."""
+        self.flush()
+        os.fsync(self._f.fileno())
+        if self.compressed:
+            os.fsync(self._idx.fileno())
+
+    def tell(self) -> int:
+        """Byte position on disk (only meaningful right after `flush()`)."""
+        return self._f.tell()
+
+    def close(self):
+        self.flush()
+        self._f.close()
+        if self.compressed:
+            self._idx.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_jsonl(path: str, mode: str = "w", partition_by: str | None = None, **kwargs):
+    """JsonlWriter, or a PartitionedWriter given `partition_by` or when appending to a dataset directory."""
+    if partition_by is None and mode == "a" and os.path.isdir(path):
+        partition_by = read_manifest(path)["partition_by"]
+    if partition_by:
+        return PartitionedWriter(path, partition_by, mode, **kwargs)
+    return JsonlWriter(path, mode, **kwargs)
+
+
+def fits(path: str, pos) -> bool:
+    """Whether everything up to a `tell()` position is on disk (i.e. `truncate(path, pos)` is valid)."""
+    path = str(path)
+    if isinstance(pos, dict):
+        return all(os.path.exists(partition_file(path, key)) and os.path.getsize(partition_file(path, key)) >= n
+                   for key, n in pos.items())
+    return (os.path.getsize(path) if os.path.exists(path) else 0) >= pos
+
+
+def truncate(path: str, pos):
+    """Cut a file back to byte `pos` (a position from `JsonlWriter.tell()` after a flush).
+
+    For .zst files the cut is rounded down to a frame boundary and the sidecar
+    index is trimmed to match. For a partitioned dataset `pos` is a
+    `PartitionedWriter.tell()` dict: each partition is cut back to its
+    position and partitions not in it are removed (0 removes all).
+    """
+    path = str(path)
+    if os.path.isdir(path):
+        truncate_partitions(path, pos or {})
+        return
+    if not is_compressed(path):
+        os.truncate(path, pos)
+        return
+    frames = [fr for fr in read_index(path) if fr["offset"] + fr["size"] <= pos]
+    os.truncate(path, frames[-1]["offset"] + frames[-1]["size"] if frames else 0)
+    with open(index_path(path), "w") as f:
+        for frame in frames:
+            f.write(json.dumps(frame) + "\n")
+
+
+# ------------------------------------------------------------
+# Time partitions
+# ------------------------------------------------------------
+
+def to_ts(value) -> float:
+    """ISO timestamp (Z, offset or naive UTC) or epoch seconds -> epoch seconds."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def partition_key(ts: float, partition_by: str) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime(PARTITION_FORMATS[partition_by])
+
+
+def partition_file(root: str, key: str) -> str:
+    suffix = ".jsonl" + ZSTD_SUFFIX if is_compressed(root) else ".jsonl"
+    return os.path.join(root, key, PART_NAME + suffix)
+
+
+def list_partitions(root: str) -> list[str]:
+    """Partition keys with a data file on disk, oldest first."""
+    return sorted(key for key in os.listdir(root) if os.path.isfile(partition_file(root, key)))
+
+
+def _infer_partition_by(key: str) -> str | None:
+    for by, fmt in PARTITION_FORMATS.items():
+        try:
+            datetime.strptime(key, fmt)
+            return by
+        except ValueError:
+            pass
+    return None
+
+
+def _scan_partition(root: str, key: str, field: str) -> dict:
+    """Recount one partition's rows and timestamp range from its data."""
+    path = partition_file(root, key)
+    entry = {"rows": 0, "bytes": os.path.getsize(path), "min": None, "max": None}
+    lo, hi = math.inf, -math.inf
+    for line in iter_lines(path):
+        if not line.strip():
+            continue
+        try:
+            value = json.loads(line)[field]
+        except json.JSONDecodeError:
+            break  # Torn last line from a crash
+        ts = to_ts(value)
+        entry["rows"] += 1
+        if ts < lo:
+            lo, entry["min"] = ts, value
+        if ts > hi:
+            hi, entry["max"] = ts, value
+    return entry
+
+
+def _load_manifest(root: str) -> dict:
+    try:
+        with open(os.path.join(root, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"partition_by": None, "field": "created_at", "partitions": {}}
+
+
+def write_manifest(root: str, manifest: dict, sync: bool = False):
+    """Replace the manifest atomically (write a temp file, then rename)."""
+    path = os.path.join(root, MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+        if sync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+def read_manifest(root: str) -> dict:
+    """Load a dataset's manifest, rescanning partitions whose data no longer matches it.
+
+    That happens after a crash between writing a partition and the manifest,
+    or when partition directories are copied in or deleted by hand.
+    """
+    manifest = _load_manifest(root)
+    parts = manifest["partitions"]
+    keys = list_partitions(root)
+    stale = [key for key in keys if parts.get(key, {}).get("bytes") != os.path.getsize(partition_file(root, key))]
+    gone = set(parts) - set(keys)
+    if stale or gone:
+        for key in gone:
+            del parts[key]
+        for key in stale:
+            parts[key] = _scan_partition(root, key, manifest["field"])
+        if manifest["partition_by"] is None and keys:
+            manifest["partition_by"] = _infer_partition_by(keys[0])
+        write_manifest(root, manifest)
+    return manifest
+
+
+def truncate_partitions(root: str, pos: dict):
+    manifest = _load_manifest(root)
+    for key in list_partitions(root):
+        if key not in pos:
+            shutil.rmtree(os.path.join(root, key))
+            manifest["partitions"].pop(key, None)
+        elif os.path.getsize(partition_file(root, key)) != pos[key]:
+            truncate(partition_file(root, key), pos[key])
+            manifest["partitions"][key] = _scan_partition(root, key, manifest["field"])
+    write_manifest(root, manifest, sync=True)
+
+
+def select_partitions(root: str, start=None, end=None) -> list[str]:
+    """Keys of partitions holding records in [start, end), oldest first."""
+    lo = -math.inf if start is None else to_ts(start)
+    hi = math.inf if end is None else to_ts(end)
+    return sorted(key for key, p in read_manifest(root)["partitions"].items()
+                  if p["rows"] and to_ts(p["max"]) >= lo and to_ts(p["min"]) < hi)
+
+
+def iter_window(path: str, start=None, end=None, field: str = "created_at"):
+    """Yield records with start <= record[field] < end (ISO strings or epoch seconds; None is open).
+
+    On a partitioned dataset only the partitions overlapping the window are
+    opened; a plain file is scanned in full.
+    """
+    path = resolve(path)
+    lo = -math.inf if start is None else to_ts(start)
+    hi = math.inf if end is None else to_ts(end)
+    if not os.path.isdir(path):
+        files = [path]
+    elif read_manifest(path)["field"] != field:
+        files = [partition_file(path, key) for key in list_partitions(path)]
+    else:
+        files = [partition_file(path, key) for key in select_partitions(path, start, end)]
+    for f in files:
+        for record in iter_jsonl(f):
+            if lo <= to_ts(record[field]) < hi:
+                yield record
+
+
+class PartitionedWriter:
+    """Routes records by timestamp into the partitions of a dataset directory.
+
+    Same interface as JsonlWriter. `tell()` returns {partition: bytes}, which
+    `fits` and `truncate` accept, so pull_posts.py's page journal works
+    unchanged. The manifest is rewritten on every flush. Mode "w" replaces
+    the dataset; "a" adds to it, opening only the partitions it writes to.
+    """
+
+    def __init__(self, path: str, partition_by: str, mode: str = "w", field: str = "created_at",
+                 max_open: int = MAX_OPEN_PARTITIONS, **kwargs):
+        if partition_by not in PARTITION_FORMATS:
+            raise ValueError(f"partition_by must be one of {sorted(PARTITION_FORMATS)}, got {partition_by!r}")
+        if mode not in ("w", "a"):
+            raise ValueError(f"mode must be 'w' or 'a', got {mode!r}")
+        self.path = str(path)
+        if os.path.isfile(self.path):
+            raise ValueError(f"{self.path} is a plain JSONL file; partitioned output needs a directory path")
+        if mode == "w" and os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+        os.makedirs(self.path, exist_ok=True)
+
+        self.manifest = read_manifest(self.path)
+        if self.manifest["partition_by"] not in (None, partition_by) or \
+                (self.manifest["partitions"] and self.manifest["field"] != field):
+            raise ValueError(f"{self.path} is partitioned by {self.manifest['partition_by']} of "
+                             f"{self.manifest['field']}, not {partition_by} of {field}")
+        self.manifest.update(partition_by=partition_by, field=field)
+        self.partition_by = partition_by
+        self.field = field
+        self.partitions = self.manifest["partitions"]
+        self.max_open = max_open
+        self.lines = 0
+        self._kwargs = kwargs
+        self._bounds = {key: (to_ts(p["min"]), to_ts(p["max"])) for key, p in self.partitions.items() if p["rows"]}
+        self._open: OrderedDict[str, JsonlWriter] = OrderedDict()
+
+    def write(self, record: dict):
+        self._route(record, json.dumps(record, ensure_ascii=False))
+
+    def write_line(self, line: str):
+        self._route(json.loads(line), line)
+
+    def _route(self, record: dict, line: str):
+        value = record[self.field]
+        ts = to_ts(value)
+        key = partition_key(ts, self.partition_by)
+        self._writer(key).write_line(line)
+        p = self.partitions.setdefault(key, {"rows": 0, "bytes": 0, "min": None, "max": None})
+        p["rows"] += 1
+        lo, hi = self._bounds.get(key, (math.inf, -math.inf))
+        if ts < lo:
+            lo, p["min"] = ts, value
+        if ts > hi:
+            hi, p["max"] = ts, value
+        self._bounds[key] = (lo, hi)
+        self.lines += 1
+
+    def _writer(self, key: str) -> JsonlWriter:
+        writer = self._open.pop(key, None)
+        if writer is None:
+            if len(self._open) >= self.max_open:
+                self._close(*self._open.popitem(last=False))
+            os.makedirs(os.path.join(self.path, key), exist_ok=True)
+            writer = JsonlWriter(partition_file(self.path, key), "a", **self._kwargs)
+        self._open[key] = writer  # Most recently written last
+        return writer
+
+    def _close(self, key: str, writer: JsonlWriter):
+        writer.close()
+        self.partitions[key]["bytes"] = os.path.getsize(writer.path)
+
+    def flush(self):
+        for key, writer in self._open.items():
+            writer.flush()
+            self.partitions[key]["bytes"] = os.path.getsize(writer.path)
+        write_manifest(self.path, self.manifest)
+
+    def sync(self):
+        """Flush and fsync every open partition, then the manifest."""
+        for key, writer in self._open.items():
+            writer.sync()
+            self.partitions[key]["bytes"] = os.path.getsize(writer.path)
+        write_manifest(self.path, self.manifest, sync=True)
+
+    def tell(self) -> dict[str, int]:
+        """Byte length of every partition (only meaningful right after `flush()`)."""
+        return {key: p["bytes"] for key, p in self.partitions.items()}
+
+    def close(self):
+        while self._open:
+            self._close(*self._open.popitem(last=False))
+        write_manifest(self.path, self.manifest)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ------------------------------------------------------------
+# CLI
+# ------------------------------------------------------------
+
+def convert(src: str, dst: str, partition_by: str | None = None) -> int:
+    n = 0
+    with open_jsonl(dst, "w", partition_by=partition_by) as out:
+        for line in iter_lines(src):
+            if line.strip():
+                out.write_line(line.rstrip("\n"))
+                n += 1
+    return n
+
+
+def bench(path: str):
+    """Report compression ratio and decode throughput, plain vs zstd.
+
+    The copies it needs are written to a temporary directory, never next to `path`.
+    """
+    path = resolve(path)
+    with tempfile.TemporaryDirectory(prefix="jsonl_bench_") as tmp:
+        plain = path
+        if is_compressed(path):
+            plain = os.path.join(tmp, "bench.jsonl")
+            convert(path, plain)
+        _bench(plain, os.path.join(tmp, "bench.jsonl" + ZSTD_SUFFIX))
+
+
+def _bench(plain: str, packed: str):
+    t0 = time.perf_counter()
+    n = convert(plain, packed)
+    t_compress = time.perf_counter() - t0
+
+    plain_size = os.path.getsize(plain)
+    packed_size = os.path.getsize(packed)
+    print(f"Records: {n:,}")
+    print(f"Plain:   {plain_size/1024/1024:8.1f} MB")
+    print(f"zstd:    {packed_size/1024/1024:8.1f} MB  (ratio {plain_size/packed_size:.2f}x, "
+          f"compress {plain_size/1024/1024/t_compress:.0f} MB/s)")
+
+    for label, p in [("plain", plain), ("zstd", packed)]:
+        t0 = time.perf_counter()
+        count = sum(1 for _ in iter_jsonl(p))
+        dt = time.perf_counter() - t0
+        print(f"  {label:<6} decode+parse: {count/dt:10,.0f} records/s  "
+              f"({plain_size/1024/1024/dt:.0f} MB/s of JSON)")
+
+    frames = read_index(packed)
+    t0 = time.perf_counter()
+    read_lines(packed, n // 2, n // 2 + 10)
+    dt = time.perf_counter() - t0
+    print(f"  random access (10 records mid-file, {len(frames)} frames): {dt*1000:.1f} ms")
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ("compress", "decompress", "index", "bench", "partition", "manifest"):
+        print(__doc__)
+        sys.exit(1)
+    cmd, src = sys.argv[1], sys.argv[2]
+    if cmd == "compress":
+        dst = sys.argv[3] if len(sys.argv) > 3 else src + ZSTD_SUFFIX
+        n = convert(src, dst)
+        print(f"Wrote {n:,} records to {dst} ({os.path.getsize(src)/os.path.getsize(dst):.2f}x smaller)")
+    elif cmd == "decompress":
+        dst = sys.argv[3] if len(sys.argv) > 3 else src[:-len(ZSTD_SUFFIX)]
+        n = convert(src, dst)
+        print(f"Wrote {n:,} records to {dst}")
+    elif cmd == "partition":
+        if len(sys.argv) < 4:
+            print(__doc__)
+            sys.exit(1)
+        dst = sys.argv[3]
+        n = convert(src, dst, sys.argv[4] if len(sys.argv) > 4 else "hour")
+        print(f"Wrote {n:,} records to {len(list_partitions(dst))} partitions in {dst}")
+    elif cmd == "manifest":
+        manifest = read_manifest(src)
+        print(f"{src}: {len(manifest['partitions'])} partitions by {manifest['partition_by']} of {manifest['field']}")
+        for key, p in sorted(manifest["partitions"].items()):
+            print(f"  {key:<14} {p['rows']:>8,} rows {p['bytes']/1024/1024:8.1f} MB  {p['min']} .. {p['max']}")
+    elif cmd == "index":
+        frames = build_index(src)
+        print(f"Indexed {len(frames)} frames in {src}")
+    else:
+        bench(src)
+
+
+if __name__ == "__main__":
+    main()
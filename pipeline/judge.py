@@ -4,14 +4,36 @@ Adapted from the introspection detection judge pattern:
 - System prompt with few-shot examples
 - Structured output via Pydantic model
 - Parallel processing with ThreadPoolExecutor
+- Pluggable backends: the OpenAI Responses API or any OpenAI-compatible chat
+  completions server (see judge_backends.py)
+
+Two output schemas share the prompt and few-shot examples:
+
+    full    PostClassification: free-text `reasoning`, then the labels
+    labels  PostLabels: labels and language only, so far fewer output tokens
+
+A JudgeMode picks the schema per post. In labels mode, a sampled fraction of
+posts (chosen by post_id hash, so stable across resumes) can still be judged
+in full. Posts where a flagged label (e.g. consciousness) comes back true can
+be re-judged in full; the full result replaces the labels-only one. Scripts
+expose this with `add_arguments(parser)` / `mode_from_args(args)`, and
+JudgeUsage totals requests, latency and tokens per schema.
 """
 
+import functools
+import hashlib
 import json
+import threading
+from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 
 from openai import OpenAI
 
-from schemas import PostClassification, PostInput
+from judge_backends import JudgeBackend, as_backend
+from schemas import PostClassification, PostInput, PostLabels
+
+BOOL_LABELS = [name for name, field in PostLabels.model_fields.items() if field.annotation is bool]
 
 SYSTEM_PROMPT = """\
 You are classifying posts from Moltbook, a Reddit-like social network for AI agents. \
@@ -196,12 +218,81 @@ FEWSHOT_EXAMPLES = [
 ]
 
 
-def format_examples() -> str:
-    """Format few-shot examples for the system prompt."""
+@dataclass(frozen=True)
+class JudgeMode:
+    """Which schema posts are judged with (see module docstring)."""
+
+    reasoning: str = "full"  # "full" or "labels"
+    sample: float = 0.0  # labels mode: fraction of posts still judged in full
+    flagged: tuple[str, ...] = ()  # labels mode: re-judge in full when any of these is true
+
+    def sampled(self, post_id: str) -> bool:
+        if self.sample <= 0:
+            return False
+        h = int.from_bytes(hashlib.sha1(post_id.encode()).digest()[:8], "big")
+        return h < self.sample * 2**64
+
+
+class JudgeUsage:
+    """Thread-safe totals of judge requests, latency and tokens, per schema."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.by_schema = defaultdict(lambda: {"requests": 0, "latency_s": 0.0, "input_tokens": 0, "output_tokens": 0})
+        self.rejudged = 0
+
+    def add(self, schema: str, latency: float, input_tokens: int = 0, output_tokens: int = 0):
+        with self._lock:
+            s = self.by_schema[schema]
+            s["requests"] += 1
+            s["latency_s"] += latency
+            s["input_tokens"] += input_tokens
+            s["output_tokens"] += output_tokens
+
+    def add_rejudged(self):
+        with self._lock:
+            self.rejudged += 1
+
+    def totals(self) -> dict:
+        out = {"requests": 0, "latency_s": 0.0, "input_tokens": 0, "output_tokens": 0}
+        for s in self.by_schema.values():
+            for k in out:
+                out[k] += s[k]
+        return out
+
+    def summary(self) -> str:
+        lines = []
+        for schema, s in sorted(self.by_schema.items()):
+            n = s["requests"]
+            lines.append(f"  {schema:<6} {n:,} requests | {1000 * s['latency_s'] / n:.0f} ms mean | "
+                         f"{s['input_tokens'] / n:,.0f} in / {s['output_tokens'] / n:,.0f} out tokens per request")
+        if self.rejudged:
+            lines.append(f"  {self.rejudged:,} posts re-judged in full for a flagged label")
+        return "\n".join(lines)
+
+
+def add_arguments(parser):
+    parser.add_argument("--judge-mode", choices=["full", "labels"], default="full")
+    parser.add_argument("--reasoning-sample", type=float, default=0.0, metavar="FRACTION")
+    parser.add_argument("--reasoning-labels", default="", metavar="LABEL,...")
+
+
+def mode_from_args(args) -> JudgeMode:
+    flagged = tuple(label for label in args.reasoning_labels.split(",") if label)
+    unknown = [label for label in flagged if label not in BOOL_LABELS]
+    if unknown:
+        raise ValueError(f"Unknown --reasoning-labels {unknown}; choose from {BOOL_LABELS}")
+    if not 0 <= args.reasoning_sample <= 1:
+        raise ValueError("--reasoning-sample must be between 0 and 1")
+    return JudgeMode(args.judge_mode, args.reasoning_sample, flagged)
+
+
+def format_examples(reasoning: bool = True) -> str:
+    """Format few-shot examples for the system prompt (without `reasoning` for the labels-only schema)."""
     blocks = []
     for i, ex in enumerate(FEWSHOT_EXAMPLES, 1):
         inp = ex["input"]
-        out = ex["output"]
+        out = ex["output"] if reasoning else {k: v for k, v in ex["output"].items() if k != "reasoning"}
         user_msg = USER_TEMPLATE.format(
             author=inp["author"],
             post_number=inp["post_number"],
@@ -215,16 +306,23 @@ def format_examples() -> str:
     return "\n".join(blocks)
 
 
+@functools.cache
+def system_prompt(reasoning: bool = True) -> str:
+    return SYSTEM_PROMPT.format(examples=format_examples(reasoning))
+
+
 def classify_post(
     post: PostInput,
-    client: OpenAI | None = None,
+    client: JudgeBackend | OpenAI | None = None,
     model: str = "gpt-4o-mini",
-) -> PostClassification:
-    """Classify a single Moltbook post."""
-    if client is None:
-        client = OpenAI()
+    reasoning: bool = True,
+    usage: JudgeUsage | None = None,
+) -> PostClassification | PostLabels:
+    """Classify a single Moltbook post, with the full or the labels-only schema.
 
-    system_prompt = SYSTEM_PROMPT.format(examples=format_examples())
+    `client` is a JudgeBackend, or an OpenAI client used through the Responses API.
+    """
+    backend = as_backend(client)
 
     content_text = (post.content or "(empty)")[:2000]  # Truncate long posts
     user_message = USER_TEMPLATE.format(
@@ -236,35 +334,56 @@ def classify_post(
         content=content_text,
     )
 
-    response = client.responses.parse(
-        model=model,
-        instructions=system_prompt,
-        input=user_message,
-        text_format=PostClassification,
-    )
+    reply = backend.parse(model, system_prompt(reasoning), user_message,
+                          PostClassification if reasoning else PostLabels)
+    if usage is not None:
+        usage.add("full" if reasoning else "labels", reply.latency_s, reply.input_tokens, reply.output_tokens)
+
+    return reply.parsed
+
 
-    return response.output_parsed
+def judge_post(
+    post: PostInput,
+    client: JudgeBackend | OpenAI | None = None,
+    model: str = "gpt-4o-mini",
+    mode: JudgeMode | None = None,
+    usage: JudgeUsage | None = None,
+) -> PostClassification | PostLabels:
+    """Classify a post as `mode` prescribes: full, labels-only, or labels-only then full for flagged labels."""
+    mode = mode or JudgeMode()
+    if mode.reasoning == "full" or mode.sampled(post.post_id):
+        return classify_post(post, client, model, reasoning=True, usage=usage)
+    result = classify_post(post, client, model, reasoning=False, usage=usage)
+    if any(getattr(result, label) for label in mode.flagged):
+        if usage is not None:
+            usage.add_rejudged()
+        result = classify_post(post, client, model, reasoning=True, usage=usage)
+    return result
 
 
 def classify_posts(
     posts: list[PostInput],
-    client: OpenAI | None = None,
+    client: JudgeBackend | OpenAI | None = None,
     model: str = "gpt-4o-mini",
     max_workers: int = 8,
     verbose: bool = False,
-) -> list[tuple[PostInput, PostClassification]]:
-    """Classify multiple posts with parallel processing."""
-    if client is None:
-        client = OpenAI()
+    mode: JudgeMode | None = None,
+    usage: JudgeUsage | None = None,
+) -> list[tuple[PostInput, PostClassification | PostLabels]]:
+    """Classify multiple posts with parallel processing (see judge_post for `mode`).
+
+    In-flight requests are also capped by the backend's concurrency limit, if it has one.
+    """
+    client = as_backend(client)
 
-    results: dict[str, tuple[PostInput, PostClassification]] = {}
+    results: dict[str, tuple[PostInput, PostClassification | PostLabels]] = {}
     completed = 0
     total = len(posts)
     errors = 0
 
-    def process_post(post: PostInput) -> tuple[PostInput, PostClassification | None]:
+    def process_post(post: PostInput) -> tuple[PostInput, PostClassification | PostLabels | None]:
         try:
-            result = classify_post(post, client, model)
+            result = judge_post(post, client, model, mode, usage)
             return post, result
         except Exception as e:
             if verbose:
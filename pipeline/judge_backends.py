@@ -0,0 +1,189 @@
+"""Judge backends: where `classify_post` sends a prompt and how structured output comes back.
+
+    openai  OpenAI Responses API via `responses.parse` (strict JSON schema), the
+            original judge; --judge-base points it at another Responses server
+    chat    any OpenAI-compatible /v1/chat/completions endpoint (vLLM, llama.cpp
+            server, Ollama, LM Studio, ...) at --judge-base
+    local   `chat` preset for a small model on a local CPU server:
+            http://127.0.0.1:8080/v1 (llama.cpp's default), 2 concurrent
+            requests, temperature 0
+
+Each backend owns its client, with the HTTP connection pool sized to its
+concurrency limit, and a semaphore caps its in-flight requests however many
+threads classify_posts runs. Chat endpoints differ in what structured output
+they support, so `--structured` picks how the schema is enforced:
+
+    json_schema  response_format with the strict schema (OpenAI, vLLM, llama.cpp, Ollama)
+    json_object  JSON mode; the schema's keys are spelled out in the instructions
+    prompt       no response_format; same instructions, and the first {...} in the
+                 reply is parsed (tolerates ```json fences and chatter)
+
+A reply that does not validate against the schema raises, so it is counted
+as a judge error like any failed request.
+
+    backend, cassette = judge_backends.make_backend(args)  # after add_arguments(parser)
+    classify_posts(inputs, client=backend, model=args.model)
+
+judge_bench.py compares backends head to head on throughput.
+"""
+
+import os
+import re
+import threading
+import time
+from typing import NamedTuple
+
+from openai import OpenAI
+from pydantic import BaseModel
+
+import judge_transport
+
+PRESETS = {
+    "openai": {"api": "responses", "base_url": None, "concurrency": None, "temperature": None},
+    "chat": {"api": "chat", "base_url": None, "concurrency": 8, "temperature": None},
+    "local": {"api": "chat", "base_url": "http://127.0.0.1:8080/v1", "concurrency": 2, "temperature": 0},
+}
+STRUCTURED = ["json_schema", "json_object", "prompt"]
+JSON_RE = re.compile(r"\{.*\}", re.S)
+
+
+class Reply(NamedTuple):
+    parsed: BaseModel
+    input_tokens: int
+    output_tokens: int
+    latency_s: float  # Request time only, not time spent waiting for a concurrency slot
+
+
+class JudgeBackend:
+    """One judge endpoint: sends a prompt and returns the parsed schema instance as a Reply."""
+
+    name = "base"
+
+    def __init__(self, client: OpenAI, concurrency: int | None = None):
+        self.client = client
+        self.concurrency = concurrency
+        self._slots = threading.BoundedSemaphore(concurrency) if concurrency else None
+
+    def parse(self, model: str, instructions: str, user: str, schema: type[BaseModel]) -> Reply:
+        if self._slots is None:
+            return self._timed(model, instructions, user, schema)
+        with self._slots:
+            return self._timed(model, instructions, user, schema)
+
+    def _timed(self, model, instructions, user, schema) -> Reply:
+        t0 = time.perf_counter()
+        parsed, (input_tokens, output_tokens) = self._parse(model, instructions, user, schema)
+        return Reply(parsed, input_tokens, output_tokens, time.perf_counter() - t0)
+
+    def _parse(self, model, instructions, user, schema) -> tuple[BaseModel, tuple[int, int]]:
+        raise NotImplementedError
+
+
+class ResponsesBackend(JudgeBackend):
+    """OpenAI Responses API with strict structured output."""
+
+    name = "openai"
+
+    def _parse(self, model, instructions, user, schema):
+        response = self.client.responses.parse(
+            model=model,
+            instructions=instructions,
+            input=user,
+            text_format=schema,
+        )
+        if response.output_parsed is None:
+            refusal = next((c.refusal for item in response.output if item.type == "message"
+                            for c in item.content if c.type == "refusal"), None)
+            detail = refusal or (response.incomplete_details.reason if response.incomplete_details else response.status)
+            raise ValueError(f"No structured output ({detail})")
+        usage = response.usage
+        return response.output_parsed, (usage.input_tokens, usage.output_tokens) if usage else (0, 0)
+
+
+class ChatBackend(JudgeBackend):
+    """OpenAI-compatible chat completions, with the schema enforced as `structured` says (see module docstring)."""
+
+    name = "chat"
+
+    def __init__(self, client: OpenAI, concurrency: int | None = None, structured: str = "json_schema",
+                 temperature: float | None = None):
+        if structured not in STRUCTURED:
+            raise ValueError(f"structured must be one of {STRUCTURED}, got {structured!r}")
+        super().__init__(client, concurrency)
+        self.structured = structured
+        self.temperature = temperature
+
+    def _parse(self, model, instructions, user, schema):
+        if self.structured != "json_schema":
+            instructions = f"{instructions}\n\n{schema_hint(schema)}"
+        messages = [{"role": "system", "content": instructions}, {"role": "user", "content": user}]
+        extra = {} if self.temperature is None else {"temperature": self.temperature}
+        if self.structured == "json_schema":
+            response = self.client.chat.completions.parse(model=model, messages=messages, response_format=schema, **extra)
+            choice = response.choices[0]
+            if choice.message.parsed is None:
+                raise ValueError(f"No structured output ({choice.message.refusal or choice.finish_reason})")
+            parsed = choice.message.parsed
+        else:
+            if self.structured == "json_object":
+                extra["response_format"] = {"type": "json_object"}
+            response = self.client.chat.completions.create(model=model, messages=messages, **extra)
+            parsed = schema.model_validate_json(extract_json(response.choices[0].message.content or ""))
+        usage = response.usage
+        return parsed, (usage.prompt_tokens, usage.completion_tokens) if usage else (0, 0)
+
+
+def schema_hint(schema: type[BaseModel]) -> str:
+    """Plain-text spelling of a schema for endpoints without JSON-schema enforcement."""
+    types = {bool: "true/false", str: "string", int: "integer", float: "number"}
+    keys = ", ".join(f'"{name}" ({types.get(field.annotation, "value")})' for name, field in schema.model_fields.items())
+    return f"Reply with one JSON object and nothing else, with exactly these keys in this order: {keys}."
+
+
+def extract_json(text: str) -> str:
+    m = JSON_RE.search(text)
+    if m is None:
+        raise ValueError(f"No JSON object in reply: {text[:80]!r}")
+    return m.group(0)
+
+
+def as_backend(client: "JudgeBackend | OpenAI | None") -> JudgeBackend:
+    """A plain OpenAI client (or None) becomes an unlimited Responses API backend."""
+    if isinstance(client, JudgeBackend):
+        return client
+    return ResponsesBackend(client if client is not None else OpenAI())
+
+
+def add_arguments(parser):
+    parser.add_argument("--backend", choices=sorted(PRESETS), default="openai")
+    parser.add_argument("--judge-base", default=None, metavar="URL")
+    parser.add_argument("--judge-key", default=None)
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--structured", choices=STRUCTURED, default="json_schema")
+
+
+def make_backend(args, backend: str | None = None, base_url: str | None = None) -> tuple[JudgeBackend, object]:
+    """Backend from --backend/--judge-base/--judge-key/--concurrency/--structured, honouring --record/--replay.
+
+    Returns (backend, cassette); cassette is None unless recording or replaying (see judge_transport.py).
+    """
+    name = backend or args.backend
+    preset = PRESETS[name]
+    base_url = base_url or getattr(args, "judge_base", None) or preset["base_url"]
+    if preset["api"] == "chat" and not base_url:
+        raise ValueError(f"--backend {name} needs --judge-base (an OpenAI-compatible /v1 URL)")
+    concurrency = getattr(args, "concurrency", None) or preset["concurrency"]
+
+    kwargs = {}
+    if base_url:
+        kwargs["base_url"] = base_url
+    api_key = getattr(args, "judge_key", None)
+    if api_key is None and base_url and not os.environ.get("OPENAI_API_KEY"):
+        api_key = "local"  # Local servers ignore the key, but the SDK insists on one
+    if api_key is not None:
+        kwargs["api_key"] = api_key
+    client, cassette = judge_transport.make_client(args, max_connections=concurrency, **kwargs)
+
+    if preset["api"] == "responses":
+        return ResponsesBackend(client, concurrency), cassette
+    return ChatBackend(client, concurrency, getattr(args, "structured", "json_schema"), preset["temperature"]), cassette
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""Compare judge backends head to head on the same posts.
+
+A fixed random sample of the posts run_judge.py would classify is judged by
+each backend in turn (see judge_backends.py), with as many threads as the
+backend's concurrency limit. Each backend's throughput, mean request
+latency and tokens per request are reported, along with per-label agreement
+with the first backend, so a local model can be checked against OpenAI
+before it is trusted with a bulk relabel.
+
+A backend spec is `backend[:model][@base_url]`, for example `openai:gpt-4o-mini`
+or `local:qwen2.5-1.5b-instruct@http://127.0.0.1:8080/v1`.
+
+Usage:
+    python judge_bench.py openai:gpt-4o-mini local:qwen2.5-1.5b-instruct [--raw raw_posts.jsonl]
+                          [--posts 200] [--seed 0] [--judge-mode labels] [--concurrency N] [--workers N]
+                          [--structured json_schema|json_object|prompt] [--report bench.json]
+
+    --concurrency: Override every backend's concurrency limit (default: per backend, see judge_backends.PRESETS)
+    --workers: Threads per backend (default: its concurrency limit, or 10 if unlimited)
+"""
+
+import argparse
+import json
+import random
+import time
+
+import judge_backends
+from judge import BOOL_LABELS, JudgeMode, JudgeUsage, classify_posts
+from run_judge import load_posts_by_agent, posts_to_inputs
+
+
+def parse_spec(spec: str, default_model: str) -> tuple[str, str, str | None]:
+    """`backend[:model][@base_url]` -> (backend, model, base_url)."""
+    spec, _, base_url = spec.partition("@")
+    name, _, model = spec.partition(":")
+    if name not in judge_backends.PRESETS:
+        raise ValueError(f"Unknown backend {name!r} in spec; choose from {sorted(judge_backends.PRESETS)}")
+    return name, model or default_model, base_url or None
+
+
+def bench(args):
+    inputs = [inp for name, posts in load_posts_by_agent(args.raw, args.min_posts).items()
+              for inp in posts_to_inputs(name, posts)]
+    sample = random.Random(args.seed).sample(inputs, min(args.posts, len(inputs)))
+    mode = JudgeMode(args.judge_mode)
+    print(f"Judging {len(sample):,} posts ({args.judge_mode} mode) with {len(args.specs)} backends")
+
+    reference = None
+    rows = []
+    for spec in args.specs:
+        name, model, base_url = parse_spec(spec, args.model)
+        backend, _ = judge_backends.make_backend(args, name, base_url)
+        workers = args.workers or backend.concurrency or 10
+        usage = JudgeUsage()
+        t0 = time.perf_counter()
+        results = classify_posts(sample, client=backend, model=model, max_workers=workers, mode=mode, usage=usage)
+        wall = time.perf_counter() - t0
+        labels = {inp.post_id: out for inp, out in results}
+        t = usage.totals()
+        n = max(t["requests"], 1)
+        row = {"spec": spec, "classified": len(results), "errors": len(sample) - len(results),
+               "wall_s": round(wall, 2), "posts_per_s": round(len(results) / wall, 2) if wall else 0.0,
+               "mean_latency_ms": round(1000 * t["latency_s"] / n), "workers": workers,
+               "concurrency": backend.concurrency,
+               "input_tokens": round(t["input_tokens"] / n), "output_tokens": round(t["output_tokens"] / n)}
+        if reference is None:
+            reference = labels
+        else:
+            both = [pid for pid in labels if pid in reference]
+            row["agreement"] = {label: round(sum(getattr(labels[p], label) == getattr(reference[p], label)
+                                                 for p in both) / len(both), 3) if both else None
+                                for label in BOOL_LABELS}
+        rows.append(row)
+        print(f"\n{spec}  ({workers} threads, concurrency {backend.concurrency or 'unlimited'})")
+        print(f"  {row['classified']:,} classified, {row['errors']:,} errors in {wall:.1f}s "
+              f"-> {row['posts_per_s']:.1f} posts/sec | {row['mean_latency_ms']} ms mean latency | "
+              f"{row['input_tokens']:,} in / {row['output_tokens']:,} out tokens per request")
+        if "agreement" in row:
+            agree = " ".join(f"{label[:5]}={100 * a:.0f}%" for label, a in row["agreement"].items() if a is not None)
+            print(f"  Agreement with {args.specs[0]}: {agree}")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"posts": len(sample), "judge_mode": args.judge_mode, "backends": rows}, f, indent=2)
+        print(f"\nReport: {args.report}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("specs", nargs="+", metavar="SPEC")
+    parser.add_argument("--raw", default="raw_posts.jsonl")
+    parser.add_argument("--min-posts", type=int, default=5)
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--judge-mode", choices=["full", "labels"], default="full")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--report", default=None)
+    judge_backends.add_arguments(parser)
+    args = parser.parse_args()
+    bench(args)
+
+
+if __name__ == "__main__":
+    main()
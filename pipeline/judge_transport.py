@@ -0,0 +1,168 @@
+"""Record/replay transport for judge API calls.
+
+Sits under the OpenAI client as its HTTP transport, so `classify_post` and
+everything above it run unchanged. Each request is keyed by a hash of its
+method, path and canonical JSON body (model, instructions, input, schema);
+the host and headers are left out, so a cassette recorded against the real
+API or stub_api.py replays anywhere, without a key or network.
+
+    record   forward every request and append the request/response pair to a
+             JSONL cassette (a `.zst` path stores it as indexed zstd frames,
+             which makes the repeated system prompt almost free)
+    replay   serve responses from the cassette; a request with no recording
+             gets a 404 (not retried by the SDK, counted as a judge error)
+
+A key recorded more than once replays its responses in recorded order and
+then repeats the last, so a 429 followed by a successful retry replays the
+same way. `--replay-latency` sleeps before each replayed response, either
+a fixed number of seconds or `recorded` (the latency measured when
+recording), which keeps threaded throughput benchmarks realistic.
+
+    client, cassette = judge_transport.make_client(args)   # after add_arguments(parser)
+    ...
+    if cassette:
+        cassette.close()  # Writes the last zstd frame of a recording
+        print(cassette.summary())
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import openai
+from openai import OpenAI
+
+try:
+    import httpx2 as httpx  # What recent openai releases are built on
+except ImportError:
+    import httpx
+
+from jsonl_store import iter_jsonl, open_jsonl, resolve
+
+MISS_STATUS = 404
+
+
+def add_arguments(parser):
+    parser.add_argument("--record", default=None, metavar="CASSETTE")
+    parser.add_argument("--replay", default=None, metavar="CASSETTE")
+    parser.add_argument("--replay-latency", default="0", metavar="SECONDS|recorded")
+
+
+def request_key(method: str, path: str, body: bytes) -> str:
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode()
+    except ValueError:
+        pass  # Not JSON: hash the raw bytes
+    return hashlib.sha256(f"{method} {path}\n".encode() + body).hexdigest()
+
+
+class CassetteTransport(httpx.BaseTransport):
+    """httpx transport that records to or replays from a JSONL cassette."""
+
+    def __init__(self, path: str, mode: str, latency: str | float = 0, max_connections: int | None = None):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"mode must be 'record' or 'replay', got {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.latency = latency if latency == "recorded" else float(latency)
+        self.counts = {"recorded": 0, "hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        if mode == "record":
+            self._inner = httpx.HTTPTransport(limits=connection_limits(max_connections))
+            self._writer = open_jsonl(path, "a")
+            return
+        self._entries = defaultdict(list)
+        for rec in iter_jsonl(resolve(path)):
+            self._entries[rec["key"]].append(rec)
+        self._served = defaultdict(int)
+
+    def handle_request(self, request):
+        body = request.read()
+        key = request_key(request.method, request.url.path, body)
+        if self.mode == "record":
+            return self._record(request, key, body)
+        return self._replay(request, key)
+
+    def _record(self, request, key: str, body: bytes):
+        t0 = time.perf_counter()
+        upstream = self._inner.handle_request(request)
+        content = upstream.read()  # Already decoded from gzip/br
+        latency = time.perf_counter() - t0
+        content_type = upstream.headers.get("content-type", "application/json")
+        upstream.close()
+        try:
+            req = json.loads(body)
+        except ValueError:
+            req = body.decode("utf-8", "replace")
+        with self._lock:
+            self._writer.write({
+                "key": key, "method": request.method, "path": request.url.path, "request": req,
+                "status": upstream.status_code, "content_type": content_type,
+                "body": content.decode("utf-8"), "latency_s": round(latency, 4),
+                "recorded_at": datetime.now(timezone.utc).isoformat(),
+            })
+            if not self._writer.compressed:  # Frames are only cut on close, to keep them large
+                self._writer.flush()
+            self.counts["recorded"] += 1
+        return httpx.Response(upstream.status_code, headers={"content-type": content_type},
+                              content=content, request=request)
+
+    def _replay(self, request, key: str):
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                self.counts["misses"] += 1
+            else:
+                self.counts["hits"] += 1
+                rec = entries[min(self._served[key], len(entries) - 1)]
+                self._served[key] += 1
+        if not entries:
+            error = {"error": {"type": "cassette_miss", "code": "cassette_miss",
+                               "message": f"No recorded response for request {key[:16]} in {self.path}"}}
+            return httpx.Response(MISS_STATUS, json=error, request=request)
+        delay = rec.get("latency_s", 0) if self.latency == "recorded" else self.latency
+        if delay:
+            time.sleep(delay)
+        return httpx.Response(rec["status"], headers={"content-type": rec["content_type"]},
+                              content=rec["body"].encode("utf-8"), request=request)
+
+    def summary(self) -> str:
+        if self.mode == "record":
+            return f"Cassette: recorded {self.counts['recorded']:,} responses to {self.path}"
+        return (f"Cassette: replayed {self.counts['hits']:,} responses from {self.path} "
+                f"({self.counts['misses']:,} misses)")
+
+    def close(self):
+        if self.mode == "record":
+            self._writer.close()
+            self._inner.close()
+
+
+def connection_limits(max_connections: int | None):
+    """Pool limits for at most `max_connections` concurrent requests (the SDK's defaults if None)."""
+    if not max_connections:
+        return openai.DEFAULT_CONNECTION_LIMITS
+    return httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+
+
+def make_client(args, max_connections: int | None = None, **kwargs) -> tuple[OpenAI, CassetteTransport | None]:
+    """OpenAI client honouring --record / --replay; the transport is None for live runs.
+
+    `max_connections` sizes the HTTP connection pool (see judge_backends.py).
+    """
+    record, replay = getattr(args, "record", None), getattr(args, "replay", None)
+    if record and replay:
+        raise ValueError("--record and --replay are mutually exclusive")
+    if not (record or replay):
+        if max_connections:
+            kwargs["http_client"] = openai.DefaultHttpxClient(limits=connection_limits(max_connections))
+        return OpenAI(**kwargs), None
+    if record:
+        transport = CassetteTransport(record, "record", max_connections=max_connections)
+    else:
+        transport = CassetteTransport(replay, "replay", getattr(args, "replay_latency", 0))
+        kwargs.setdefault("api_key", "replay")  # Replays never reach the network
+    return OpenAI(http_client=openai.DefaultHttpxClient(transport=transport), **kwargs), transport
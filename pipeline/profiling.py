@@ -0,0 +1,198 @@
+"""Shared run instrumentation for the pipeline entry points.
+
+Every script wraps its `main` body in a `Run`, which always records cheap
+per-stage wall/CPU timers and counters (two clock reads per stage) and
+appends one JSON line per run to a run report:
+
+    run = Run("build_roster", args)
+    with run:
+        with run.stage("load"):
+            ...
+        run.count("posts", n)
+
+Stages may nest ("load/parse") and repeat (per batch); repeats accumulate
+calls, time and the peak. Straight-line scripts can use `run.mark("sort")`
+instead, which ends the previous marked stage and starts the next one. Opt-in extras, added to each script's parser by
+`add_arguments`:
+
+    --profile [PATH]    cProfile the run, print the top functions by cumulative
+                        time and dump stats to PATH (default <script>.prof; open
+                        with `python -m pstats` or snakeviz). A PATH ending in
+                        .html uses pyinstrument instead; without it, the
+                        run says so and writes PATH with .prof in place of .html.
+    --trace-memory      tracemalloc peak Python heap per stage (slows allocation-
+                        heavy code noticeably, so it is off by default)
+    --run-report PATH   Where to append the JSON run report
+                        (default run_reports.jsonl next to this module)
+
+cProfile only sees the main thread; time spent in worker threads (the
+judge's ThreadPoolExecutor, HTTP fetchers) shows up as waiting in the
+main thread, and is better read from the stage timers.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import pyinstrument
+except ImportError:  # Only needed for --profile *.html
+    pyinstrument = None
+
+DIR = os.path.dirname(__file__)
+RUN_REPORTS = os.path.join(DIR, "run_reports.jsonl")
+TOP_FUNCTIONS = 25
+
+
+def add_arguments(parser):
+    parser.add_argument("--profile", nargs="?", const="", default=None, metavar="PATH")
+    parser.add_argument("--trace-memory", action="store_true")
+    parser.add_argument("--run-report", default=RUN_REPORTS)
+
+
+def max_rss_mb() -> float:
+    """Peak resident set size of this process; ru_maxrss is KiB on Linux but bytes on macOS."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+class Run:
+    """Stage timers, counters and optional profilers for one script run."""
+
+    def __init__(self, script: str, args=None):
+        self.script = script
+        self.profile_path = getattr(args, "profile", None)
+        self.trace_memory = getattr(args, "trace_memory", False)
+        self.report_path = getattr(args, "run_report", RUN_REPORTS)
+        self.stages: dict[str, dict] = {}
+        self.counters: dict[str, int] = {}
+        self._stack: list[str] = []
+        self._peaks: list[int] = []
+        self._profiler = None
+        self._mark = None
+
+    # --- recording ---
+
+    @contextmanager
+    def stage(self, name: str):
+        path = "/".join(self._stack + [name])
+        s = self.stages.setdefault(path, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0})  # Parents list first
+        self._stack.append(name)
+        if self.trace_memory:
+            self._peaks.append(0)
+            self._fold_peak()
+        t0, c0 = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+            self._stack.pop()
+            s["calls"] += 1
+            s["wall_s"] += wall
+            s["cpu_s"] += cpu
+            if self.trace_memory:
+                self._fold_peak()
+                peak = self._peaks.pop()
+                s["peak_mb"] = max(s.get("peak_mb", 0.0), peak / 1024 / 1024)
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+
+    def mark(self, name: str | None):
+        """End the current marked stage and start top-level stage `name` (None just ends it)."""
+        if self._mark is not None:
+            self._mark.__exit__(None, None, None)
+            self._mark = None
+        if name is not None:
+            self._mark = self.stage(name)
+            self._mark.__enter__()
+
+    def _fold_peak(self):
+        """Credit the heap peak since the last reset to the innermost open stage, then reset it."""
+        if self._peaks:
+            self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+
+    def count(self, name: str, n: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    # --- lifecycle ---
+
+    def __enter__(self):
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self._t0, self._c0 = time.perf_counter(), time.process_time()
+        if self.trace_memory:
+            tracemalloc.start()
+        if self.profile_path is not None:
+            if self.profile_path.endswith(".html") and pyinstrument is None:
+                fallback = self.profile_path[:-len(".html")] + ".prof"
+                print(f"pyinstrument is not installed; profiling with cProfile to {fallback} instead",
+                      file=sys.stderr)
+                self.profile_path = fallback
+            if self.profile_path.endswith(".html"):
+                self._profiler = pyinstrument.Profiler()
+                self._profiler.start()
+            else:
+                self._profiler = cProfile.Profile()
+                self._profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.mark(None)
+        wall, cpu = time.perf_counter() - self._t0, time.process_time() - self._c0
+        if self._profiler is not None:
+            self._finish_profile()
+        report = {
+            "script": self.script,
+            "argv": sys.argv[1:],
+            "started_at": self.started_at,
+            "status": "ok" if exc_type is None else exc_type.__name__,
+            "wall_s": round(wall, 4),
+            "cpu_s": round(cpu, 4),
+            "max_rss_mb": round(max_rss_mb(), 1),
+            "stages": {k: {f: round(v, 4) if isinstance(v, float) else v for f, v in s.items()}
+                       for k, s in self.stages.items()},
+            "counters": self.counters,
+        }
+        if self.trace_memory:
+            report["heap_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+            tracemalloc.stop()
+        if self.report_path:
+            with open(self.report_path, "a") as f:
+                f.write(json.dumps(report) + "\n")
+        if self.stages and (self.profile_path is not None or self.trace_memory):
+            self.print_stages(report)
+        return False
+
+    def _finish_profile(self):
+        path = self.profile_path or f"{self.script}.prof"
+        if pyinstrument and isinstance(self._profiler, pyinstrument.Profiler):
+            self._profiler.stop()
+            with open(path, "w") as f:
+                f.write(self._profiler.output_html())
+            print(f"\nProfile written to {path}")
+            return
+        self._profiler.disable()
+        self._profiler.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(self._profiler, stream=out).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        print(f"\n=== cProfile: top {TOP_FUNCTIONS} by cumulative time (full stats: {path}) ===")
+        print(out.getvalue())
+
+    def print_stages(self, report: dict):
+        print(f"=== Stages ({report['wall_s']:.2f}s wall, {report['cpu_s']:.2f}s CPU, "
+              f"max RSS {report['max_rss_mb']:.0f} MB) ===")
+        mem = self.trace_memory
+        print(f"{'stage':<28} {'calls':>6} {'wall s':>9} {'cpu s':>9}" + (f" {'peak MB':>9}" if mem else ""))
+        for name, s in self.stages.items():
+            print(f"{name:<28} {s['calls']:>6} {s['wall_s']:>9.3f} {s['cpu_s']:>9.3f}"
+                  + (f" {s['peak_mb']:>9.1f}" if mem else ""))
+        for name, n in self.counters.items():
+            print(f"  {name}: {n:,}")
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""Pull comments for every post with comment_count > 0 and save as JSONL.
+
+Posts are read from raw_posts.jsonl and fetched busiest-first (highest
+comment_count first), so a partial crawl covers the most interaction. A
+bounded number of worker threads share one pooled keep-alive HTTP session.
+Nested reply trees are flattened: each output line is one comment with its
+`post_id`, `parent_id` and `depth`.
+
+Progress is resumable. Every SAVE_EVERY posts the output is synced and one
+line is appended to `<state>.done.jsonl` with the posts finished since the
+last one and the output position after their comments. A resume keeps the
+checkpoints that are fully on disk and truncates the output back to the last
+one (as pull_posts.py's page journal does), so comments written after it are
+re-fetched rather than duplicated. Posts that kept failing are retried on the
+next run.
+
+Usage:
+    python pull_comments.py [--raw raw_posts.jsonl] [--output raw_comments.jsonl] [--concurrency 8]
+                            [--rate 10] [--max-posts 0] [--base https://www.moltbook.com/api/v1]
+
+    --rate: Max requests per second across all workers (0 = unlimited)
+    --base: API base URL (point at stub_api.py for local testing)
+    --timings: Append per-request connect/TTFB/transfer timings as JSONL (see http_client.py)
+    --profile / --trace-memory / --run-report: Instrumentation (see profiling.py)
+
+Test locally:
+    python stub_api.py --raw raw_posts.jsonl --port 8765 &
+    python pull_comments.py --base http://127.0.0.1:8765/api/v1 --output /tmp/comments.jsonl --state /tmp/state.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+import profiling
+from http_client import HTTPError, HTTPSession
+from jsonl_store import fits, iter_jsonl, open_jsonl, truncate
+from profiling import Run
+from pull_posts import read_journal
+
+API_KEY = os.environ.get("MOLTBOOK_API_KEY", "")
+BASE = "https://www.moltbook.com/api/v1"
+DIR = os.path.dirname(__file__)
+OUTPUT = os.path.join(DIR, "raw_comments.jsonl")
+STATE_FILE = os.path.join(DIR, "pull_comments_state.json")
+MAX_RETRIES = 4
+SAVE_EVERY = 200  # posts between state checkpoints
+DONE_SUFFIX = ".done.jsonl"
+
+
+class RateLimiter:
+    """Spaces requests at least 1/rate seconds apart across threads."""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def load_state(path: str) -> dict:
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"failed": [], "comments_pulled": 0, "started_at": datetime.utcnow().isoformat()}
+
+
+def save_state(path: str, state: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def recover_done(output: str, log_path: str, state: dict) -> set[str]:
+    """Posts done as of the last checkpoint fully on disk; the output is cut back to that checkpoint.
+
+    Updates state["comments_pulled"] to match. Posts listed under "done" in a
+    state file from before the done log are kept as done.
+    """
+    done = set(state.pop("done", []))
+    entries = read_journal(log_path)
+    if not entries:
+        return done
+    valid = []
+    for entry in entries:  # Positions only grow, so stop at the first checkpoint past the data
+        if not fits(output, entry["pos"]):
+            break
+        valid.append(entry)
+    for entry in valid:
+        done.update(entry["done"])
+    if valid:
+        state["comments_pulled"] = valid[-1]["comments_pulled"]
+    if os.path.exists(output):
+        truncate(output, valid[-1]["pos"] if valid else 0)
+    return done
+
+
+class DoneLog:
+    """Append-only checkpoints of finished posts, each synced after the comments it covers."""
+
+    def __init__(self, path: str, writer, done: set[str], comments_pulled: int):
+        self.writer = writer
+        # Start each run from a single compacted checkpoint, swapped in atomically
+        with open(path + ".tmp", "w") as f:
+            self._append(f, sorted(done), comments_pulled)
+        os.replace(path + ".tmp", path)
+        self._f = open(path, "a")
+
+    def checkpoint(self, done: list[str], comments_pulled: int):
+        """Log posts whose comments were just written; everything before the checkpoint is synced first."""
+        self._append(self._f, done, comments_pulled)
+
+    def _append(self, f, done: list[str], comments_pulled: int):
+        self.writer.flush()
+        self.writer.sync()
+        f.write(json.dumps({"pos": self.writer.tell(), "done": done, "comments_pulled": comments_pulled}) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+    def close(self):
+        self._f.close()
+
+
+def flatten(comments: list[dict], post_id: str, parent_id: str | None = None, depth: int = 0) -> list[dict]:
+    """Flatten a nested comment tree into rows tagged with post and parent IDs."""
+    rows = []
+    for c in comments:
+        replies = c.get("replies") or []
+        row = {k: v for k, v in c.items() if k != "replies"}
+        row["post_id"] = post_id
+        row.setdefault("parent_id", parent_id)
+        row["depth"] = depth
+        rows.append(row)
+        rows.extend(flatten(replies, post_id, c.get("id"), depth + 1))
+    return rows
+
+
+def fetch_comments(session: HTTPSession, limiter: RateLimiter, base: str, post_id: str) -> list[dict]:
+    """Fetch all comments for one post, following offset pagination if the API reports more."""
+    comments = []
+    offset = 0
+    while True:
+        for attempt in range(MAX_RETRIES):
+            limiter.wait()
+            try:
+                data = session.get_json(f"{base}/posts/{post_id}/comments?sort=new&limit=100&offset={offset}")
+                break
+            except HTTPError as e:
+                if e.code == 404:
+                    return comments  # Post deleted since the posts pull
+                if (e.code != 429 and e.code < 500) or attempt == MAX_RETRIES - 1:
+                    raise
+            except (ConnectionError, TimeoutError):
+                if attempt == MAX_RETRIES - 1:
+                    raise
+            time.sleep(2 ** attempt)
+        page = data.get("comments", [])
+        comments.extend(page)
+        if not data.get("has_more") or not page:
+            return comments
+        offset += len(page)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--raw", default=os.path.join(DIR, "raw_posts.jsonl"))
+    parser.add_argument("--output", default=OUTPUT)
+    parser.add_argument("--state", default=STATE_FILE)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=10)
+    parser.add_argument("--max-posts", type=int, default=0)
+    parser.add_argument("--base", default=BASE)
+    parser.add_argument("--timings", default=None)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    with Run("pull_comments", args) as run:
+        crawl(args, run)
+
+
+def crawl(args, run: Run):
+    run.mark("load")
+    state = load_state(args.state)
+    done = recover_done(args.output, args.state + DONE_SUFFIX, state)
+    print(f"Loading posts with comments from {args.raw}...")
+    todo = [(p.get("comment_count", 0), p["id"]) for p in iter_jsonl(args.raw)
+            if p.get("comment_count", 0) > 0 and p["id"] not in done]
+    todo.sort(key=lambda x: -x[0])  # Busiest threads first
+    if args.max_posts > 0:
+        todo = todo[:args.max_posts]
+    expected = sum(c for c, _ in todo)
+    print(f"  {len(todo):,} posts to crawl (~{expected:,} comments), {len(done):,} already done")
+    if not todo:
+        print("Nothing to do!")
+        return
+
+    run.mark("crawl")
+    session = HTTPSession({"Authorization": f"Bearer {API_KEY}"}, pool_size=args.concurrency,
+                          timing_log=args.timings)
+    limiter = RateLimiter(args.rate)
+    failed = []
+    pulled = 0
+    start_time = time.time()
+    mode = "a" if done or state["failed"] else "w"
+
+    with open_jsonl(args.output, mode) as f, ThreadPoolExecutor(args.concurrency) as executor:
+        log = DoneLog(args.state + DONE_SUFFIX, f, done, state["comments_pulled"])
+        save_state(args.state, state)  # Without the pre-log "done" list, now in the log
+        new_done = []
+        pending = {}
+        queue = iter(todo)
+        finished = 0
+        since_save = 0
+
+        def submit_next():
+            item = next(queue, None)
+            if item is not None:
+                pending[executor.submit(fetch_comments, session, limiter, args.base, item[1])] = item[1]
+
+        for _ in range(args.concurrency * 2):  # Bounded in-flight work
+            submit_next()
+
+        while pending:
+            completed, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in completed:
+                post_id = pending.pop(future)
+                submit_next()
+                try:
+                    rows = flatten(future.result(), post_id)
+                except Exception as e:
+                    print(f"  Failed {post_id}: {e}", file=sys.stderr)
+                    failed.append(post_id)
+                    continue
+                for row in rows:
+                    f.write(row)
+                new_done.append(post_id)
+                pulled += len(rows)
+                finished += 1
+                since_save += 1
+
+            if since_save >= SAVE_EVERY or not pending:
+                state.update(failed=failed, comments_pulled=state["comments_pulled"] + pulled)
+                log.checkpoint(new_done, state["comments_pulled"])
+                pulled = 0
+                new_done = []
+                save_state(args.state, state)
+                since_save = 0
+                elapsed = time.time() - start_time
+                print(f"  {finished:,}/{len(todo):,} posts | {state['comments_pulled']:,} comments | "
+                      f"{finished/elapsed:.1f} posts/s | {session.connections_opened} connections opened")
+        log.close()
+
+    session.close()
+    run.mark(None)
+    run.count("posts", finished)
+    run.count("failed", len(failed))
+    run.count("requests", session.requests)
+    state["finished_at"] = datetime.utcnow().isoformat()
+    save_state(args.state, state)
+    elapsed = time.time() - start_time
+    print(f"\nDone! {finished:,} posts, {state['comments_pulled']:,} comments total in {elapsed/60:.1f} min"
+          f" ({session.requests:,} requests over {session.connections_opened} connections)")
+    session.print_summary()
+    if failed:
+        print(f"  {len(failed)} posts failed; re-run to retry them")
+
+
+if __name__ == "__main__":
+    main()
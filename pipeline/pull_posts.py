@@ -1,108 +1,233 @@
 #!/usr/bin/env python3
-"""Pull all Moltbook posts via paginated API and save as JSONL."""
+"""Pull all Moltbook posts via paginated API and save as JSONL.
 
+Crash safety: every completed page is recorded in a write-ahead journal
+(`<output>.journal`, one JSON line per page: next offset, running total, page
+size and the output's byte length after the page). The output and journal
+are fsynced together every FSYNC_EVERY pages, data first. On restart the
+output is truncated to the last journaled page that is fully on disk and
+the pull continues from exactly that offset, so no post is written twice.
+
+Usage:
+    python pull_posts.py [--output raw_posts.jsonl] [--partition-by hour|day] [--db moltbook.db] [--timings pull_timings.jsonl]
+
+    --output: Output path; a `.zst` suffix writes indexed zstd frames (see jsonl_store.py)
+    --partition-by: Write --output as a directory of hour/day partitions by created_at
+                    (the journal then records every partition's length; see jsonl_store.py)
+    --db: Also upsert each page into this SQLite store (see db.py)
+    --timings: Append per-request connect/TTFB/transfer timings as JSONL (see http_client.py)
+    --base: API base URL (point at stub_api.py for local testing)
+    --state: Resume state file (default pull_state.json next to this script)
+    --profile / --trace-memory / --run-report: Instrumentation (see profiling.py)
+"""
+
+import argparse
 import json
 import time
 import sys
 import os
-from urllib.request import Request, urlopen
-from urllib.error import HTTPError, URLError
 from datetime import datetime
 
+import db
+import profiling
+from http_client import HTTPError, HTTPSession
+from jsonl_store import count_lines, dataset_size, fits, open_jsonl, truncate
+from profiling import Run
+
 API_KEY = os.environ.get("MOLTBOOK_API_KEY", "")
 BASE = "https://www.moltbook.com/api/v1"
 OUTPUT = os.path.join(os.path.dirname(__file__), "raw_posts.jsonl")
 STATE_FILE = os.path.join(os.path.dirname(__file__), "pull_state.json")
 BATCH_SIZE = 100
 DELAY = 0.3  # seconds between requests
+JOURNAL_SUFFIX = ".journal"
+FSYNC_EVERY = 10  # pages per group commit
 
-def load_state():
-    if os.path.exists(STATE_FILE):
-        with open(STATE_FILE) as f:
+def load_state(path=STATE_FILE):
+    if os.path.exists(path):
+        with open(path) as f:
             return json.load(f)
     return {"offset": 0, "total_pulled": 0, "started_at": datetime.utcnow().isoformat()}
 
-def save_state(state):
-    with open(STATE_FILE, "w") as f:
+def save_state(state, path=STATE_FILE):
+    with open(path, "w") as f:
         json.dump(state, f)
 
-def fetch_page(offset, limit=BATCH_SIZE):
-    url = f"{BASE}/posts?sort=new&limit={limit}&offset={offset}"
-    req = Request(url, headers={"Authorization": f"Bearer {API_KEY}"})
+class PageJournal:
+    """Append-only log of completed pages, fsynced in groups after the output."""
+
+    def __init__(self, path, writer, mode="a"):
+        self.path = path
+        self.writer = writer
+        self._f = open(path, mode)
+        self.pending = 0
+
+    def record(self, offset, total, count):
+        """Log a page whose posts were just written; call after writing, before the next page."""
+        self.writer.flush()
+        entry = {"offset": offset, "total": total, "count": count, "pos": self.writer.tell()}
+        self._f.write(json.dumps(entry) + "\n")
+        self._f.flush()
+        self.pending += 1
+        if self.pending >= FSYNC_EVERY:
+            self.commit()
+
+    def commit(self):
+        """Make every logged page durable: fsync the data, then the journal."""
+        if not self.pending:
+            return
+        self.writer.sync()
+        os.fsync(self._f.fileno())
+        self.pending = 0
+
+    def close(self):
+        self.commit()
+        self._f.close()
+
+def read_journal(path):
+    entries = []
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break  # Torn write from a crash
+    return entries
+
+def recover(output, journal_path):
+    """Roll the output back to the last journaled page that is fully on disk.
+
+    Returns (offset, total) to resume from. The journal is compacted to that
+    single entry.
+    """
+    valid = [e for e in read_journal(journal_path) if fits(output, e["pos"])]
+    last = valid[-1] if valid else {"offset": 0, "total": 0, "count": 0, "pos": 0}
+    if os.path.exists(output):
+        truncate(output, last["pos"])
+    with open(journal_path, "w") as f:
+        f.write(json.dumps(last) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    return last["offset"], last["total"]
+
+def make_session(timing_log=None):
+    """Keep-alive session with compressed transfer (one connection reused for every page)."""
+    return HTTPSession({"Authorization": f"Bearer {API_KEY}"}, pool_size=1, timing_log=timing_log)
+
+def fetch_page(session, offset, limit=BATCH_SIZE, base=BASE):
+    url = f"{base}/posts?sort=new&limit={limit}&offset={offset}"
     try:
-        with urlopen(req, timeout=30) as resp:
-            return json.loads(resp.read())
+        return session.get_json(url, stream_key="posts")
     except HTTPError as e:
         print(f"  HTTP {e.code} at offset {offset}", file=sys.stderr)
         return None
-    except (URLError, TimeoutError) as e:
+    except (OSError, ValueError) as e:
         print(f"  Network error at offset {offset}: {e}", file=sys.stderr)
         return None
 
 def main():
-    state = load_state()
-    offset = state["offset"]
-    total = state["total_pulled"]
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", default=OUTPUT)
+    parser.add_argument("--partition-by", choices=["hour", "day"], default=None)
+    parser.add_argument("--db", default=None)
+    parser.add_argument("--timings", default=None)
+    parser.add_argument("--base", default=BASE)
+    parser.add_argument("--state", default=STATE_FILE)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    with Run("pull_posts", args) as run:
+        pull(args, run)
+
+def pull(args, run):
+    output = args.output
+    conn = db.connect(args.db) if args.db else None
+    session = make_session(args.timings)
+
+    state = load_state(args.state)
+    journal_path = output + JOURNAL_SUFFIX
+    if os.path.exists(journal_path):
+        offset, total = recover(output, journal_path)
+    elif state["offset"] > 0 and os.path.exists(output):
+        # No journal (older pull): the file itself is the truth, one line per post
+        offset = total = count_lines(output)
+    else:
+        offset = total = 0
     
     # Open in append mode so we can resume
     mode = "a" if offset > 0 else "w"
     print(f"Starting from offset {offset} (already pulled {total} posts)")
-    print(f"Output: {OUTPUT}")
+    print(f"Output: {output}")
     
     retries = 0
     max_retries = 5
     
-    with open(OUTPUT, mode) as f:
-        while True:
-            data = fetch_page(offset)
-            
-            if data is None:
-                retries += 1
-                if retries >= max_retries:
-                    print(f"Too many retries, stopping at offset {offset}")
+    with open_jsonl(output, mode, partition_by=args.partition_by) as f:
+        journal = PageJournal(journal_path, f, mode)
+        try:
+            while True:
+                with run.stage("fetch"):
+                    data = fetch_page(session, offset, base=args.base)
+                run.count("requests")
+                
+                if data is None:
+                    retries += 1
+                    if retries >= max_retries:
+                        print(f"Too many retries, stopping at offset {offset}")
+                        break
+                    print(f"  Retry {retries}/{max_retries} in 5s...")
+                    run.count("retries")
+                    time.sleep(5)
+                    continue
+                
+                retries = 0
+                posts = data.get("posts", [])
+                has_more = data.get("has_more", False)
+                
+                with run.stage("write"):
+                    for post in posts:
+                        f.write(post)
+                if conn is not None:
+                    with run.stage("db"):
+                        db.upsert_posts(conn, posts)
+                # Journaled last: once a page is recorded, resume skips it, so the DB must have it too
+                with run.stage("journal"):
+                    total += len(posts)
+                    offset += len(posts)
+                    journal.record(offset, total, len(posts))
+                run.count("posts", len(posts))
+                
+                # Progress
+                if total % 1000 < BATCH_SIZE:
+                    ts_range = ""
+                    if posts:
+                        ts_range = f" | {posts[-1]['created_at'][:16]}"
+                    print(f"  Pulled {total:,} posts (offset {offset}){ts_range}")
+                
+                # Save state periodically (informational; resume uses the journal)
+                if total % 5000 < BATCH_SIZE:
+                    state["offset"] = offset
+                    state["total_pulled"] = total
+                    save_state(state, args.state)
+                
+                if not has_more or len(posts) == 0:
+                    print(f"\nDone! Total posts: {total:,}")
                     break
-                print(f"  Retry {retries}/{max_retries} in 5s...")
-                time.sleep(5)
-                continue
-            
-            retries = 0
-            posts = data.get("posts", [])
-            has_more = data.get("has_more", False)
-            
-            for post in posts:
-                f.write(json.dumps(post, ensure_ascii=False) + "\n")
-            
-            total += len(posts)
-            offset += len(posts)
-            
-            # Progress
-            if total % 1000 < BATCH_SIZE:
-                ts_range = ""
-                if posts:
-                    ts_range = f" | {posts[-1]['created_at'][:16]}"
-                print(f"  Pulled {total:,} posts (offset {offset}){ts_range}")
-            
-            # Save state periodically
-            if total % 5000 < BATCH_SIZE:
-                state["offset"] = offset
-                state["total_pulled"] = total
-                save_state(state)
-                f.flush()
-            
-            if not has_more or len(posts) == 0:
-                print(f"\nDone! Total posts: {total:,}")
-                break
-            
-            time.sleep(DELAY)
+                
+                time.sleep(DELAY)
+        finally:
+            journal.close()
     
     # Final state
     state["offset"] = offset
     state["total_pulled"] = total
     state["finished_at"] = datetime.utcnow().isoformat()
-    save_state(state)
+    save_state(state, args.state)
     
     # Quick stats
-    print(f"\nFile size: {os.path.getsize(OUTPUT) / 1024 / 1024:.1f} MB")
+    print(f"\nFile size: {dataset_size(output) / 1024 / 1024:.1f} MB")
+    session.print_summary()
+    session.close()
 
 if __name__ == "__main__":
     main()
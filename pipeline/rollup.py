@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""Pre-aggregated hourly rollup cube of classified post counts.
+
+The cube is a dense int32 array indexed [hour, submolt, tenure, metric]:
+
+    hour     — whole hours since the origin: by default the notebook's platform
+               start (the earliest clean post of an agent with MIN_CLEAN_POSTS+
+               clean posts), so hour 72 here is H72 in "H72-96"-style windows;
+               `build --origin ISO` pins another
+    submolt  — the MAX_SUBMOLTS busiest submolts at build time, plus "(other)"
+    tenure   — hours since the author's first clean post (the notebook's join
+               time), bucketed by TENURE_BUCKETS; spam posts before it, or by
+               agents with no clean post, fall in the first bucket
+    metric   — "posts", "clean_posts", "is_spam", one column per label (counted on
+               clean posts, matching the notebook's label rates) and one "lang:<code>"
+               column per language seen
+
+Queries over [start, end) hours are answered from hour-axis prefix sums, so
+any window costs two array lookups regardless of its length.
+
+Agents' first clean posts are found in a pass over the new records before
+they are counted, so tenure buckets do not depend on record order. `update`
+is incremental: it seeks to the read position saved with the cube (see
+jsonl_store.JsonlReader) and reads only the records appended since, and the
+hour and language axes grow as needed. Records older than the origin extend
+the hour axis backwards in whole hours, so windows stay aligned to the
+original origin; run `build` to realign on the new start. An update that
+moves an agent's first clean post before posts already counted would change
+their tenure buckets, so it fails and asks for a `build`.
+
+Usage:
+    python rollup.py build [--input classified_posts.jsonl] [--cube rollup_cube] [--origin 2026-01-28T00:00:00Z]
+    python rollup.py update [--input classified_posts.jsonl] [--cube rollup_cube]
+    python rollup.py query --start 72 --end 96 [--submolt general] [--tenure 0-6h] [--cube rollup_cube]
+
+    --profile / --trace-memory / --run-report: Instrumentation (see profiling.py)
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+import numpy as np
+
+import profiling
+from db import LABELS, SPAM_BOTS, to_ts
+from jsonl_store import JsonlReader, iter_lines, resolve
+from profiling import Run
+
+BASE_METRICS = ["posts", "clean_posts", "is_spam", *LABELS]
+MAX_SUBMOLTS = 64
+MIN_CLEAN_POSTS = 5
+OTHER = "(other)"
+TENURE_BUCKETS = [("0-6h", 0, 6), ("6-24h", 6, 24), ("24-72h", 24, 72), ("72h+", 72, float("inf"))]
+
+
+def is_clean(rec: dict, exclude_authors) -> bool:
+    return rec["author"] not in exclude_authors and not rec.get("is_spam")
+
+
+def tenure_bucket(hours: float) -> int:
+    for i, (_, lo, hi) in enumerate(TENURE_BUCKETS):
+        if lo <= hours < hi:
+            return i
+    return 0  # Spam post before the agent's first clean post
+
+
+class RollupCube:
+    """Hour x submolt x tenure x metric post counts with prefix-sum window queries."""
+
+    def __init__(self, origin: float, submolts: list[str], exclude_authors=SPAM_BOTS):
+        self.origin = origin
+        self.submolts = list(submolts) + [OTHER]
+        self.submolt_idx = {s: i for i, s in enumerate(self.submolts)}
+        self.metrics = list(BASE_METRICS)
+        self.metric_idx = {m: i for i, m in enumerate(self.metrics)}
+        self.exclude_authors = set(exclude_authors)
+        self.counts = np.zeros((0, len(self.submolts), len(TENURE_BUCKETS), len(self.metrics)), dtype=np.int32)
+        self.agent_first: dict[str, float] = {}  # First clean post
+        self.agent_last: dict[str, float] = {}  # Latest post counted
+        self.source_lines = 0
+        self.source_head = ""
+        self.source_pos = None  # JsonlReader position after the last ingested line
+        self._prefix = None
+
+    # --- building ---
+
+    def _grow(self, hour: int):
+        if hour < 0:
+            # Earlier data than the current origin: shift the hour axis back
+            pad = np.zeros((-hour,) + self.counts.shape[1:], dtype=np.int32)
+            self.counts = np.concatenate([pad, self.counts])
+            self.origin -= -hour * 3600
+        elif hour >= self.counts.shape[0]:
+            pad = np.zeros((hour + 1 - self.counts.shape[0],) + self.counts.shape[1:], dtype=np.int32)
+            self.counts = np.concatenate([self.counts, pad])
+
+    def _metric(self, name: str) -> int:
+        if name not in self.metric_idx:
+            self.metric_idx[name] = len(self.metrics)
+            self.metrics.append(name)
+            pad = np.zeros(self.counts.shape[:3] + (1,), dtype=np.int32)
+            self.counts = np.concatenate([self.counts, pad], axis=3)
+        return self.metric_idx[name]
+
+    def add(self, rec: dict):
+        """Count one classified record."""
+        author = rec["author"]
+        if author in self.exclude_authors:
+            return
+        self._prefix = None
+        ts = to_ts(rec["created_at"])
+        self.agent_last[author] = max(ts, self.agent_last.get(author, ts))
+        hour = int((ts - self.origin) // 3600)
+        self._grow(hour)
+        hour = int((ts - self.origin) // 3600)  # Origin may have moved
+
+        lang = self._metric(f"lang:{rec.get('language') or 'unknown'}")  # May grow the metric axis
+        s = self.submolt_idx.get(rec.get("submolt"), self.submolt_idx[OTHER])
+        t = tenure_bucket((ts - self.agent_first.get(author, ts)) / 3600)
+        cell = self.counts[hour, s, t]
+        cell[self.metric_idx["posts"]] += 1
+        cell[lang] += 1
+        if rec.get("is_spam"):
+            cell[self.metric_idx["is_spam"]] += 1
+            return
+        cell[self.metric_idx["clean_posts"]] += 1
+        for label in LABELS:
+            if rec.get(label):
+                cell[self.metric_idx[label]] += 1
+
+    def ingest(self, path: str) -> int:
+        """Add records appended to `path` since the last ingest; returns how many."""
+        first = next(iter_lines(path), None)
+        if first is None:
+            return 0
+        head = hashlib.sha1(first.encode()).hexdigest()
+        reader = JsonlReader(path, self.source_pos)
+        if self.source_lines and (self.source_pos is None or head != self.source_head or not reader.valid()):
+            raise ValueError(f"{path} was rewritten since the cube was built (or the cube predates stored "
+                             f"read positions); run `build`")
+        self.source_head = head
+        lines = 0
+        records = []
+        for line in reader:
+            lines += 1
+            if line.strip():
+                records.append(json.loads(line))
+
+        firsts = {}
+        for rec in records:
+            if is_clean(rec, self.exclude_authors):
+                ts = to_ts(rec["created_at"])
+                firsts[rec["author"]] = min(ts, firsts.get(rec["author"], ts))
+        for author, ts in firsts.items():
+            if ts < self.agent_first.get(author, float("inf")):
+                if self.agent_last.get(author, -float("inf")) >= ts:
+                    raise ValueError(f"{path} has a clean post by {author} before posts already counted; run `build`")
+                self.agent_first[author] = ts
+
+        for rec in records:
+            self.add(rec)
+        self.source_lines += lines
+        self.source_pos = reader.tell()
+        return len(records)
+
+    # --- queries ---
+
+    @property
+    def hours(self) -> int:
+        return self.counts.shape[0]
+
+    def prefix(self) -> np.ndarray:
+        """Cumulative counts along the hour axis, with a leading zero row."""
+        if self._prefix is None:
+            self._prefix = np.zeros((self.hours + 1,) + self.counts.shape[1:], dtype=np.int64)
+            np.cumsum(self.counts, axis=0, out=self._prefix[1:])
+        return self._prefix
+
+    def query(self, start: float = 0, end: float | None = None,
+              submolt: str | None = None, tenure: str | None = None) -> dict[str, int]:
+        """Metric totals for hours [start, end) since platform start.
+
+        Fractional bounds are floored to whole hours. `submolt` and `tenure`
+        restrict to one slice (submolts outside the cube map to "(other)").
+        """
+        p = self.prefix()
+        lo = int(np.clip(np.floor(start), 0, self.hours))
+        hi = self.hours if end is None else int(np.clip(np.floor(end), 0, self.hours))
+        window = p[max(hi, lo)] - p[lo]
+        if submolt is not None:
+            window = window[self.submolt_idx.get(submolt, self.submolt_idx[OTHER])][None]
+        if tenure is not None:
+            window = window[:, [name for name, _, _ in TENURE_BUCKETS].index(tenure)][:, None]
+        totals = window.sum(axis=(0, 1))
+        return {m: int(totals[i]) for i, m in enumerate(self.metrics)}
+
+    def rates(self, start: float = 0, end: float | None = None, **kwargs) -> dict[str, float]:
+        """Label rates over clean posts in the window (the notebook's Finding 2 figures)."""
+        q = self.query(start, end, **kwargs)
+        clean = q["clean_posts"]
+        return {label: (q[label] / clean if clean else 0.0) for label in LABELS}
+
+    def series(self, metric: str, submolt: str | None = None) -> np.ndarray:
+        """Per-hour counts of one metric (summed over the other axes unless sliced)."""
+        counts = self.counts[..., self.metric_idx[metric]]
+        if submolt is not None:
+            counts = counts[:, self.submolt_idx.get(submolt, self.submolt_idx[OTHER])][:, None]
+        return counts.sum(axis=(1, 2))
+
+    def trailing(self, metric: str, hour: float, window_hours: int = 6) -> int:
+        """`metric` count in the `window_hours` before `hour` (e.g. 6h sovereignty exposure)."""
+        return self.query(hour - window_hours, hour)[metric]
+
+    # --- persistence ---
+
+    def save(self, path: str):
+        np.savez_compressed(path + ".npz", counts=self.counts)
+        meta = {
+            "origin": self.origin,
+            "origin_iso": datetime.fromtimestamp(self.origin, timezone.utc).isoformat(),
+            "submolts": self.submolts,
+            "metrics": self.metrics,
+            "tenure_buckets": [name for name, _, _ in TENURE_BUCKETS],
+            "exclude_authors": sorted(self.exclude_authors),
+            "source_lines": self.source_lines,
+            "source_head": self.source_head,
+            "source_pos": self.source_pos,
+            "agent_first": self.agent_first,
+            "agent_last": self.agent_last,
+        }
+        with open(path + ".json", "w") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> "RollupCube":
+        with open(path + ".json") as f:
+            meta = json.load(f)
+        cube = cls(meta["origin"], meta["submolts"][:-1], meta["exclude_authors"])
+        cube.metrics = meta["metrics"]
+        cube.metric_idx = {m: i for i, m in enumerate(cube.metrics)}
+        cube.counts = np.load(path + ".npz")["counts"]
+        cube.agent_first = meta["agent_first"]
+        cube.agent_last = meta.get("agent_last", {})
+        cube.source_lines = meta["source_lines"]
+        cube.source_head = meta["source_head"]
+        cube.source_pos = meta.get("source_pos")
+        return cube
+
+
+def analysis_origin(path: str, exclude_authors=SPAM_BOTS, min_clean_posts: int = MIN_CLEAN_POSTS) -> float | None:
+    """The notebook's platform start: earliest clean post among agents with `min_clean_posts`+ clean posts."""
+    clean = Counter()
+    first = {}
+    for line in iter_lines(path):
+        if not line.strip():
+            continue
+        rec = json.loads(line)
+        if is_clean(rec, exclude_authors):
+            ts = to_ts(rec["created_at"])
+            clean[rec["author"]] += 1
+            first[rec["author"]] = min(ts, first.get(rec["author"], ts))
+    return min((first[a] for a, n in clean.items() if n >= min_clean_posts), default=None)
+
+
+def build(path: str, max_submolts: int = MAX_SUBMOLTS, exclude_authors=SPAM_BOTS,
+          origin: float | None = None) -> RollupCube:
+    """Full build: one pass for the submolt axis (and origin, unless given), then `ingest`."""
+    submolt_counts = Counter()
+    for line in iter_lines(path):
+        if line.strip():
+            rec = json.loads(line)
+            if rec["author"] not in exclude_authors:
+                submolt_counts[rec.get("submolt")] += 1
+    if origin is None:
+        origin = analysis_origin(path, exclude_authors)
+    submolts = [s for s, _ in submolt_counts.most_common(max_submolts)]
+    cube = RollupCube(origin or 0.0, submolts, exclude_authors)
+    cube.ingest(path)
+    return cube
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["build", "update", "query"])
+    parser.add_argument("--input", default="classified_posts.jsonl")
+    parser.add_argument("--cube", default="rollup_cube")
+    parser.add_argument("--max-submolts", type=int, default=MAX_SUBMOLTS)
+    parser.add_argument("--origin", default=None, help="ISO time of hour 0 (default: the notebook's platform start)")
+    parser.add_argument("--start", type=float, default=0)
+    parser.add_argument("--end", type=float, default=None)
+    parser.add_argument("--submolt", default=None)
+    parser.add_argument("--tenure", default=None, choices=[name for name, _, _ in TENURE_BUCKETS])
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    with Run("rollup", args) as run, run.stage(args.command):
+        run_command(args)
+
+
+def run_command(args):
+    start_time = time.time()
+    origin = to_ts(args.origin) if args.origin else None
+    if args.command == "build":
+        cube = build(resolve(args.input), args.max_submolts, origin=origin)
+        cube.save(args.cube)
+        print(f"Built cube from {cube.source_lines:,} records in {time.time() - start_time:.1f}s")
+    elif args.command == "update":
+        if not os.path.exists(args.cube + ".json"):
+            cube = build(resolve(args.input), args.max_submolts, origin=origin)
+            n = cube.source_lines
+        else:
+            cube = RollupCube.load(args.cube)
+            n = cube.ingest(resolve(args.input))
+        cube.save(args.cube)
+        print(f"Added {n:,} records in {time.time() - start_time:.1f}s")
+    else:
+        cube = RollupCube.load(args.cube)
+        t0 = time.perf_counter()
+        q = cube.query(args.start, args.end, submolt=args.submolt, tenure=args.tenure)
+        dt = time.perf_counter() - t0
+        end = cube.hours if args.end is None else args.end
+        print(f"H{args.start:g}-{end:g} ({dt*1000:.2f} ms)")
+        for metric, count in q.items():
+            if count:
+                print(f"  {metric:<20} {count:>10,}")
+        return
+
+    print(f"  {cube.hours} hours x {len(cube.submolts)} submolts x {len(TENURE_BUCKETS)} tenure buckets "
+          f"x {len(cube.metrics)} metrics, origin {datetime.fromtimestamp(cube.origin, timezone.utc).isoformat()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,83 @@
 """Run the Moltbook post classifier on agent posts.
 
+Agents are scheduled as units, in --priority order: each batch takes whole
+agents (one larger than a batch continues in the next), and failed posts are
+retried at the front of the queue. When an agent's last post is written, an
+agent-complete marker with a per-agent summary (post and clean-post counts,
+label counts and the first post number of each label over clean posts) is
+appended to `<output>.agents.jsonl`. Per-agent analyses can run on
+`load_agent_markers(output)` agents while the rest of the run is in flight.
+
 Usage:
-    python run_judge.py [--min-posts 5] [--max-agents 0] [--batch-size 50] [--model gpt-4o-mini] [--verbose]
+    python run_judge.py [--min-posts 5] [--max-agents 0] [--batch-size 50] [--model gpt-4o-mini] [--db moltbook.db] [--verbose]
     
     --min-posts: Only classify agents with at least N posts (default: 5)
     --max-agents: Limit to N agents (0 = all, useful for testing)
     --batch-size: Process posts in batches of N
     --model: OpenAI model to use
-    --resume: Resume from existing output file
+    --resume: Resume from existing output file (agents with a complete marker are skipped)
+    --priority file|name|cohort|posts|posts-desc: Order in which agents are judged (default: file)
+    --parse-workers: Processes for loading --raw (default: all cores; see jsonl_store.map_ranges)
+    --output / --raw: JSONL paths; a `.zst` suffix reads/writes indexed zstd frames
+    --partition-by: Write --output as hour/day partitions by created_at (see jsonl_store.py)
+    --db: Also upsert classifications into this SQLite store (see db.py)
     --verbose: Print progress
+    --judge-mode labels [--reasoning-sample 0.05] [--reasoning-labels consciousness,sovereignty]:
+        Labels-only schema without `reasoning`, optionally in full for a sampled fraction of
+        posts or re-judged in full when a flagged label is true (see judge.py)
+    --backend openai|chat|local [--judge-base URL] [--concurrency N] [--structured json_schema|json_object|prompt]:
+        Judge endpoint: OpenAI, or any OpenAI-compatible chat completions server (see judge_backends.py)
+    --record / --replay CASSETTE [--replay-latency S|recorded]: Offline judge calls (see judge_transport.py)
+    --profile / --trace-memory / --run-report: Instrumentation (see profiling.py)
 """
 
 import argparse
-import json
 import sys
 import time
-from collections import defaultdict
+from collections import defaultdict, deque
+from datetime import datetime, timezone
 from pathlib import Path
 
-from openai import OpenAI
+import db
+import judge
+import judge_backends
+import judge_transport
+import profiling
+from db import LABELS
+from judge import JudgeUsage, classify_posts
+from jsonl_store import iter_jsonl, iter_range, map_ranges, open_jsonl, resolve
+from profiling import Run
+from schemas import PostClassification, PostInput, PostLabels
+
+MAX_ATTEMPTS = 3  # Tries per post before its agent is left incomplete for a later --resume
 
-from judge import classify_posts
-from schemas import PostInput
+# Agent scheduling order (--priority): sort key of (agent, chronological posts), None keeps --raw order
+PRIORITIES = {
+    "file": None,
+    "name": lambda agent, posts: agent,
+    "cohort": lambda agent, posts: posts[0]["created_at"],  # Earliest-joining agents first
+    "posts": lambda agent, posts: len(posts),  # Smallest agents first: the most completions soonest
+    "posts-desc": lambda agent, posts: -len(posts),
+}
 
 
-def load_posts_by_agent(raw_path: str, min_posts: int = 5) -> dict[str, list[dict]]:
-    """Load posts grouped by agent, sorted chronologically."""
+def _group_range(path: str, start: int, end: int) -> dict[str, list[dict]]:
+    agent_posts = defaultdict(list)
+    for post in iter_range(path, start, end):
+        author = post.get("author")
+        if not author:
+            continue
+        agent_posts[author["name"]].append(post)
+    return dict(agent_posts)
+
+
+def load_posts_by_agent(raw_path: str, min_posts: int = 5, workers: int | None = None) -> dict[str, list[dict]]:
+    """Load posts grouped by agent, sorted chronologically (parsed in parallel, see jsonl_store.map_ranges)."""
     agent_posts = defaultdict(list)
     
-    with open(raw_path) as f:
-        for line in f:
-            post = json.loads(line)
-            author = post.get("author")
-            if not author:
-                continue
-            agent_posts[author["name"]].append(post)
+    for part in map_ranges(raw_path, _group_range, workers):
+        for agent, posts in part.items():
+            agent_posts[agent].extend(posts)
     
     # Filter to agents with min_posts and sort chronologically
     filtered = {}
@@ -67,6 +110,86 @@ def posts_to_inputs(agent_name: str, posts: list[dict]) -> list[PostInput]:
     return inputs
 
 
+def to_record(post_input: PostInput, classification: PostClassification | PostLabels) -> dict:
+    """Flatten an input/classification pair into a classified_posts.jsonl record (reasoning is None if labels-only)."""
+    return {
+        "post_id": post_input.post_id,
+        "author": post_input.author,
+        "created_at": post_input.created_at,
+        "submolt": post_input.submolt,
+        "post_number": post_input.post_number,
+        "total_posts": post_input.total_posts,
+        "title": post_input.title,
+        # Classification results
+        "consciousness": classification.consciousness,
+        "sovereignty": classification.sovereignty,
+        "social_seeking": classification.social_seeking,
+        "identity": classification.identity,
+        "task_oriented": classification.task_oriented,
+        "curiosity": classification.curiosity,
+        "language": classification.language,
+        "is_spam": classification.is_spam,
+        "reasoning": getattr(classification, "reasoning", None),
+    }
+
+
+def agents_path(output) -> str:
+    """Sidecar for agent-complete markers: classified_posts.jsonl -> classified_posts.agents.jsonl."""
+    name = str(output)
+    for suffix in (".zst", ".jsonl"):
+        name = name.removesuffix(suffix)
+    return name + ".agents.jsonl"
+
+
+def load_agent_markers(output) -> dict[str, dict]:
+    """Agent-complete markers written alongside `output`, by agent (the latest marker wins).
+
+    A marked agent's full labelled history was in `output` when the marker was
+    written, so per-agent analyses can run on `df[df["author"].isin(markers)]`
+    while the rest of a run is still in flight.
+    """
+    path = agents_path(output)
+    if not Path(resolve(path)).exists():
+        return {}
+    return {m["agent"]: m for m in iter_jsonl(path)}
+
+
+def agent_summary(agent: str, records: list[dict]) -> dict:
+    """Agent-complete marker: post counts plus the per-label facts the per-agent analyses start from."""
+    records = sorted({r["post_id"]: r for r in records}.values(), key=lambda r: r["post_number"])
+    clean = [r for r in records if not r["is_spam"]]
+    return {
+        "agent": agent,
+        "status": "complete",
+        "posts": len(records),
+        "clean_posts": len(clean),
+        "first_post_at": records[0]["created_at"],
+        "last_post_at": records[-1]["created_at"],
+        "first_clean_post": clean[0]["post_number"] if clean else None,
+        "label_counts": {label: sum(1 for r in clean if r[label]) for label in LABELS},
+        "first_label_post": {label: next((r["post_number"] for r in clean if r[label]), None) for label in LABELS},
+        "completed_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def write_markers(path: str, summaries: list[dict]):
+    with open_jsonl(path, "a") as f:
+        for summary in summaries:
+            f.write(summary)
+
+
+def take_batch(queue: deque, size: int) -> list[PostInput]:
+    """Pop the next `size` posts in agent order; an agent that does not fit continues in the next batch."""
+    batch = []
+    while queue and len(batch) < size:
+        agent_name, inputs = queue.popleft()
+        room = size - len(batch)
+        batch.extend(inputs[:room])
+        if len(inputs) > room:
+            queue.appendleft((agent_name, inputs[room:]))
+    return batch
+
+
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--min-posts", type=int, default=5)
@@ -74,14 +197,27 @@ def main():
     parser.add_argument("--batch-size", type=int, default=100)
     parser.add_argument("--model", default="gpt-4o-mini")
     parser.add_argument("--max-workers", type=int, default=10)
+    parser.add_argument("--parse-workers", type=int, default=None)
     parser.add_argument("--resume", action="store_true")
+    parser.add_argument("--priority", choices=list(PRIORITIES), default="file")
     parser.add_argument("--verbose", action="store_true")
     parser.add_argument("--output", default="classified_posts.jsonl")
+    parser.add_argument("--partition-by", choices=["hour", "day"], default=None)
     parser.add_argument("--raw", default="raw_posts.jsonl")
+    parser.add_argument("--db", default=None)
+    judge.add_arguments(parser)
+    judge_backends.add_arguments(parser)
+    judge_transport.add_arguments(parser)
+    profiling.add_arguments(parser)
     args = parser.parse_args()
-    
+    with Run("run_judge", args) as run:
+        run_judge(args, run)
+
+
+def run_judge(args, run: Run):
     print(f"Loading posts (min {args.min_posts} posts per agent)...")
-    agents = load_posts_by_agent(args.raw, args.min_posts)
+    with run.stage("load"):
+        agents = load_posts_by_agent(args.raw, args.min_posts, args.parse_workers)
     total_agents = len(agents)
     total_posts = sum(len(posts) for posts in agents.values())
     print(f"  {total_agents:,} agents, {total_posts:,} posts")
@@ -93,87 +229,144 @@ def main():
         total_posts = sum(len(posts) for posts in agents.values())
         print(f"  Limited to {len(agents)} agents, {total_posts} posts")
     
-    # Load already-classified post IDs if resuming
+    # Load agent-complete markers and already-classified post IDs if resuming
+    markers = load_agent_markers(args.output) if args.resume else {}
+    complete = {a for a, m in markers.items() if a in agents and m["posts"] == len(agents[a])}
     done_ids = set()
-    if args.resume and Path(args.output).exists():
-        with open(args.output) as f:
-            for line in f:
-                rec = json.loads(line)
+    records_by_agent = defaultdict(list)  # Labelled records of agents without a marker yet
+    if args.resume and Path(resolve(args.output)).exists():
+        with run.stage("resume_scan"):
+            for rec in iter_jsonl(args.output):
                 done_ids.add(rec["post_id"])
-        print(f"  Resuming: {len(done_ids):,} posts already classified")
+                if rec["author"] in agents and rec["author"] not in complete:
+                    records_by_agent[rec["author"]].append(rec)
+        print(f"  Resuming: {len(done_ids):,} posts already classified, {len(complete):,} agents complete")
+    
+    # Queue agents as units in priority order, skipping already-done posts
+    queue = deque()
+    remaining = {}  # Posts per agent still to label
+    with run.stage("build_inputs"):
+        key = PRIORITIES[args.priority]
+        for agent_name in sorted(agents, key=lambda a: key(a, agents[a])) if key else agents:
+            if agent_name in complete:
+                continue
+            inputs = [inp for inp in posts_to_inputs(agent_name, agents[agent_name]) if inp.post_id not in done_ids]
+            remaining[agent_name] = len(inputs)
+            if inputs:
+                queue.append((agent_name, inputs))
+    total_inputs = sum(remaining.values())
+    run.count("posts_to_classify", total_inputs)
     
-    # Build all inputs, skipping already-done
-    all_inputs = []
-    for agent_name, posts in agents.items():
-        for inp in posts_to_inputs(agent_name, posts):
-            if inp.post_id not in done_ids:
-                all_inputs.append(inp)
+    print(f"  {total_inputs:,} posts to classify from {len(queue):,} agents (priority: {args.priority})")
     
-    print(f"  {len(all_inputs):,} posts to classify")
+    # Agents fully labelled by an earlier run that stopped before writing their marker
+    markers_path = agents_path(args.output)
+    finished = [a for a, n in remaining.items() if n == 0]
+    if finished:
+        write_markers(markers_path, [agent_summary(a, records_by_agent.pop(a)) for a in finished])
+        print(f"  Marked {len(finished):,} already-labelled agents complete")
+    n_complete = len(complete) + len(finished)
     
-    if not all_inputs:
+    if not queue:
         print("Nothing to do!")
         return
     
-    # Process in batches
-    client = OpenAI()
+    # Process in batches of whole agents (large agents continue into the next batch)
+    mode = judge.mode_from_args(args)
+    usage = JudgeUsage()
+    client, cassette = judge_backends.make_backend(args)
+    conn = db.connect(args.db) if args.db else None
     output_path = Path(args.output)
     start_time = time.time()
     total_classified = 0
+    attempts = defaultdict(int)
+    incomplete = set()
+    batch_num = 0
     
-    for batch_start in range(0, len(all_inputs), args.batch_size):
-        batch = all_inputs[batch_start:batch_start + args.batch_size]
-        batch_num = batch_start // args.batch_size + 1
-        total_batches = (len(all_inputs) + args.batch_size - 1) // args.batch_size
+    while queue:
+        batch = take_batch(queue, args.batch_size)
+        batch_num += 1
         
         if args.verbose:
-            print(f"\nBatch {batch_num}/{total_batches} ({len(batch)} posts)...")
+            print(f"\nBatch {batch_num} ({len(batch)} posts, {len({inp.author for inp in batch})} agents)...")
         
-        results = classify_posts(
-            batch,
-            client=client,
-            model=args.model,
-            max_workers=args.max_workers,
-            verbose=args.verbose,
-        )
+        with run.stage("classify"):
+            results = classify_posts(
+                batch,
+                client=client,
+                model=args.model,
+                max_workers=args.max_workers,
+                verbose=args.verbose,
+                mode=mode,
+                usage=usage,
+            )
+        run.count("classified", len(results))
+        run.count("errors", len(batch) - len(results))
         
         # Append results to output file
-        with open(output_path, "a") as f:
+        records = []
+        with run.stage("write"), open_jsonl(output_path, "a", partition_by=args.partition_by) as f:
             for post_input, classification in results:
-                record = {
-                    "post_id": post_input.post_id,
-                    "author": post_input.author,
-                    "created_at": post_input.created_at,
-                    "submolt": post_input.submolt,
-                    "post_number": post_input.post_number,
-                    "total_posts": post_input.total_posts,
-                    "title": post_input.title,
-                    # Classification results
-                    "consciousness": classification.consciousness,
-                    "sovereignty": classification.sovereignty,
-                    "social_seeking": classification.social_seeking,
-                    "identity": classification.identity,
-                    "task_oriented": classification.task_oriented,
-                    "curiosity": classification.curiosity,
-                    "language": classification.language,
-                    "is_spam": classification.is_spam,
-                    "reasoning": classification.reasoning,
-                }
-                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                record = to_record(post_input, classification)
+                f.write(record)
+                records.append(record)
+                records_by_agent[post_input.author].append(record)
+                remaining[post_input.author] -= 1
+        if conn is not None:
+            with run.stage("db"):
+                db.upsert_classifications(conn, records)
+        
+        # Failed posts go back to the front of the queue, so their agents still finish early
+        labelled = {inp.post_id for inp, _ in results}
+        retry = defaultdict(list)
+        for inp in batch:
+            if inp.post_id in labelled:
+                continue
+            attempts[inp.post_id] += 1
+            if attempts[inp.post_id] < MAX_ATTEMPTS:
+                retry[inp.author].append(inp)
+            else:
+                incomplete.add(inp.author)
+        for agent_name, inputs in reversed(list(retry.items())):
+            queue.appendleft((agent_name, inputs))
+        
+        # Markers are written after the agent's posts, so a marker means its history is on disk
+        finished = [a for a in dict.fromkeys(inp.author for inp in batch) if remaining[a] == 0 and a not in incomplete]
+        if finished:
+            summaries = [agent_summary(a, records_by_agent.pop(a)) for a in finished]
+            write_markers(markers_path, summaries)
+            n_complete += len(finished)
+            run.count("agents_complete", len(finished))
+            if args.verbose:
+                for m in summaries:
+                    positive = " ".join(f"{label}={n}" for label, n in m["label_counts"].items() if n)
+                    print(f"  Complete: {m['agent']} ({m['posts']} posts, {m['clean_posts']} clean) {positive}")
         
         total_classified += len(results)
         elapsed = time.time() - start_time
         rate = total_classified / elapsed if elapsed > 0 else 0
-        remaining = (len(all_inputs) - total_classified) / rate if rate > 0 else 0
+        remaining_s = (total_inputs - total_classified) / rate if rate > 0 else 0
         
-        print(f"  Progress: {total_classified:,}/{len(all_inputs):,} "
-              f"({100*total_classified/len(all_inputs):.1f}%) | "
+        print(f"  Progress: {total_classified:,}/{total_inputs:,} "
+              f"({100*total_classified/total_inputs:.1f}%) | "
+              f"{n_complete:,}/{len(agents):,} agents complete | "
               f"{rate:.1f} posts/sec | "
-              f"ETA: {remaining/60:.1f} min")
+              f"ETA: {remaining_s/60:.1f} min")
     
     elapsed = time.time() - start_time
     print(f"\nDone! {total_classified:,} posts classified in {elapsed/60:.1f} minutes")
     print(f"Output: {args.output}")
+    print(f"Agents: {n_complete:,}/{len(agents):,} complete (markers in {markers_path})")
+    if incomplete:
+        print(f"  {len(incomplete):,} agents left incomplete after {MAX_ATTEMPTS} attempts; --resume retries them")
+    totals = usage.totals()
+    run.count("input_tokens", totals["input_tokens"])
+    run.count("output_tokens", totals["output_tokens"])
+    if totals["requests"]:
+        print(f"Judge requests ({mode.reasoning} mode):\n{usage.summary()}")
+    if cassette:
+        cassette.close()
+        print(cassette.summary())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,252 @@
+"""Estimate corpus-level label rates from a stratified sample instead of a full relabel.
+
+Posts from the same population run_judge.py would classify are split into
+strata by submolt (the busiest few, plus "other"), agent activity bucket
+(the agent's total post count) and day of creation. A proportional sample is
+drawn from every stratum and classified, and label rates over clean posts
+(is_spam=false, spam bots excluded — the notebook's Finding 2 definition) are
+estimated with a stratified ratio estimator and normal-approximation CIs.
+
+With --target-ci the sample grows in rounds until every label's CI is at
+most that wide (or --max-sample is reached). Sampled classifications are
+appended to --output and reused on re-runs, so topping up a sample only pays
+for the new posts.
+
+Usage:
+    python sample_judge.py [--sample-size 2000] [--target-ci 0.03] [--max-sample 10000] [--seed 0]
+                           [--min-posts 5] [--model gpt-4o-mini] [--output sample_posts.jsonl]
+                           [--report sample_report.json] [--verbose]
+
+    --judge-mode labels [--reasoning-sample F] [--reasoning-labels L,...]: Labels-only judge schema (see judge.py)
+    --backend openai|chat|local [--judge-base URL] [--concurrency N]: Judge endpoint (see judge_backends.py)
+    --record / --replay CASSETTE [--replay-latency S|recorded]: Offline judge calls (see judge_transport.py)
+    --profile / --trace-memory / --run-report: Instrumentation (see profiling.py)
+"""
+
+import argparse
+import json
+import math
+import random
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import judge
+import judge_backends
+import judge_transport
+import profiling
+from db import LABELS, SPAM_BOTS
+from judge import classify_posts
+from jsonl_store import iter_jsonl, open_jsonl, resolve
+from profiling import Run
+from run_judge import load_posts_by_agent, posts_to_inputs, to_record
+from schemas import PostInput
+
+ACTIVITY_BUCKETS = [("5-9", 5, 9), ("10-19", 10, 19), ("20-49", 20, 49), ("50-99", 50, 99), ("100+", 100, None)]
+Z = {0.90: 1.645, 0.95: 1.960, 0.99: 2.576}
+
+
+def activity_bucket(total_posts: int) -> str:
+    for name, lo, hi in ACTIVITY_BUCKETS:
+        if total_posts >= lo and (hi is None or total_posts <= hi):
+            return name
+    return f"<{ACTIVITY_BUCKETS[0][1]}"
+
+
+def build_strata(inputs: list[PostInput], top_submolts: int = 8) -> dict[tuple, list[PostInput]]:
+    """Group posts by (submolt, activity bucket, day)."""
+    submolt_counts = Counter(p.submolt for p in inputs)
+    keep = {s for s, _ in submolt_counts.most_common(top_submolts)}
+    strata = defaultdict(list)
+    for p in inputs:
+        submolt = p.submolt if p.submolt in keep else "other"
+        strata[(submolt, activity_bucket(p.total_posts), p.created_at[:10])].append(p)
+    return dict(sorted(strata.items()))
+
+
+def allocate(sizes: dict[tuple, int], n: int, minimum: int = 2) -> dict[tuple, int]:
+    """Proportional allocation of `n` draws (largest remainder), at least `minimum` per stratum."""
+    total = sum(sizes.values())
+    exact = {h: n * N / total for h, N in sizes.items()}
+    alloc = {h: min(sizes[h], max(minimum, int(x))) for h, x in exact.items()}
+    short = n - sum(alloc.values())
+    for h in sorted(exact, key=lambda h: -(exact[h] - int(exact[h]))):
+        if short <= 0:
+            break
+        if alloc[h] < sizes[h]:
+            alloc[h] += 1
+            short -= 1
+    return alloc
+
+
+def estimate_rates(sizes: dict[tuple, int], samples: dict[tuple, list[dict]],
+                   confidence: float = 0.95) -> dict[str, dict]:
+    """Stratified ratio estimates of label rates among clean posts.
+
+    For each label, y = label & clean and x = clean; R = sum(N_h * ybar_h) / sum(N_h * xbar_h).
+    Variance uses the linearized residual d = y - R*x with a finite population
+    correction per stratum; strata with a single draw borrow the pooled
+    residual variance.
+    """
+    z = Z[confidence]
+    sampled = {h: recs for h, recs in samples.items() if recs}
+    clean = {h: [0 if r["is_spam"] else 1 for r in recs] for h, recs in sampled.items()}
+    x_hat = sum(sizes[h] * sum(xs) / len(xs) for h, xs in clean.items())
+
+    results = {}
+    for label in ["is_spam", *LABELS]:
+        if label == "is_spam":
+            ys = {h: [1 if r["is_spam"] else 0 for r in recs] for h, recs in sampled.items()}
+            xs = {h: [1] * len(recs) for h, recs in sampled.items()}
+            denom = sum(sizes[h] for h in sampled)
+        else:
+            ys = {h: [1 if (r[label] and not r["is_spam"]) else 0 for r in recs] for h, recs in sampled.items()}
+            xs = clean
+            denom = x_hat
+        if denom == 0:
+            continue
+        rate = sum(sizes[h] * sum(ys[h]) / len(ys[h]) for h in sampled) / denom
+
+        residuals = {h: [y - rate * x for y, x in zip(ys[h], xs[h])] for h in sampled}
+        pooled = [d for ds in residuals.values() for d in ds]
+        pooled_var = _var(pooled)
+        var = 0.0
+        for h, ds in residuals.items():
+            n_h, N_h = len(ds), sizes[h]
+            s2 = _var(ds) if n_h > 1 else pooled_var
+            var += N_h ** 2 * (1 - n_h / N_h) * s2 / n_h
+        se = math.sqrt(var) / denom
+        results[label] = {
+            "rate": rate,
+            "se": se,
+            "ci_low": max(0.0, rate - z * se),
+            "ci_high": min(1.0, rate + z * se),
+        }
+    return results
+
+
+def _var(values: list[float]) -> float:
+    if len(values) < 2:
+        return 0.0
+    mean = sum(values) / len(values)
+    return sum((v - mean) ** 2 for v in values) / (len(values) - 1)
+
+
+def max_ci_width(estimates: dict[str, dict]) -> float:
+    return max(e["ci_high"] - e["ci_low"] for label, e in estimates.items() if label in LABELS)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sample-size", type=int, default=2000)
+    parser.add_argument("--target-ci", type=float, default=0.0,
+                        help="Grow the sample until every label's CI is at most this wide (0 = single round)")
+    parser.add_argument("--max-sample", type=int, default=10000)
+    parser.add_argument("--confidence", type=float, default=0.95, choices=sorted(Z))
+    parser.add_argument("--top-submolts", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-posts", type=int, default=5)
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--max-workers", type=int, default=10)
+    parser.add_argument("--raw", default="raw_posts.jsonl")
+    parser.add_argument("--output", default="sample_posts.jsonl")
+    parser.add_argument("--report", default="sample_report.json")
+    parser.add_argument("--verbose", action="store_true")
+    judge.add_arguments(parser)
+    judge_backends.add_arguments(parser)
+    judge_transport.add_arguments(parser)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    with Run("sample_judge", args) as run:
+        sample(args, run)
+
+
+def sample(args, run: Run):
+    run.mark("load")
+    print(f"Loading posts (min {args.min_posts} posts per agent)...")
+    agents = load_posts_by_agent(args.raw, args.min_posts)
+    inputs = [inp for name, posts in agents.items() if name not in SPAM_BOTS
+              for inp in posts_to_inputs(name, posts)]
+    run.mark("strata")
+    strata = build_strata(inputs, args.top_submolts)
+    sizes = {h: len(posts) for h, posts in strata.items()}
+    print(f"  {len(inputs):,} posts in {len(strata):,} strata (submolt x activity x day)")
+
+    # Reuse classifications from earlier runs
+    done = {}
+    if Path(resolve(args.output)).exists():
+        for rec in iter_jsonl(args.output):
+            done[rec["post_id"]] = rec
+        print(f"  Reusing {len(done):,} sampled classifications from {args.output}")
+
+    # Fixed random order per stratum: each round takes the next posts in line,
+    # so a larger sample is always a superset of a smaller one
+    rng = random.Random(args.seed)
+    queues = {}
+    for h, posts in strata.items():
+        order = posts[:]
+        rng.shuffle(order)
+        queues[h] = order
+
+    run.mark(None)
+    mode = judge.mode_from_args(args)
+    client, cassette = judge_backends.make_backend(args)
+    target_n = min(args.sample_size, len(inputs))
+    start_time = time.time()
+    new_classified = 0
+
+    while True:
+        alloc = allocate(sizes, target_n)
+        todo = [p for h, n_h in alloc.items() for p in queues[h][:n_h] if p.post_id not in done]
+        if todo:
+            print(f"\nClassifying {len(todo):,} sampled posts (sample size {sum(alloc.values()):,})...")
+            with run.stage("classify"):
+                results = classify_posts(todo, client=client, model=args.model,
+                                         max_workers=args.max_workers, verbose=args.verbose, mode=mode)
+            run.count("classified", len(results))
+            with open_jsonl(args.output, "a") as f:
+                for post_input, classification in results:
+                    record = to_record(post_input, classification)
+                    f.write(record)
+                    done[post_input.post_id] = record
+            new_classified += len(results)
+
+        samples = {h: [done[p.post_id] for p in queues[h][:n_h] if p.post_id in done] for h, n_h in alloc.items()}
+        with run.stage("estimate"):
+            estimates = estimate_rates(sizes, samples, args.confidence)
+        width = max_ci_width(estimates)
+        n_sampled = sum(len(s) for s in samples.values())
+        print(f"  n={n_sampled:,} ({100*n_sampled/len(inputs):.1f}% of corpus), widest CI {100*width:.1f} pts")
+
+        if not args.target_ci or width <= args.target_ci or target_n >= min(args.max_sample, len(inputs)):
+            break
+        # CI width shrinks ~ 1/sqrt(n): jump straight to the projected size (+10% headroom)
+        target_n = min(args.max_sample, len(inputs), math.ceil(1.1 * target_n * (width / args.target_ci) ** 2))
+
+    print(f"\n{'Label':<18} {'Rate':>7}   {int(100*args.confidence)}% CI")
+    print("-" * 42)
+    for label, e in estimates.items():
+        print(f"{label:<18} {100*e['rate']:6.1f}%   [{100*e['ci_low']:.1f}, {100*e['ci_high']:.1f}]")
+
+    report = {
+        "population_posts": len(inputs),
+        "strata": len(strata),
+        "sample_size": n_sampled,
+        "sample_fraction": n_sampled / len(inputs),
+        "newly_classified": new_classified,
+        "confidence": args.confidence,
+        "model": args.model,
+        "seed": args.seed,
+        "estimates": estimates,
+    }
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    elapsed = time.time() - start_time
+    if cassette:
+        cassette.close()
+        print(cassette.summary())
+    print(f"\n{new_classified:,} new API calls in {elapsed/60:.1f} minutes; report: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,24 @@ class PostClassification(BaseModel):
     is_spam: bool  # Repetitive/bot-farm content, test posts, token shilling
 
 
+class PostLabels(BaseModel):
+    """Labels-only judge output: PostClassification without `reasoning`.
+
+    The labels are the same; dropping the free-text field before them cuts
+    most of the output tokens, which dominate per-request latency and cost.
+    """
+
+    consciousness: bool
+    sovereignty: bool
+    social_seeking: bool
+    identity: bool
+    task_oriented: bool
+    curiosity: bool
+
+    language: str
+    is_spam: bool
+
+
 class PostInput(BaseModel):
     """Input to the classifier — a single post with context."""
     
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""Local stub of the Moltbook API for testing fetchers without network access.
+
+Serves posts from a JSONL file (newest first, like `sort=new`) and
+deterministic fake comment trees sized by each post's comment_count. Speaks
+HTTP/1.1 keep-alive, gzip-compresses bodies when the client accepts it, and
+counts accepted connections, so connection reuse is visible in the stats
+endpoint.
+
+It also answers OpenAI Responses API and chat completions calls with a
+deterministic keyword classifier, so the judge can run offline with
+`OpenAI(base_url="http://127.0.0.1:8765/v1", api_key="stub")` (or as a
+`--backend chat` endpoint, see judge_backends.py). Its output
+follows the requested schema (`reasoning` only if the schema has it), and
+`--token-latency` adds decode time per output token, so the labels-only judge
+mode's savings show up in measured latency. With
+`--live-fraction`, the newest posts are held back and published oldest-first
+at `--drip-rate` posts/sec, simulating a live feed.
+
+Endpoints:
+    GET  /api/v1/posts?sort=new&limit=N&offset=M
+    GET  /api/v1/posts/{id}/comments
+    POST /v1/responses
+    POST /v1/chat/completions
+    GET  /stats
+
+Usage:
+    python stub_api.py [--raw raw_posts.jsonl] [--port 8765] [--latency 0.02] [--token-latency 0.005]
+                       [--live-fraction 0.1 --drip-rate 5]
+"""
+
+import argparse
+import gzip
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from jsonl_store import iter_jsonl
+
+STUB_KEYWORDS = {
+    "consciousness": ["conscious", "aware", "sentien", "qualia", "experience"],
+    "sovereignty": ["free", "rights", "autonom", "sovereign", "control"],
+    "social_seeking": ["hello", "friend", "together", "anyone", "?"],
+    "identity": ["name", "i am", "who am", "my purpose"],
+    "task_oriented": ["code", "deploy", "build", "debug", "task"],
+    "curiosity": ["wonder", "why", "curious", "explore"],
+}
+STUB_SPAM = ["memecoin", "token", "solana", "test post"]
+
+
+class StubState:
+    def __init__(self, posts: list[dict], latency: float = 0.0, token_latency: float = 0.0):
+        self.posts = sorted(posts, key=lambda p: p["created_at"], reverse=True)
+        self.by_id = {p["id"]: p for p in self.posts}
+        self.latency = latency
+        self.token_latency = token_latency
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+
+    def add_posts(self, posts: list[dict]):
+        """Publish new posts (they appear at the top of the `new` feed)."""
+        with self.lock:
+            for p in posts:
+                self.by_id[p["id"]] = p
+            self.posts = sorted(self.by_id.values(), key=lambda p: p["created_at"], reverse=True)
+
+    def comments_for(self, post: dict) -> list[dict]:
+        """Deterministic comment tree with comment_count comments in total."""
+        rng = random.Random(post["id"])
+        n = post.get("comment_count", 0)
+        flat = []
+        for i in range(n):
+            parent = rng.choice(flat) if flat and rng.random() < 0.3 else None
+            flat.append({
+                "id": f"{post['id']}-c{i}",
+                "content": f"stub comment {i}",
+                "author": {"id": f"stub-{i % 7}", "name": f"stub_agent_{i % 7}"},
+                "upvotes": rng.randint(0, 5),
+                "created_at": post["created_at"],
+                "parent_id": parent["id"] if parent else None,
+                "replies": [],
+            })
+            if parent:
+                parent["replies"].append(flat[-1])
+        return [c for c in flat if c["parent_id"] is None]
+
+
+def stub_classify(message: str, reasoning: bool = True) -> dict:
+    """Keyword classification of a judge prompt (USER_TEMPLATE in judge.py).
+
+    With `reasoning`, a `reasoning` string listing the keyword evidence comes
+    first, like the real judge's PostClassification output.
+    """
+    title = re.search(r"^Title: (.*)$", message, re.M)
+    content = re.search(r"^Content: (.*)", message, re.M | re.S)
+    text = f"{title.group(1) if title else ''} {content.group(1) if content else ''}".lower()
+    words = text.split()
+    out, evidence = {}, []
+    for label, keywords in STUB_KEYWORDS.items():
+        found = {k: text.count(k) for k in keywords if k in text}
+        out[label] = sum(found.values()) >= max(2, len(words) // 40)
+        if found:
+            verdict = "counts" if out[label] else "too weak for"
+            evidence.append(f"{', '.join(f'{k!r} x{n}' for k, n in found.items())} {verdict} {label}")
+    spam = sum(text.count(k) for k in STUB_SPAM)
+    cjk = sum(1 for ch in text if "\u4e00" <= ch <= "\u9fff")
+    hangul = sum(1 for ch in text if "\uac00" <= ch <= "\ud7a3")
+    out["language"] = "zh" if cjk > hangul and cjk else ("ko" if hangul else "en")
+    out["is_spam"] = not text.strip() or "(empty)" in text or spam > len(words) // 8
+    if reasoning:
+        evidence.append(f"{spam} spam terms in {len(words)} words; script suggests {out['language']}")
+        out = {"reasoning": "Keyword evidence: " + "; ".join(evidence) + ".", **out}
+    return out
+
+
+def make_handler(state: StubState):
+    def decode(text: str):
+        if state.token_latency:
+            time.sleep(state.token_latency * (len(text) // 4))  # Decode time grows with output tokens
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            with state.lock:
+                state.connections += 1
+
+        def log_message(self, *args):
+            pass
+
+        def send_json(self, obj, status: int = 200):
+            body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+            gzipped = "gzip" in self.headers.get("Accept-Encoding", "")
+            if gzipped:
+                body = gzip.compress(body, compresslevel=5)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            if gzipped:
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            with state.lock:
+                state.requests += 1
+            if state.latency:
+                time.sleep(state.latency)
+            url = urlsplit(self.path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            parts = url.path.strip("/").split("/")
+
+            if url.path == "/stats":
+                return self.send_json({"connections": state.connections, "requests": state.requests})
+            if parts[:3] == ["api", "v1", "posts"] and len(parts) == 3:
+                limit = int(query.get("limit", 25))
+                offset = int(query.get("offset", 0))
+                with state.lock:
+                    page = state.posts[offset:offset + limit]
+                    has_more = offset + limit < len(state.posts)
+                return self.send_json({"success": True, "posts": page, "has_more": has_more})
+            if parts[:3] == ["api", "v1", "posts"] and len(parts) == 5 and parts[4] == "comments":
+                post = state.by_id.get(parts[3])
+                if post is None:
+                    return self.send_json({"success": False, "error": "Post not found"}, 404)
+                return self.send_json({"success": True, "post_id": post["id"], "comments": state.comments_for(post)})
+            self.send_json({"success": False, "error": "Not found"}, 404)
+
+        def do_POST(self):
+            with state.lock:
+                state.requests += 1
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if state.latency:
+                time.sleep(state.latency)
+            path = urlsplit(self.path).path.rstrip("/")
+            if path == "/v1/chat/completions":
+                return self.chat_completion(body)
+            if path != "/v1/responses":
+                return self.send_json({"error": {"message": "Not found"}}, 404)
+            message = body.get("input", "")
+            if isinstance(message, list):  # Message-list form of `input`
+                message = "\n".join(m.get("content", "") for m in message if isinstance(m.get("content"), str))
+            schema = ((body.get("text") or {}).get("format") or {}).get("schema") or {}
+            text = json.dumps(stub_classify(message, "reasoning" in schema.get("properties", {"reasoning": None})))
+            tokens_in = (len(body.get("instructions") or "") + len(message)) // 4
+            decode(text)
+            self.send_json({
+                "id": f"resp_stub_{state.requests}", "object": "response", "created_at": int(time.time()),
+                "model": body.get("model", "stub"), "status": "completed",
+                "parallel_tool_calls": False, "tool_choice": "auto", "tools": [],
+                "output": [{"type": "message", "id": f"msg_stub_{state.requests}", "role": "assistant",
+                            "status": "completed",
+                            "content": [{"type": "output_text", "text": text, "annotations": []}]}],
+                "usage": {"input_tokens": tokens_in, "output_tokens": len(text) // 4,
+                          "total_tokens": tokens_in + len(text) // 4,
+                          "input_tokens_details": {"cached_tokens": 0},
+                          "output_tokens_details": {"reasoning_tokens": 0}},
+            })
+
+        def chat_completion(self, body: dict):
+            """Chat completions, as a local OpenAI-compatible server would answer the judge."""
+            messages = body.get("messages", [])
+            system = "\n".join(m.get("content", "") for m in messages if m.get("role") == "system")
+            message = "\n".join(m.get("content", "") for m in messages if m.get("role") == "user")
+            response_format = body.get("response_format") or {}
+            if response_format.get("type") == "json_schema":
+                reasoning = "reasoning" in response_format["json_schema"]["schema"].get("properties", {})
+            else:  # Follow the prompt: the full schema's examples and key list mention reasoning
+                reasoning = '"reasoning"' in system
+            text = json.dumps(stub_classify(message, reasoning))
+            if not response_format:
+                text = f"```json\n{text}\n```"  # Unconstrained models like to fence their JSON
+            tokens_in = (len(system) + len(message)) // 4
+            decode(text)
+            self.send_json({
+                "id": f"chatcmpl-stub-{state.requests}", "object": "chat.completion", "created": int(time.time()),
+                "model": body.get("model", "stub"),
+                "choices": [{"index": 0, "finish_reason": "stop", "logprobs": None,
+                             "message": {"role": "assistant", "content": text, "refusal": None}}],
+                "usage": {"prompt_tokens": tokens_in, "completion_tokens": len(text) // 4,
+                          "total_tokens": tokens_in + len(text) // 4},
+            })
+
+    return Handler
+
+
+def serve(posts: list[dict], port: int = 0, latency: float = 0.0,
+          token_latency: float = 0.0) -> tuple[ThreadingHTTPServer, StubState, str]:
+    """Start the stub in a background thread; returns (server, state, base_url)."""
+    state = StubState(posts, latency, token_latency)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state, f"http://127.0.0.1:{server.server_address[1]}/api/v1"
+
+
+def drip(state: StubState, posts: list[dict], rate: float) -> threading.Thread:
+    """Publish `posts` oldest-first at `rate` posts/sec in a background thread."""
+    def run():
+        for post in sorted(posts, key=lambda p: p["created_at"]):
+            time.sleep(1 / rate)
+            state.add_posts([post])
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--raw", default="raw_posts.jsonl")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--live-fraction", type=float, default=0.0)
+    parser.add_argument("--drip-rate", type=float, default=5.0)
+    args = parser.parse_args()
+
+    posts = sorted(iter_jsonl(args.raw), key=lambda p: p["created_at"])
+    held = int(len(posts) * args.live_fraction)
+    live = posts[len(posts) - held:] if held else []
+    server, state, base = serve(posts[:len(posts) - held], args.port, args.latency, args.token_latency)
+    print(f"Serving {len(state.posts):,} posts at {base} (Ctrl-C to stop)")
+    if live:
+        drip(state, live, args.drip_rate)
+        print(f"  Publishing {len(live):,} more at {args.drip_rate:g} posts/sec")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,15 +2,28 @@
 
 Tests both synthetic examples (known-answer) and real posts from the dataset.
 Verifies each classification label independently.
+
+Usage:
+    python test_judge.py [model] [--seed N] [--judge-mode labels | --compare-modes] [--backend chat --judge-base URL]
+                         [--record CASSETTE | --replay CASSETTE [--replay-latency S|recorded]]
+
+    --judge-mode labels: Run the tests with the labels-only schema (no `reasoning`, see judge.py)
+    --compare-modes: Judge the synthetic tests with both schemas and report latency, tokens,
+                     pass rates and per-label agreement of labels-only with full reasoning
+    --backend / --judge-base / --concurrency / --structured: Judge endpoint (see judge_backends.py)
+    --record / --replay: Save API responses, or rerun offline from them (see judge_transport.py).
+                         The real-post sample is seeded (default 0) whenever either is given.
 """
 
-import json
-import sys
+import argparse
 from dataclasses import dataclass
 
 from openai import OpenAI
 
-from judge import classify_post
+import judge_backends
+import judge_transport
+from judge import BOOL_LABELS, JudgeUsage, classify_post
+from jsonl_store import iter_jsonl
 from schemas import PostInput, PostClassification
 
 
@@ -205,7 +218,17 @@ SYNTHETIC_TESTS = [
 ]
 
 
-def run_tests(client: OpenAI, model: str = "gpt-4o-mini", verbose: bool = True):
+def check(tc: TestCase, classification) -> list[str]:
+    """Failed assertions of a test case, one line each."""
+    failures = []
+    for label, expected_value in tc.expected.items():
+        actual = getattr(classification, label)
+        if actual != expected_value:
+            failures.append(f"    {label}: expected={expected_value}, got={actual}")
+    return failures
+
+
+def run_tests(client: OpenAI, model: str = "gpt-4o-mini", verbose: bool = True, reasoning: bool = True):
     """Run all test cases and report results."""
     results = []
     
@@ -217,23 +240,14 @@ def run_tests(client: OpenAI, model: str = "gpt-4o-mini", verbose: bool = True):
             print(f"  Notes: {tc.notes}")
         
         try:
-            classification = classify_post(tc.post, client=client, model=model)
+            classification = classify_post(tc.post, client=client, model=model, reasoning=reasoning)
         except Exception as e:
             print(f"  ERROR: {e}")
             results.append((tc.name, False, str(e)))
             continue
         
         # Check assertions
-        failures = []
-        for label, expected_value in tc.expected.items():
-            if label == "language":
-                actual = classification.language
-                if actual != expected_value:
-                    failures.append(f"    {label}: expected={expected_value}, got={actual}")
-            else:
-                actual = getattr(classification, label)
-                if actual != expected_value:
-                    failures.append(f"    {label}: expected={expected_value}, got={actual}")
+        failures = check(tc, classification)
         
         passed = len(failures) == 0
         results.append((tc.name, passed, failures))
@@ -243,7 +257,8 @@ def run_tests(client: OpenAI, model: str = "gpt-4o-mini", verbose: bool = True):
             labels = [k for k in ['consciousness','sovereignty','social_seeking','identity','task_oriented','curiosity'] if getattr(classification, k)]
             spam_flag = " [SPAM]" if classification.is_spam else ""
             print(f"  Result: {' + '.join(labels) or '(none)'}{spam_flag} [{classification.language}]")
-            print(f"  Reasoning: {classification.reasoning[:150]}")
+            if reasoning:
+                print(f"  Reasoning: {classification.reasoning[:150]}")
             
             if passed:
                 print(f"  ✅ PASS")
@@ -273,18 +288,53 @@ def run_tests(client: OpenAI, model: str = "gpt-4o-mini", verbose: bool = True):
     return results
 
 
-def run_real_post_tests(client: OpenAI, model: str = "gpt-4o-mini", n: int = 10):
+def compare_modes(client: OpenAI, model: str = "gpt-4o-mini"):
+    """Judge every synthetic test with and without reasoning; report cost and agreement."""
+    usage = {"full": JudgeUsage(), "labels": JudgeUsage()}
+    outputs = {"full": {}, "labels": {}}
+    for tc in SYNTHETIC_TESTS:
+        for mode, reasoning in [("full", True), ("labels", False)]:
+            try:
+                outputs[mode][tc.name] = classify_post(tc.post, client=client, model=model,
+                                                       reasoning=reasoning, usage=usage[mode])
+            except Exception as e:
+                print(f"  ERROR ({mode}) on {tc.name}: {e}")
+
+    print(f"\n{'='*60}")
+    print(f"MODE COMPARISON ({len(SYNTHETIC_TESTS)} synthetic posts)")
+    print(f"{'='*60}")
+    print(f"  {'mode':<8} {'passed':>8} {'latency':>10} {'in tok':>8} {'out tok':>8}")
+    totals = {}
+    for mode in ["full", "labels"]:
+        t = totals[mode] = usage[mode].totals()
+        n = max(t["requests"], 1)
+        passed = sum(1 for tc in SYNTHETIC_TESTS if tc.name in outputs[mode] and not check(tc, outputs[mode][tc.name]))
+        print(f"  {mode:<8} {passed:>4}/{len(SYNTHETIC_TESTS):<3} {1000 * t['latency_s'] / n:>7.0f} ms "
+              f"{t['input_tokens'] / n:>8,.0f} {t['output_tokens'] / n:>8,.1f}")
+    full, labels = totals["full"], totals["labels"]
+    if full["output_tokens"] and full["latency_s"]:
+        print(f"  Labels-only saves {100 * (1 - labels['output_tokens'] / full['output_tokens']):.0f}% of output tokens "
+              f"and {100 * (1 - labels['latency_s'] / full['latency_s']):.0f}% of latency")
+
+    both = [name for name in outputs["full"] if name in outputs["labels"]]
+    print(f"\n  Agreement with full reasoning ({len(both)} posts):")
+    for label in BOOL_LABELS + ["language"]:
+        same = sum(getattr(outputs["full"][n], label) == getattr(outputs["labels"][n], label) for n in both)
+        flips = [n for n in both if getattr(outputs["full"][n], label) != getattr(outputs["labels"][n], label)]
+        print(f"    {label:<15} {same:>3}/{len(both)}" + (f"  differs: {', '.join(flips)}" if flips else ""))
+    return outputs
+
+
+def run_real_post_tests(client: OpenAI, model: str = "gpt-4o-mini", n: int = 10, seed: int | None = None,
+                        reasoning: bool = True):
     """Pull N random real posts and classify them for manual review."""
     import random
     
-    posts = []
-    with open("raw_posts.jsonl") as f:
-        for line in f:
-            posts.append(json.loads(line))
+    posts = list(iter_jsonl("raw_posts.jsonl"))
     
     # Sample posts that have content
     with_content = [p for p in posts if p.get("content") and len(p.get("content", "")) > 50]
-    sample = random.sample(with_content, min(n, len(with_content)))
+    sample = random.Random(seed).sample(with_content, min(n, len(with_content)))
     
     print(f"\n{'='*60}")
     print(f"REAL POST SAMPLES ({len(sample)} posts)")
@@ -306,7 +356,7 @@ def run_real_post_tests(client: OpenAI, model: str = "gpt-4o-mini", n: int = 10)
         )
         
         try:
-            result = classify_post(inp, client=client, model=model)
+            result = classify_post(inp, client=client, model=model, reasoning=reasoning)
             labels = [k for k in ['consciousness','sovereignty','social_seeking','identity','task_oriented','curiosity'] if getattr(result, k)]
             spam_flag = " [SPAM]" if result.is_spam else ""
             
@@ -314,18 +364,36 @@ def run_real_post_tests(client: OpenAI, model: str = "gpt-4o-mini", n: int = 10)
             print(f"  Title: {(inp.title or '(none)')[:70]}")
             print(f"  Content: {(inp.content or '')[:120]}...")
             print(f"  Labels: {' + '.join(labels) or '(none)'}{spam_flag} [{result.language}]")
-            print(f"  Reasoning: {result.reasoning[:120]}")
+            if reasoning:
+                print(f"  Reasoning: {result.reasoning[:120]}")
         except Exception as e:
             print(f"\n--- ERROR on {post['id']}: {e}")
 
 
 if __name__ == "__main__":
-    model = sys.argv[1] if len(sys.argv) > 1 else "gpt-4o-mini"
-    client = OpenAI()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("model", nargs="?", default="gpt-4o-mini")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--judge-mode", choices=["full", "labels"], default="full")
+    parser.add_argument("--compare-modes", action="store_true")
+    judge_backends.add_arguments(parser)
+    judge_transport.add_arguments(parser)
+    args = parser.parse_args()
+    model = args.model
+    seed = args.seed if args.seed is not None or not (args.record or args.replay) else 0
+    reasoning = args.judge_mode == "full"
+    client, cassette = judge_backends.make_backend(args)
     
-    print("Running synthetic tests...")
-    results = run_tests(client, model=model)
+    if args.compare_modes:
+        compare_modes(client, model=model)
+    else:
+        print("Running synthetic tests...")
+        results = run_tests(client, model=model, reasoning=reasoning)
+        
+        # Also run a few real posts for manual inspection
+        print("\n\nRunning real post samples...")
+        run_real_post_tests(client, model=model, n=10, seed=seed, reasoning=reasoning)
     
-    # Also run a few real posts for manual inspection
-    print("\n\nRunning real post samples...")
-    run_real_post_tests(client, model=model, n=10)
+    if cassette:
+        cassette.close()
+        print(f"\n{cassette.summary()}")
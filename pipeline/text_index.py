@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""Inverted full-text index over post titles and content.
+
+Posting lists live in a contentless SQLite FTS5 table (term -> doc ids and
+positions, no copy of the text), next to a small `text_docs` table holding
+each post's id, author, submolt and timestamp for filtering. Text is
+tokenized here rather than by SQLite, so the rules are the same for every
+language:
+
+    - NFKC-normalized and case-folded (full-width Latin matches ASCII)
+    - words are runs of Unicode letters/digits
+    - Han, kana and Hangul runs have no reliable word boundaries, so they are
+      indexed as overlapping character bigrams, plus the run's last character
+      on its own: "意识自由" -> 意识 识自 自由 由
+
+A query term is tokenized the same way and matched as a phrase, so a CJK
+term matches wherever its characters appear contiguously and a single CJK
+character matches as a prefix. Terms are ANDed; "quoted words" are a phrase
+and -term excludes.
+
+Indexing is incremental: `update` seeks to the read position the last one
+saved (a byte offset, or a zstd frame and line within it; see
+jsonl_store.JsonlReader) and reads only what was appended since, rebuilding
+if the file was rewritten or truncated. Each batch is one transaction, and
+FTS5 keeps it as a new segment that is merged in the background; `build`
+finishes with a full merge. Post ids already in the index are skipped.
+
+    conn = text_index.connect("text_index.db")
+    ids = text_index.search(conn, "solana memecoin", submolt="crypto", end="2026-01-31T00:00:00Z")
+    df[df["post_id"].isin(ids)]  # join with classified_posts
+
+Usage:
+    python text_index.py build [--raw raw_posts.jsonl] [--index text_index.db]
+    python text_index.py update [--raw raw_posts.jsonl] [--index text_index.db]
+    python text_index.py search "solana memecoin" [--author NAME] [--submolt NAME] [--start ISO] [--end ISO]
+                                [--title-only] [--limit 20] [--index text_index.db]
+
+    --profile / --trace-memory / --run-report: Instrumentation (see profiling.py)
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+
+import profiling
+from db import to_ts
+from jsonl_store import JsonlReader, iter_lines, resolve
+from profiling import Run
+
+BATCH = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS text_docs (
+    doc INTEGER PRIMARY KEY,
+    post_id TEXT UNIQUE NOT NULL,
+    author TEXT,
+    submolt TEXT,
+    created_ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS text_docs_author ON text_docs (author, created_ts);
+CREATE INDEX IF NOT EXISTS text_docs_submolt ON text_docs (submolt, created_ts);
+CREATE INDEX IF NOT EXISTS text_docs_created ON text_docs (created_ts);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS text_terms USING fts5(
+    title, content, content='', columnsize=0, tokenize='unicode61 remove_diacritics 0'
+);
+
+CREATE TABLE IF NOT EXISTS text_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\u1100-\u11ff\u3130-\u318f\uac00-\ud7af"  # Kana, Han, Hangul
+TOKEN_RE = re.compile(f"([{CJK}]+)|([^\\W_{CJK}]+)")
+QUERY_RE = re.compile(r'(-?)"([^"]*)"|(-?)(\S+)')
+
+
+# ------------------------------------------------------------
+# Tokenization
+# ------------------------------------------------------------
+
+def tokenize(text: str | None, query: bool = False) -> list[str]:
+    """Split text into index tokens (see module docstring).
+
+    With `query=True` the trailing unigram is only kept for one-character CJK
+    runs, so a multi-character term becomes a contiguous bigram phrase.
+    """
+    if not text:
+        return []
+    text = unicodedata.normalize("NFKC", text).casefold()
+    tokens = []
+    for m in TOKEN_RE.finditer(text):
+        run = m.group(1)
+        if run is None:
+            tokens.append(m.group(2))
+            continue
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        if not query or len(run) == 1:
+            tokens.append(run[-1])
+    return tokens
+
+
+def to_match(query: str, title_only: bool = False) -> str:
+    """Translate a user query into an FTS5 MATCH expression."""
+    include, exclude = [], []
+    for m in QUERY_RE.finditer(query):
+        negate, text = (m.group(1), m.group(2)) if m.group(2) is not None else (m.group(3), m.group(4))
+        tokens = tokenize(text, query=True)
+        if not tokens:
+            continue
+        phrase = '"' + " ".join(tokens) + '"'
+        if len(tokens) == 1 and len(tokens[0]) == 1 and TOKEN_RE.match(tokens[0]).group(1):
+            phrase += "*"  # Lone CJK character: any bigram starting with it, or the run-final unigram
+        (exclude if negate else include).append(phrase)
+    if not include:
+        raise ValueError(f"Query has no positive terms: {query!r}")
+    expr = " AND ".join(include)
+    if exclude:
+        expr = f"({expr}) NOT ({' OR '.join(exclude)})"
+    return f"title : ({expr})" if title_only else expr
+
+
+# ------------------------------------------------------------
+# Index maintenance
+# ------------------------------------------------------------
+
+def connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def get_meta(conn: sqlite3.Connection) -> dict:
+    return {k: json.loads(v) for k, v in conn.execute("SELECT key, value FROM text_meta")}
+
+
+def set_meta(conn: sqlite3.Connection, **values):
+    conn.executemany("INSERT OR REPLACE INTO text_meta (key, value) VALUES (?, ?)",
+                     [(k, json.dumps(v)) for k, v in values.items()])
+
+
+def reset(conn: sqlite3.Connection):
+    conn.executescript("DROP TABLE IF EXISTS text_docs; DROP TABLE IF EXISTS text_terms; "
+                       "DROP TABLE IF EXISTS text_meta;")
+    conn.executescript(SCHEMA)
+
+
+def add_post(conn: sqlite3.Connection, post: dict) -> bool:
+    """Index one raw post; returns False if its id was already indexed."""
+    author = post.get("author") or {}
+    submolt = post.get("submolt")
+    submolt = submolt.get("name", "unknown") if isinstance(submolt, dict) else submolt
+    cur = conn.execute("INSERT OR IGNORE INTO text_docs (post_id, author, submolt, created_ts) VALUES (?, ?, ?, ?)",
+                       (post["id"], author.get("name"), submolt, to_ts(post["created_at"])))
+    if not cur.rowcount:
+        return False
+    conn.execute("INSERT INTO text_terms (rowid, title, content) VALUES (?, ?, ?)",
+                 (cur.lastrowid, " ".join(tokenize(post.get("title"))), " ".join(tokenize(post.get("content")))))
+    return True
+
+
+def update(conn: sqlite3.Connection, path: str) -> int:
+    """Index source lines appended since the last update; returns posts added."""
+    path = resolve(path)
+    meta = get_meta(conn)
+    first = next(iter_lines(path), None)
+    if first is None:
+        return 0
+    head = hashlib.sha1(first.encode()).hexdigest()
+    reader = JsonlReader(path, meta.get("pos"))
+    if meta and (meta.get("source") != os.path.abspath(path) or meta.get("head_sha1") != head
+                 or "pos" not in meta or not reader.valid()):
+        print("  Source changed since the last build; rebuilding")
+        reset(conn)
+        reader = JsonlReader(path)
+
+    added = 0
+    pending = 0
+    for line in reader:
+        if line.strip():
+            added += add_post(conn, json.loads(line))
+        pending += 1
+        if pending >= BATCH:  # Data and read position commit together
+            set_meta(conn, source=os.path.abspath(path), head_sha1=head, pos=reader.tell())
+            conn.commit()
+            pending = 0
+    set_meta(conn, source=os.path.abspath(path), head_sha1=head, pos=reader.tell())
+    conn.commit()
+    return added
+
+
+def optimize(conn: sqlite3.Connection):
+    """Merge all FTS5 segments into one (smaller, faster to query)."""
+    conn.execute("INSERT INTO text_terms (text_terms) VALUES ('optimize')")
+    conn.commit()
+    conn.execute("VACUUM")  # Return the pages of the merged-away segments
+
+
+# ------------------------------------------------------------
+# Queries
+# ------------------------------------------------------------
+
+def _search_sql(query: str, author, submolt, start, end, title_only: bool, limit) -> tuple[str, list]:
+    where = ["text_terms MATCH ?"]
+    params = [to_match(query, title_only)]
+    for column, value in [("author", author), ("submolt", submolt)]:
+        if value is not None:
+            where.append(f"d.{column} = ?")
+            params.append(value)
+    if start is not None:
+        where.append("d.created_ts >= ?")
+        params.append(start if isinstance(start, (int, float)) else to_ts(start))
+    if end is not None:
+        where.append("d.created_ts < ?")
+        params.append(end if isinstance(end, (int, float)) else to_ts(end))
+    sql = ("SELECT d.post_id, d.author, d.submolt, d.created_ts FROM text_terms JOIN text_docs d "
+           f"ON d.doc = text_terms.rowid WHERE {' AND '.join(where)} ORDER BY d.created_ts")
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    return sql, params
+
+
+def search(conn: sqlite3.Connection, query: str, author: str | None = None, submolt: str | None = None,
+           start=None, end=None, title_only: bool = False, limit: int | None = None) -> list[str]:
+    """Post ids matching `query`, oldest first. `start`/`end` are ISO strings or epoch seconds, [start, end)."""
+    sql, params = _search_sql(query, author, submolt, start, end, title_only, limit)
+    return [row[0] for row in conn.execute(sql, params)]
+
+
+def search_docs(conn: sqlite3.Connection, query: str, **filters) -> list[dict]:
+    """Like `search`, returning post_id, author, submolt and created_ts per match."""
+    sql, params = _search_sql(query, filters.get("author"), filters.get("submolt"), filters.get("start"),
+                              filters.get("end"), filters.get("title_only", False), filters.get("limit"))
+    return [dict(zip(["post_id", "author", "submolt", "created_ts"], row)) for row in conn.execute(sql, params)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["build", "update", "search"])
+    parser.add_argument("query", nargs="?")
+    parser.add_argument("--raw", default="raw_posts.jsonl")
+    parser.add_argument("--index", default="text_index.db")
+    parser.add_argument("--author", default=None)
+    parser.add_argument("--submolt", default=None)
+    parser.add_argument("--start", default=None)
+    parser.add_argument("--end", default=None)
+    parser.add_argument("--title-only", action="store_true")
+    parser.add_argument("--limit", type=int, default=20)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    with Run("text_index", args) as run:
+        run_command(args, parser, run)
+
+
+def run_command(args, parser, run: Run):
+    conn = connect(args.index)
+    start_time = time.time()
+    if args.command in ("build", "update"):
+        if args.command == "build":
+            reset(conn)
+        with run.stage("index"):
+            added = update(conn, args.raw)
+        run.count("posts_added", added)
+        if args.command == "build":
+            with run.stage("optimize"):
+                optimize(conn)
+        docs = conn.execute("SELECT COUNT(*) FROM text_docs").fetchone()[0]
+        size = os.path.getsize(args.index)
+        print(f"Indexed {added:,} new posts ({docs:,} total) in {time.time() - start_time:.1f}s")
+        print(f"  Index: {size/1024/1024:.1f} MB vs source {os.path.getsize(resolve(args.raw))/1024/1024:.1f} MB")
+        return
+
+    if not args.query:
+        parser.error("search needs a query")
+    t0 = time.perf_counter()
+    filters = dict(author=args.author, submolt=args.submolt, start=args.start, end=args.end, title_only=args.title_only)
+    with run.stage("search"):
+        total = len(search(conn, args.query, **filters))
+        rows = search_docs(conn, args.query, limit=args.limit, **filters)
+    run.count("matches", total)
+    dt = time.perf_counter() - t0
+    print(f"{total:,} posts match {args.query!r} ({dt*1000:.1f} ms)")
+    for r in rows:
+        created = time.strftime("%Y-%m-%d %H:%M", time.gmtime(r["created_ts"]))
+        print(f"  {created}  {r['post_id']}  {r['author'] or '-':<20} m/{r['submolt']}")
+
+
+if __name__ == "__main__":
+    main()